@@ -1,9 +1,7 @@
-from typing import Any
-
-from sgcc_alert.tasks import run
-
-
 bind = "0.0.0.0:8000"
 workers = 4
-worker_class = 'sync'
+# each worker serves requests by threads, with database session scoped to request,
+# threads shouldn't exceed reader connection pool of the worker
+worker_class = 'gthread'
+threads = 8
 graceful_timeout = 30
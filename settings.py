@@ -7,11 +7,35 @@ DEBUG = False
 DATABASES = {
     'default': {
         'ENGINE': 'sqlite',
-        'NAME': 'sgcc.sqlite'
+        'NAME': 'sgcc.sqlite',
+        # read-only copy published after each load, which web workers read instead,
+        # disabled when it is empty
+        'SNAPSHOT_NAME': '',
+        # PRAGMAs applied on every SQLite connection
+        'OPTIONS': {
+            'JOURNAL_MODE': 'WAL',
+            'SYNCHRONOUS': 'NORMAL',
+            'BUSY_TIMEOUT': 5000,
+            'CACHE_SIZE': -16000,
+            'MMAP_SIZE': 134217728
+        }
     }
 }
 
 
+# response cache shared by web workers, disabled when PATH is empty,
+# relative PATH is next to SQLite database
+RESPONSE_CACHE = {
+    'PATH': 'sgcc.cache.sqlite',
+    # unit is byte
+    'MAX_SIZE': 67108864
+}
+
+
+# JSON provider encoding API responses, 'orjson' or 'default' (standard library)
+JSON_PROVIDER = 'orjson'
+
+
 SGCC_ACCOUNT_USERNAME = 'admin'
 SGCC_ACCOUNT_PASSWORD = 'admin'
 
@@ -25,6 +49,18 @@ TIMEZONE = 'Asia/Shanghai'
 # Sync remote data immediately
 # when start the service first time
 SYNC_INITIALIZED = True
+# JSON file of captcha notch computer vision parameters
+# generated by 'python -m sgcc_alert.tuning',
+# built-in parameters are used when the file doesn't exist,
+# relative path is next to this settings module
+CAPTCHA_NOTCH_PARAMS_PATH = 'captcha_notch_params.json'
+
+# daily usages older than retention days are moved into archive directory,
+# which should be at least 37 days to cover the recent 30 days reloaded by each scrape,
+# 0 keeps all of them in database,
+# relative archive directory is next to this settings module
+DAILY_USAGE_RETENTION_DAYS = 0
+USAGE_ARCHIVE_DIR = 'archive'
 
 
 try:
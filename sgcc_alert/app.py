@@ -7,8 +7,11 @@ import connexion
 from flask import Flask
 
 from .conf import settings
-from .databases.session import prepare_models
+from .core.utils.archive import check_retention
+from .databases.migrations import check_schema_version
+from .databases.session import remove_session
 from .log import LoggingMiddleware
+from .serialization import install_json_provider
 from .tracing import TracingMiddleware
 
 
@@ -16,6 +19,8 @@ logger = logging.getLogger(__name__)
 
 
 def create_app() -> Flask:
+    check_retention()
+
     _app = connexion.App(
         __name__,
         specification_dir="./docs",
@@ -28,10 +33,13 @@ def create_app() -> Flask:
     _app.add_api('swagger_api.yml', base_path='/api/v1.0')
     _app.add_api('swagger_page.yml', base_path='/')
 
+    install_json_provider(_app.app, settings.JSON_PROVIDER)
+    _app.app.teardown_appcontext(remove_session)
+
     TracingMiddleware.install(_app.app)
     LoggingMiddleware.install(_app.app, 'sgcc-alert', settings.DEBUG)
 
-    prepare_models()
+    check_schema_version()
 
     return _app.app
 
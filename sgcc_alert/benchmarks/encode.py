@@ -0,0 +1,126 @@
+"""
+Compare encoding of API responses by JSON providers
+
+Synthetic usage responses, in both rows and columnar format, are encoded
+the same way as connexion serialises API responses (indented by 2 spaces),
+by each provider within Flask app configured like the application,
+then compared by mean latency and whether the output is identical with the default one
+
+Usage:
+    python -m sgcc_alert.benchmarks.encode --rows 10000 --repeats 20
+"""
+import argparse
+import datetime
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, TypedDict
+import warnings
+
+from connexion.apps.flask_app import FlaskJSONEncoder
+from flask import Flask
+
+from ..conf import settings
+from ..constants import DateGranularity
+from ..log import config_logging
+from ..serialization import install_json_provider, JSON_PROVIDERS
+
+
+logger = logging.getLogger(__name__)
+
+
+class EncodeResult(TypedDict):
+
+    provider: str
+    response_format: str
+    row_count: int
+    size: int               # unit is byte
+    mean_latency: float     # unit is millisecond
+    identical: bool         # whether output is identical with the default provider
+
+
+def build_usages(row_count: int) -> List[Dict[str, Any]]:
+    start_date = datetime.date(2000, 1, 1)
+    return [
+        {
+            'date': start_date + datetime.timedelta(days=idx),
+            'granularity': DateGranularity.DAILY.value,
+            'elec_usage': round(idx % 97 * 0.37, 2),
+            'elec_charge': round(idx % 97 * 0.37 * 0.5283, 4) if idx % 11 else None
+        }
+        for idx in range(row_count)
+    ]
+
+
+def build_responses(row_count: int) -> Dict[str, Dict[str, Any]]:
+    usages = build_usages(row_count)
+    pagination = {'offset': 0, 'limit': row_count, 'next_offset': None, 'cursor': None, 'next_cursor': None}
+    return {
+        'rows': {'data': usages, 'pagination': pagination},
+        'columnar': {
+            'data': {key: [usage[key] for usage in usages] for key in usages[0]} if usages else {},
+            'pagination': pagination
+        }
+    }
+
+
+def get_app(provider: str) -> Flask:
+    app = Flask(__name__)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        # as connexion configures its Flask app
+        app.json_encoder = FlaskJSONEncoder
+    install_json_provider(app, provider)
+    return app
+
+
+def encode(app: Flask, body: Any) -> str:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return app.json.dumps(body, indent=2) + '\n'
+
+
+def compare_providers(row_count: int, repeat_count: int) -> List[EncodeResult]:
+    results: List[EncodeResult] = []
+    for response_format, body in build_responses(row_count).items():
+        expected = None
+        for provider in JSON_PROVIDERS:
+            app = get_app(provider)
+            with app.app_context():
+                content = encode(app, body)
+                elapsed = 0.0
+                for _ in range(repeat_count):
+                    start = time.perf_counter()
+                    encode(app, body)
+                    elapsed += time.perf_counter() - start
+            if expected is None:
+                expected = content
+            results.append({
+                'provider': provider,
+                'response_format': response_format,
+                'row_count': row_count,
+                'size': len(content.encode()),
+                'mean_latency': round(elapsed * 1000 / max(repeat_count, 1), 4),
+                'identical': content == expected
+            })
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help='usages in each response')
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    config_logging('sgcc-alert-benchmark', settings.DEBUG)
+
+    results = compare_providers(args.rows, args.repeats)
+    for result in results:
+        logger.info(
+            f'{result["provider"]} ({result["response_format"]}): {result["row_count"]} rows '
+            f'in {result["size"]} bytes, {result["mean_latency"]}ms per response, '
+            f'identical: {result["identical"]}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark loading synthetic batches of usages into database
+
+Each batch loads the same keys with changed values,
+so that the first one inserts rows and the others upsert them.
+Usages are loaded by SQLAlchemy executemany of text statement in the former way,
+and by the loader in use, into separate databases.
+Both of them roll up the usages within the transaction
+
+Usage:
+    python -m sgcc_alert.benchmarks.load --rows 100000 --batches 3
+"""
+import argparse
+import datetime
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, TypedDict
+
+from sqlalchemy import bindparam, text
+
+from ..conf import settings
+from ..constants import DatabaseRole, DateGranularity
+from ..core.utils.load import load_usages, rollup_usages, SQL_TML_INSERT_USAGE
+from ..databases import configure_session, FactUsage, managed_session
+from ..databases.migrations import migrate
+from ..log import config_logging
+from ..schemes import Usage
+
+
+logger = logging.getLogger(__name__)
+
+
+class BenchmarkResult(TypedDict):
+
+    loader: str
+    batch: int
+    row_count: int
+    elapsed: float              # unit is second
+    rows_per_second: float
+
+
+def build_usages(row_count: int, resident_count: int, batch: int) -> List[Usage]:
+    start_date = datetime.date(2000, 1, 1)
+    return [
+        {
+            'resident_id': idx % resident_count + 1,
+            'date': start_date + datetime.timedelta(days=idx // resident_count),
+            'granularity': DateGranularity.DAILY.value,
+            'elec_usage': float(idx % 100 + batch),
+            'elec_charge': (idx % 100 + batch) * 0.5
+        }
+        for idx in range(row_count)
+    ]
+
+
+def _load_by_sqlalchemy(usages: List[Usage]) -> None:
+    cur_utc_timestamp = int(datetime.datetime.utcnow().timestamp())
+    with managed_session() as session:
+        session.execute(
+            text(SQL_TML_INSERT_USAGE).bindparams(
+                bindparam('date', type_=FactUsage.__table__.c.date.type),
+                bindparam('granularity', type_=FactUsage.__table__.c.granularity.type)
+            ),
+            [
+                {
+                    **usage,
+                    'created_time': cur_utc_timestamp,
+                    'updated_time': cur_utc_timestamp
+                }
+                for usage in usages
+            ]
+        )
+        rollup_usages(session, usages, cur_utc_timestamp)
+
+
+def run_benchmark(
+    db_confs: Dict[str, Dict[str, Any]],
+    row_count: int,
+    batch_count: int,
+    resident_count: int
+) -> List[BenchmarkResult]:
+    """
+    db_confs maps loader name, i.e. sqlalchemy and executemany,
+    to the database it loads into
+    """
+    results: List[BenchmarkResult] = []
+    for loader, db_conf in db_confs.items():
+        configure_session(DatabaseRole.WRITER, db_conf)
+        migrate()
+        for batch in range(batch_count):
+            usages = build_usages(row_count, resident_count, batch)
+            start = time.perf_counter()
+            if loader == 'sqlalchemy':
+                _load_by_sqlalchemy(usages)
+            else:
+                load_usages(usages)
+            elapsed = time.perf_counter() - start
+            results.append({
+                'loader': loader,
+                'batch': batch,
+                'row_count': row_count,
+                'elapsed': round(elapsed, 4),
+                'rows_per_second': round(row_count / elapsed, 2)
+            })
+    configure_session(DatabaseRole.READER)
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='rows of each batch')
+    parser.add_argument('--batches', type=int, default=3)
+    parser.add_argument('--residents', type=int, default=100, help='residents which rows are spread over')
+    args = parser.parse_args(argv)
+
+    config_logging('sgcc-alert-benchmark', settings.DEBUG)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_confs = {
+            loader: {
+                'ENGINE': 'sqlite',
+                'NAME': os.path.join(tmp_dir, f'{loader}.sqlite'),
+                'OPTIONS': settings.DATABASES['default'].get('OPTIONS', {})
+            }
+            for loader in ('sqlalchemy', 'executemany')
+        }
+        results = run_benchmark(db_confs, args.rows, args.batches, args.residents)
+
+    for result in results:
+        logger.info(
+            f'{result["loader"]} batch {result["batch"]}: '
+            f'{result["row_count"]} rows in {result["elapsed"]}s, '
+            f'{result["rows_per_second"]} rows per second'
+        )
+
+
+if __name__ == '__main__':
+    main()
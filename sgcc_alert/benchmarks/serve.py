@@ -0,0 +1,244 @@
+"""
+Load test of API served by gunicorn worker classes
+
+A database of synthetic usages is served by one gunicorn worker process,
+either 'sync' worker serving one request at a time,
+or 'gthread' worker serving requests by threads with sessions scoped to request.
+Concurrent clients request daily usages of random residents on each concurrency,
+then worker classes are compared by throughput, which scales with concurrency
+within one process rather than with count of processes if requests are served concurrently.
+Response cache is disabled, so that every request reads database
+
+Usage:
+    python -m sgcc_alert.benchmarks.serve --residents 100 --days 365 --concurrency 1 2 4 8 --requests 400
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TypedDict
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from ..conf import settings
+from ..constants import DatabaseRole, DateGranularity
+from ..core.utils.load import load_residents, load_usages
+from ..databases import configure_session
+from ..databases.migrations import migrate
+from ..log import config_logging
+from ..schemes import Resident, Usage
+
+
+logger = logging.getLogger(__name__)
+
+
+URL_TML_RESIDENT_USAGES = 'http://127.0.0.1:{port}/api/v1.0/residents/{resident_id}/usages?granularity=daily'
+URL_TML_RESIDENTS = 'http://127.0.0.1:{port}/api/v1.0/residents'
+# unit is second
+SERVER_START_TIMEOUT = 30
+REQUEST_TIMEOUT = 30
+
+
+class ServeResult(TypedDict):
+
+    worker_class: str
+    threads: int
+    concurrency: int
+    request_count: int
+    error_count: int
+    elapsed: float              # unit is second
+    requests_per_second: float
+
+
+def build_residents(resident_count: int) -> List[Resident]:
+    return [
+        {
+            'resident_id': 1000000000000 + idx,
+            'is_main': idx == 1,
+            'resident_address': f'Address {idx}',
+            'developer_name': 'Benchmark Developer'
+        }
+        for idx in range(1, resident_count + 1)
+    ]
+
+
+def build_usages(residents: List[Resident], day_count: int) -> List[Usage]:
+    start_date = datetime.date(2000, 1, 1)
+    return [
+        {
+            'resident_id': resident['resident_id'],
+            'date': start_date + datetime.timedelta(days=idx),
+            'granularity': DateGranularity.DAILY.value,
+            'elec_usage': float(idx % 10),
+            'elec_charge': idx % 10 * 0.5
+        }
+        for resident in residents
+        for idx in range(day_count)
+    ]
+
+
+def prepare_database(db_conf: Dict[str, Any], residents: List[Resident], day_count: int) -> None:
+    configure_session(DatabaseRole.WRITER, db_conf)
+    migrate()
+    load_residents(residents)
+    load_usages(build_usages(residents, day_count))
+    configure_session(DatabaseRole.READER)
+
+
+def _get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_server(process: subprocess.Popen, port: int) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            with urlopen(URL_TML_RESIDENTS.format(port=port), timeout=1):
+                return
+        except (URLError, ConnectionError):
+            time.sleep(0.1)
+    raise TimeoutError(f'Server is not ready in {SERVER_START_TIMEOUT}s')
+
+
+def start_server(db_path: str, worker_class: str, threads: int, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        'DATABASES_DEFAULT_ENGINE': 'sqlite',
+        'DATABASES_DEFAULT_NAME': db_path,
+        'DATABASES_DEFAULT_SNAPSHOT_NAME': '',
+        'RESPONSE_CACHE_PATH': ''
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', '1',
+            '--worker-class', worker_class,
+            '--threads', str(threads),
+            '--log-level', 'warning',
+            'sgcc_alert.app:app'
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        _wait_server(process, port)
+    except:  # NOQA
+        process.terminate()
+        process.wait()
+        raise
+    return process
+
+
+def _request(url: str) -> bool:
+    try:
+        with urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+            response.read()
+            return response.status == 200
+    except (URLError, ConnectionError):
+        return False
+
+
+def measure_concurrency(
+    port: int,
+    resident_ids: List[int],
+    concurrency: int,
+    request_count: int,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    rand = random.Random(seed)
+    urls = [
+        URL_TML_RESIDENT_USAGES.format(port=port, resident_id=rand.choice(resident_ids))
+        for _ in range(request_count)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        oks = list(executor.map(_request, urls))
+    elapsed = time.perf_counter() - start
+    return {
+        'request_count': request_count,
+        'error_count': oks.count(False),
+        'elapsed': round(elapsed, 4),
+        'requests_per_second': round(request_count / elapsed, 2)
+    }
+
+
+def _iter_worker_modes(threads: int) -> Iterator[Dict[str, Any]]:
+    yield {'worker_class': 'sync', 'threads': 1}
+    yield {'worker_class': 'gthread', 'threads': threads}
+
+
+def run_load_test(
+    resident_count: int,
+    day_count: int,
+    concurrencies: Sequence[int],
+    request_count: int,
+    threads: int,
+    seed: Optional[int] = None
+) -> List[ServeResult]:
+    residents = build_residents(resident_count)
+    resident_ids = [resident['resident_id'] for resident in residents]
+    results: List[ServeResult] = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'sgcc.sqlite')
+        prepare_database(
+            {
+                'ENGINE': 'sqlite',
+                'NAME': db_path,
+                'OPTIONS': settings.DATABASES['default'].get('OPTIONS', {})
+            },
+            residents,
+            day_count
+        )
+        for worker_mode in _iter_worker_modes(threads):
+            port = _get_free_port()
+            process = start_server(db_path, worker_mode['worker_class'], worker_mode['threads'], port)
+            try:
+                for concurrency in concurrencies:
+                    # warm up connection pool of the worker
+                    measure_concurrency(port, resident_ids, concurrency, concurrency)
+                    result = measure_concurrency(port, resident_ids, concurrency, request_count, seed)
+                    results.append(
+                        {**worker_mode, 'concurrency': concurrency, **result}  # type: ignore[typeddict-item]
+                    )
+            finally:
+                process.terminate()
+                process.wait()
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--residents', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365, help='days of daily usages of each resident')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8], help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=400, help='requests on each concurrency')
+    parser.add_argument('--threads', type=int, default=8, help='threads of gthread worker')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config_logging('sgcc-alert-benchmark', settings.DEBUG)
+
+    results = run_load_test(args.residents, args.days, args.concurrency, args.requests, args.threads, args.seed)
+    for result in results:
+        logger.info(
+            f'{result["worker_class"]} worker with {result["threads"]} threads, '
+            f'concurrency {result["concurrency"]}: {result["request_count"]} requests '
+            f'({result["error_count"]} errors) in {result["elapsed"]}s, '
+            f'{result["requests_per_second"]} requests per second'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Compare the former text storage of usages with the compact one
+
+The former layout stores granularity name and ISO date text within rowid table,
+while the compact layout stores granularity code and ordinal date
+within table clustered by primary key (WITHOUT ROWID).
+Both of them are built as SQLite file with the same synthetic usages,
+then compared by file size and latency of usage history query
+
+Usage:
+    python -m sgcc_alert.benchmarks.storage --residents 100 --days 3650
+"""
+import argparse
+import datetime
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Any, cast, Dict, List, Optional, Sequence, TypedDict
+
+from sqlalchemy import (
+    Column,
+    create_engine,
+    Date,
+    desc,
+    Float,
+    Index,
+    insert,
+    Integer,
+    MetaData,
+    select,
+    String,
+    Table,
+    text
+)
+
+from ..conf import settings
+from ..constants import DateGranularity
+from ..databases.models import FactUsage
+from ..log import config_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+# fact_usage before storage is compacted
+LEGACY_METADATA = MetaData()
+LEGACY_FACT_USAGE = Table(
+    'fact_usage',
+    LEGACY_METADATA,
+    Column('resident_id', Integer, primary_key=True),
+    Column('date', Date, primary_key=True),
+    Column('granularity', String, primary_key=True),
+    Column('elec_usage', Float, nullable=True),
+    Column('elec_charge', Float, nullable=True),
+    Column('created_time', Integer, nullable=False),
+    Column('updated_time', Integer, nullable=False),
+    Index('ix_fact_usage_resident_id_granularity_date', 'resident_id', 'granularity', 'date')
+)
+
+
+class StorageResult(TypedDict):
+
+    layout: str
+    row_count: int
+    file_size: int              # unit is byte
+    mean_query_latency: float   # unit is millisecond
+
+
+def build_usages(resident_count: int, day_count: int) -> List[Dict[str, Any]]:
+    start_date = datetime.date(2000, 1, 1)
+    usages = []
+    for resident_id in range(1, resident_count + 1):
+        for idx in range(day_count):
+            date = start_date + datetime.timedelta(days=idx)
+            usages.append({
+                'resident_id': resident_id,
+                'date': date,
+                'granularity': DateGranularity.DAILY.value,
+                'elec_usage': float(idx % 10),
+                'elec_charge': idx % 10 * 0.5,
+                'created_time': 1700000000,
+                'updated_time': 1700000000
+            })
+            if date.day == 1:
+                usages.append({
+                    'resident_id': resident_id,
+                    'date': date,
+                    'granularity': DateGranularity.MONTHLY.value,
+                    'elec_usage': 300.0,
+                    'elec_charge': 150.0,
+                    'created_time': 1700000000,
+                    'updated_time': 1700000000
+                })
+    return usages
+
+
+def measure_layout(
+    layout: str,
+    table: Table,
+    db_path: str,
+    usages: List[Dict[str, Any]],
+    query_count: int,
+    seed: Optional[int] = None
+) -> StorageResult:
+    engine = create_engine(f'sqlite:///{db_path}')
+    table.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(table), usages)
+    with engine.connect() as conn:
+        conn.execute(text('VACUUM'))
+
+    resident_ids = sorted({usage['resident_id'] for usage in usages})
+    dates = sorted({usage['date'] for usage in usages})
+    rand = random.Random(seed)
+    elapsed = 0.0
+    with engine.connect() as conn:
+        for _ in range(query_count):
+            # latest month of daily usages before a random date
+            end_date = rand.choice(dates)
+            statement = select(
+                table.c.date,
+                table.c.granularity,
+                table.c.elec_usage,
+                table.c.elec_charge
+            ).where(
+                table.c.resident_id == rand.choice(resident_ids),
+                table.c.granularity == DateGranularity.DAILY.value,
+                table.c.date > end_date - datetime.timedelta(days=30),
+                table.c.date <= end_date
+            ).order_by(desc(table.c.date))
+            start = time.perf_counter()
+            conn.execute(statement).all()
+            elapsed += time.perf_counter() - start
+    engine.dispose()
+
+    return {
+        'layout': layout,
+        'row_count': len(usages),
+        'file_size': os.path.getsize(db_path),
+        'mean_query_latency': round(elapsed * 1000 / max(query_count, 1), 4)
+    }
+
+
+def compare_layouts(
+    resident_count: int,
+    day_count: int,
+    query_count: int,
+    seed: Optional[int] = None
+) -> List[StorageResult]:
+    usages = build_usages(resident_count, day_count)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        return [
+            measure_layout(
+                layout,
+                table,
+                os.path.join(tmp_dir, f'{layout}.sqlite'),
+                usages,
+                query_count,
+                seed
+            )
+            for layout, table in (
+                ('legacy', LEGACY_FACT_USAGE),
+                ('compact', cast(Table, FactUsage.__table__))
+            )
+        ]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--residents', type=int, default=100)
+    parser.add_argument('--days', type=int, default=3650, help='days of daily usages of each resident')
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config_logging('sgcc-alert-benchmark', settings.DEBUG)
+
+    results = compare_layouts(args.residents, args.days, args.queries, args.seed)
+    for result in results:
+        logger.info(
+            f'{result["layout"]}: {result["row_count"]} rows in {result["file_size"]} bytes, '
+            f'{result["mean_query_latency"]}ms per query'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+"""
+Response cache shared by web workers
+
+Responses are stored in SQLite file, keyed on route with normalised query arguments,
+along with the data version which they are built on, i.e. database token and data generation.
+Since the loader increases the generation once it commits changed data,
+and the token differs on another or reset database,
+responses built before are never hit again, and they are evicted on next store.
+Total size of responses is bounded by evicting the least recently used ones.
+Responses are stored as JSON encoded by the JSON provider of the application,
+along with the latest updated_time of their data, which conditional GET answers by.
+
+Reads don't write the file, hit and miss counters and access times are kept
+in process memory, and flushed by each store or every flush interval
+"""
+from contextlib import contextmanager
+from functools import wraps
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypedDict
+from urllib.parse import urlencode
+
+from flask import g, json, request
+
+from .conf import settings
+from .constants import RESPONSE_CACHE_BUSY_TIMEOUT, RESPONSE_CACHE_FLUSH_INTERVAL, RESPONSE_CACHE_LAYOUT_VERSION
+from .core.services.query_service import QueryService
+
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    'cached_response',
+    'configure_response_cache',
+    'get_cached_response',
+    'get_data_version',
+    'get_response_cache',
+    'ResponseCache'
+]
+
+
+SQL_CREATE_RESPONSE_CACHE = '''
+    CREATE TABLE IF NOT EXISTS response_cache (
+        key TEXT PRIMARY KEY,
+        version TEXT NOT NULL,
+        body TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        updated_time INTEGER,
+        elapsed REAL NOT NULL,
+        accessed_time REAL NOT NULL
+    )
+'''
+SQL_CREATE_RESPONSE_CACHE_STATS = '''
+    CREATE TABLE IF NOT EXISTS response_cache_stats (
+        id INTEGER PRIMARY KEY,
+        hits INTEGER NOT NULL,
+        misses INTEGER NOT NULL,
+        saved_latency REAL NOT NULL
+    )
+'''
+SQL_INIT_RESPONSE_CACHE_STATS = '''
+    INSERT OR IGNORE INTO response_cache_stats (id, hits, misses, saved_latency)
+    VALUES (1, 0, 0, 0.0)
+'''
+SQL_FLUSH_RESPONSE_CACHE_STATS = '''
+    UPDATE response_cache_stats
+    SET hits = hits + ?, misses = misses + ?, saved_latency = saved_latency + ?
+    WHERE id = 1
+'''
+
+
+class CachedResponse(TypedDict):
+
+    value: Any
+    updated_time: Optional[int]     # the latest updated_time of the data served by response
+
+
+class CacheStats(TypedDict):
+
+    hits: int
+    misses: int
+    hit_ratio: float
+    saved_latency: float    # unit is second, total latency saved by hits
+    size: int               # unit is byte
+    entry_count: int
+
+
+class PendingStats:
+    """
+    counters and access times of one process, which aren't flushed into the file yet
+    """
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+        self.saved_latency = 0.0
+        self.accessed_times: Dict[str, float] = {}
+        self.flushed_time = time.monotonic()
+
+
+class ResponseCache:
+
+    def __init__(self, path: str, max_size: int, flush_interval: float = RESPONSE_CACHE_FLUSH_INTERVAL) -> None:
+        self._path = path
+        self._max_size = max_size
+        self._flush_interval = flush_interval
+        # sqlite3 connection can't be shared by threads or forked processes
+        self._local = threading.local()
+        # pending stats are shared by threads of the process
+        self._lock = threading.Lock()
+        self._pending = PendingStats()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=RESPONSE_CACHE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != RESPONSE_CACHE_LAYOUT_VERSION:
+                # responses cached by former layout are disposable
+                with _transaction(conn):
+                    conn.execute('DROP TABLE IF EXISTS response_cache')
+                    conn.execute('DROP TABLE IF EXISTS response_cache_stats')
+                    conn.execute(f'PRAGMA user_version = {RESPONSE_CACHE_LAYOUT_VERSION}')
+            conn.execute(SQL_CREATE_RESPONSE_CACHE)
+            conn.execute(SQL_CREATE_RESPONSE_CACHE_STATS)
+            conn.execute(SQL_INIT_RESPONSE_CACHE_STATS)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _take_pending(self) -> PendingStats:
+        """
+        return pending stats of the process and start new ones,
+        the ones inherited from parent process are dropped since parent flushes them
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = PendingStats()
+        if pending.pid != os.getpid():
+            return PendingStats()
+        return pending
+
+    def _write_pending(self, conn: sqlite3.Connection, pending: PendingStats) -> None:
+        conn.execute(SQL_FLUSH_RESPONSE_CACHE_STATS, (pending.hits, pending.misses, pending.saved_latency))
+        conn.executemany(
+            'UPDATE response_cache SET accessed_time = ? WHERE key = ? AND accessed_time < ?',
+            [(accessed_time, key, accessed_time) for key, accessed_time in pending.accessed_times.items()]
+        )
+
+    def flush(self) -> None:
+        pending = self._take_pending()
+        if not (pending.hits or pending.misses):
+            return
+        conn = self._conn
+        with _transaction(conn):
+            self._write_pending(conn, pending)
+
+    def get(self, key: str, version: str) -> Optional[CachedResponse]:
+        """
+        return the cached response, or None if it isn't hit
+        """
+        start = time.perf_counter()
+        row = self._conn.execute(
+            'SELECT body, updated_time, elapsed FROM response_cache WHERE key = ? AND version = ?',
+            (key, version)
+        ).fetchone()
+        cached: Optional[CachedResponse] = (
+            {'value': json.loads(row[0]), 'updated_time': row[1]} if row is not None else None
+        )
+
+        with self._lock:
+            pending = self._pending
+            if pending.pid != os.getpid():
+                pending = self._pending = PendingStats()
+            if row is None:
+                pending.misses += 1
+            else:
+                pending.hits += 1
+                pending.saved_latency += max(row[2] - (time.perf_counter() - start), 0.0)
+                pending.accessed_times[key] = time.time()
+            is_due = time.monotonic() - pending.flushed_time >= self._flush_interval
+        if is_due:
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning(f'Failed to flush response cache stats: {e}')
+        return cached
+
+    def set(self, key: str, version: str, value: Any, elapsed: float, updated_time: Optional[int] = None) -> None:
+        """
+        elapsed is the latency of building the response, unit is second
+        """
+        body = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+        size = len(body.encode())
+        if size > self._max_size:
+            return
+
+        conn = self._conn
+        pending = self._take_pending()
+        with _transaction(conn):
+            self._write_pending(conn, pending)
+            conn.execute('DELETE FROM response_cache WHERE version != ?', (version,))
+            conn.execute(
+                'INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, version, body, size, updated_time, elapsed, time.time())
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total_size = 0
+        evicted_keys: List[Tuple[str]] = []
+        for key, size in conn.execute('SELECT key, size FROM response_cache ORDER BY accessed_time DESC'):
+            total_size += size
+            if total_size > self._max_size:
+                evicted_keys.append((key,))
+        conn.executemany('DELETE FROM response_cache WHERE key = ?', evicted_keys)
+
+    def get_stats(self) -> CacheStats:
+        """
+        stats of other processes are included once they are flushed
+        """
+        self.flush()
+        conn = self._conn
+        hits, misses, saved_latency = conn.execute(
+            'SELECT hits, misses, saved_latency FROM response_cache_stats WHERE id = 1'
+        ).fetchone()
+        size, entry_count = conn.execute('SELECT coalesce(sum(size), 0), count(*) FROM response_cache').fetchone()
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'saved_latency': round(saved_latency, 4),
+            'size': size,
+            'entry_count': entry_count
+        }
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    connection is in autocommit mode, which begins transaction explicitly
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except:  # NOQA
+        conn.execute('ROLLBACK')
+        raise
+
+
+_RESPONSE_CACHE: Optional[ResponseCache] = None
+_RESPONSE_CACHE_CONFIGURED = False
+
+
+def get_response_cache_path(path: str, db_conf: Optional[Dict[str, Any]] = None) -> str:
+    """
+    relative path is resolved next to SQLite database rather than working directory,
+    so that the cache follows the database it is built on
+    """
+    if db_conf is None:
+        db_conf = settings.DATABASES['default']
+    if os.path.isabs(path) or db_conf.get('ENGINE') != 'sqlite':
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(db_conf['NAME'])), path)
+
+
+def configure_response_cache(cache_conf: Optional[Dict[str, Any]] = None) -> None:
+    """
+    response cache is disabled when path isn't configured
+    """
+    global _RESPONSE_CACHE, _RESPONSE_CACHE_CONFIGURED
+    if cache_conf is None:
+        cache_conf = settings.RESPONSE_CACHE
+    _RESPONSE_CACHE = (
+        ResponseCache(get_response_cache_path(cache_conf['PATH']), int(cache_conf['MAX_SIZE']))
+        if cache_conf.get('PATH') else None
+    )
+    _RESPONSE_CACHE_CONFIGURED = True
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    if not _RESPONSE_CACHE_CONFIGURED:
+        configure_response_cache()
+    return _RESPONSE_CACHE
+
+
+def get_cache_key() -> str:
+    """
+    query arguments are sorted, so that their order doesn't matter
+    """
+    return f'{request.path}?{urlencode(sorted(request.args.items(multi=True)))}'
+
+
+def get_data_version() -> str:
+    """
+    data version is read once per request, and shared by response cache and conditional GET
+    """
+    if 'data_version' not in g:
+        g.data_version = QueryService.query_data_version()
+    return g.data_version
+
+
+def get_cached_response() -> Optional[CachedResponse]:
+    """
+    return the cached response of request, which is looked up once per request,
+    or None if it isn't hit or response cache is disabled
+    """
+    if 'cached_response' not in g:
+        cached = None
+        cache = get_response_cache()
+        if cache is not None:
+            try:
+                cached = cache.get(get_cache_key(), get_data_version())
+            except sqlite3.Error as e:
+                logger.warning(f'Failed to get response from cache: {e}')
+        g.cached_response = cached
+    return g.cached_response
+
+
+def cached_response(func: Callable) -> Callable:
+    """
+    A decorator to serve the response of controller from response cache,
+    updated_time of the response is stored along with it if conditional_response computes it
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = get_response_cache()
+        if cache is None:
+            return func(*args, **kwargs)
+
+        cached = get_cached_response()
+        if cached is not None:
+            return cached['value']
+
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        try:
+            cache.set(
+                get_cache_key(),
+                get_data_version(),
+                value,
+                time.perf_counter() - start,
+                g.get('response_updated_time')
+            )
+        except sqlite3.Error as e:
+            logger.warning(f'Failed to set response into cache: {e}')
+        return value
+
+    return wrapper
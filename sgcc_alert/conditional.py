@@ -0,0 +1,83 @@
+"""
+Conditional GET of responses
+
+Responses carry strong ETag, which is derived from route with query arguments and data version,
+i.e. database token and data generation increased once changed data is committed,
+so requests with matched If-None-Match are answered with 304 by reading data version only.
+Last-Modified is the latest updated_time of the data served by response,
+which is stored along with the cached response, so that fact tables are queried on cache miss only.
+Requests with If-Modified-Since without If-None-Match are answered with 304 as well
+"""
+import datetime
+from functools import wraps
+import hashlib
+from typing import Callable, Optional
+
+from flask import g, request, Response
+
+from .cache import get_cache_key, get_cached_response, get_data_version
+
+
+__all__ = [
+    'conditional_response'
+]
+
+
+def get_etag(version: str) -> str:
+    """
+    ETag differs on routes and query arguments, as well as on data
+    """
+    return hashlib.sha1(f'{get_cache_key()}|{version}'.encode()).hexdigest()
+
+
+def get_response_updated_time(get_updated_time: Callable[..., Optional[int]], *args, **kwargs) -> Optional[int]:
+    """
+    return updated_time stored along with the cached response,
+    or the one computed on cache miss, which cached_response stores then
+    """
+    cached = get_cached_response()
+    if cached is not None:
+        return cached['updated_time']
+    g.response_updated_time = get_updated_time(*args, **kwargs)
+    return g.response_updated_time
+
+
+def conditional_response(get_updated_time: Callable[..., Optional[int]]) -> Callable:
+    """
+    A decorator to serve controller conditionally
+    :params get_updated_time: called with the arguments of controller on cache miss,
+        return the latest updated_time of the data served by controller
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            etag = get_etag(get_data_version())
+            headers = {'ETag': f'"{etag}"'}
+            if request.if_none_match and request.if_none_match.contains(etag):
+                return Response(status=304, headers=headers)
+
+            updated_time = get_response_updated_time(get_updated_time, *args, **kwargs)
+            last_modified = (
+                datetime.datetime.fromtimestamp(updated_time, datetime.timezone.utc)
+                if updated_time is not None else None
+            )
+            if last_modified is not None:
+                headers['Last-Modified'] = last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+            # If-Modified-Since is ignored along with If-None-Match
+            if (
+                not request.if_none_match and request.if_modified_since is not None
+                and last_modified is not None and last_modified <= request.if_modified_since
+            ):
+                response = Response(status=304)
+            else:
+                response = func(*args, **kwargs)
+
+            if isinstance(response, Response):
+                response.headers.update(headers)
+                return response
+            return response, 200, headers
+
+        return wrapper
+
+    return decorator
@@ -18,7 +18,7 @@ from .constants import (
 )
 
 
-__all__ = ['settings']
+__all__ = ['resolve_settings_path', 'settings']
 
 
 class Settings:
@@ -173,3 +173,15 @@ def _string_to_float(value) -> float:
 
 
 settings = Settings()
+
+
+def resolve_settings_path(path: str) -> str:
+    """
+    relative path in settings is resolved against directory of settings module
+    rather than working directory, so that processes started from different directories
+    refer to the same file
+    """
+    mod_file = importlib.import_module(settings.settings_module).__file__
+    if os.path.isabs(path) or mod_file is None:
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(mod_file)), path)
@@ -3,6 +3,7 @@ Constants
 """
 from enum import Enum
 import re
+from typing import Any, Dict, List
 
 
 # ############################################
@@ -25,6 +26,7 @@ SGCC_PAGE_VISITING_INTERVAL = 1 * 1000  # millisecond
 SGCC_TIMEOUT = 10 * 1000
 SGCC_TIMEOUT_LOAD_CAPTCHA = 8 * 1000
 SGCC_TIMEOUT_LOAD_PAGE = 3 * 1000
+SGCC_LOGIN_STATE_CACHE_TTL = 60  # second
 
 
 # ###########################################################
@@ -102,7 +104,37 @@ SGCC_XPATH_USAGE_HIST_YEAR_DROPDOWN_BUTTON = (
 class DateGranularity(Enum):
 
     DAILY = 'daily'
+    WEEKLY = 'weekly'
     MONTHLY = 'monthly'
+    QUARTERLY = 'quarterly'
+    YEARLY = 'yearly'
+
+
+# codes of date granularities stored in database, which shouldn't be changed
+DATE_GRANULARITY_CODES = {
+    DateGranularity.DAILY.value: 1,
+    DateGranularity.WEEKLY.value: 2,
+    DateGranularity.MONTHLY.value: 3,
+    DateGranularity.QUARTERLY.value: 4,
+    DateGranularity.YEARLY.value: 5
+}
+
+
+# granularities collected from SGCC, which are stored in fact tables
+FACT_USAGE_GRANULARITIES = (DateGranularity.DAILY, DateGranularity.MONTHLY)
+# granularities rolled up from the ones in fact table
+ROLLUP_USAGE_SOURCE_GRANULARITIES = {
+    DateGranularity.WEEKLY: DateGranularity.DAILY,
+    DateGranularity.QUARTERLY: DateGranularity.MONTHLY,
+    DateGranularity.YEARLY: DateGranularity.MONTHLY
+}
+
+
+# days of daily usages collected by each scrape, i.e. the recent thirty days
+SGCC_DAILY_USAGE_SCRAPE_DAYS = 30
+# daily usages kept in database should cover the scraped days along with the week they start in,
+# so that days reloaded by each scrape are never archived ones
+DAILY_USAGE_RETENTION_MIN_DAYS = SGCC_DAILY_USAGE_SCRAPE_DAYS + 7
 
 
 DATE_FORMAT = '%Y-%m-%d'
@@ -115,8 +147,15 @@ DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 SGCC_LOGIN_CAPTCHA_DRAG_SLIDE_SPEED_UP_RATIO = 0.8
 SGCC_LOGIN_CAPTCHA_DRAG_SLIDE_SPEED_UP_ACCELERATION = 10.0
 SGCC_LOGIN_CAPTCHA_DRAG_SLIDE_TIME_STEP = 0.1
+# slide trajectory is dispatched as the count of coarse mouse moves,
+# 0 means dispatching each point of the trajectory one by one
+SGCC_LOGIN_CAPTCHA_DRAG_BATCH_COUNT = 6
+SGCC_LOGIN_CAPTCHA_DRAG_Y_SHAKE = 2.0
 SGCC_LOGIN_CAPTCHA_SLIDE_X_OFFSET_FACTOR = 1.05
 SGCC_LOGIN_CAPTCHA_REFRESH_RETRY_LIMIT = 5
+# how many ranked notch candidates are tried on the same captcha
+# before paying for a full refresh
+SGCC_LOGIN_CAPTCHA_CANDIDATE_LIMIT = 3
 
 
 # ###############
@@ -168,12 +207,86 @@ CANNY_UPPER_THRESHOLD = 100
 CV_BINARY_THRESH = 45.0
 CV_BINARY_MAXVAL = 255.0
 CV_KERNAL_SIZE = 4
+# relative size deviation between contour and slide block
+# which is still regarded as notch candidate
+CV_NOTCH_CANDIDATE_SIZE_TOLERANCE = 0.15
+# candidates whose x ordinates are closer than this are duplicated
+CV_NOTCH_CANDIDATE_MIN_X_DISTANCE = 5
+# search space of parameter tuning on labelled captcha corpus
+CV_TUNING_SEARCH_SPACE: Dict[str, List[Any]] = {
+    'canny_lower_threshold': [30, 50, 70],
+    'canny_upper_threshold': [100, 150, 200],
+    'binary_thresh': [35.0, 45.0, 55.0, 65.0],
+    'kernel_size': [3, 4, 5]
+}
+CV_TUNING_SLIDE_X_OFFSET_FACTORS = [1.0, 1.025, 1.05, 1.075, 1.1]
+# detected notch within the margin (pixel) of label is regarded as hit
+CV_TUNING_NOTCH_MARGIN_ERR = 5
 
 
 # ##########
 #  Database
 # ##########
-DATABASE_INIT_RETRY_LIMIT = 3
+# key of PostgreSQL advisory lock which serializes schema migrations
+DATABASE_MIGRATION_LOCK_KEY = 20250118
+
+
+class DatabaseRole(Enum):
+
+    READER = 'reader'  # API workers, which only query
+    WRITER = 'writer'  # periodic task, which loads the collected data
+
+
+# SQLite PRAGMAs applied on every connection
+# https://www.sqlite.org/pragma.html
+DATABASE_SQLITE_DEFAULT_OPTIONS = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'BUSY_TIMEOUT': 5000,           # millisecond
+    'CACHE_SIZE': -16000,           # negative value is KiB
+    'MMAP_SIZE': 128 * 1024 * 1024  # byte
+}
+DATABASE_SQLITE_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+DATABASE_SQLITE_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+DATABASE_READER_POOL_SIZE = 5
+# connections opened beyond pool size on demand,
+# pool size along with it should cover threads of each web worker
+DATABASE_READER_MAX_OVERFLOW = 10
+# rows sent in one round trip when driver doesn't batch executemany by itself
+DATABASE_EXECUTEMANY_PAGE_SIZE = 1000
+# connection pool of PostgreSQL readers
+# https://docs.sqlalchemy.org/en/20/core/pooling.html
+DATABASE_POSTGRESQL_DEFAULT_OPTIONS = {
+    'POOL_SIZE': 5,
+    'MAX_OVERFLOW': 10,
+    'POOL_TIMEOUT': 30,     # second
+    'POOL_RECYCLE': 1800,   # second
+    'POOL_PRE_PING': True
+}
+DATABASE_POSTGRESQL_DRIVER = 'postgresql+psycopg2'
+# Julian day of proleptic Gregorian ordinal 0, which converts ordinal dates stored by SQLite
+DATABASE_SQLITE_ORDINAL_JULIAN_DAY = 1721424.5
+
+
+# unit is second
+RESPONSE_CACHE_BUSY_TIMEOUT = 5.0
+# interval of flushing hit and miss counters and access times of each process,
+# unit is second
+RESPONSE_CACHE_FLUSH_INTERVAL = 10.0
+# stored by PRAGMA user_version of cache file,
+# which is increased on changing layout, so that former responses are dropped
+RESPONSE_CACHE_LAYOUT_VERSION = 2
+
+# days of recent daily usages on dashboard, till the latest one
+DASHBOARD_RECENT_DAYS = 30
+
+# statistics of usages in each period, computed by database
+# delta is the difference of sum to the previous period
+USAGE_STATISTICS_METRICS = ('sum', 'avg', 'min', 'max', 'count', 'delta')
+USAGE_STATISTICS_FIELDS = ('elec_usage', 'elec_charge')
+
+# rows fetched from server-side cursor and written at a time on export
+EXPORT_BATCH_SIZE = 1000
 
 
 # #################
@@ -2,20 +2,60 @@
 Controllers related to request handling
 """
 import datetime
-from typing import Dict
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 
-from flask import render_template, request
+from flask import render_template, request, Response, stream_with_context
+from werkzeug.exceptions import BadRequest
 
-from .core.services.query_service import QueryService
+from .cache import cached_response, get_response_cache
+from .conditional import conditional_response
+from .constants import USAGE_STATISTICS_METRICS
+from .core.services.query_service import (
+    BALANCE_COLUMNS,
+    QueryService,
+    RESIDENT_FACT_SORT_KEYS,
+    RESIDENT_SORT_KEYS,
+    SORT_KEY_TYPES,
+    USAGE_COLUMNS
+)
+from .core.utils.cursor import decode_cursor, encode_cursor
+from .core.utils.export import EXPORT_FORMATS
 
 
 def dashboard() -> str:
     return render_template('dashboard.html')
 
 
-def get_residents() -> Dict:
-    order_by = request.args.get('order_by')
-    order = request.args.get('order')
+def _get_date_arg(name: str) -> Optional[datetime.date]:
+    date_arg = request.args.get(name)
+    if date_arg is None:
+        return None
+    return datetime.datetime.strptime(date_arg, '%Y-%m-%d').date()
+
+
+def _get_resident_ids_arg() -> List[int]:
+    """
+    return the distinct resident IDs in the order of request
+    """
+    return list(dict.fromkeys(int(item) for item in request.args.getlist('resident_id')))
+
+
+def _is_columnar() -> bool:
+    """
+    series are returned as parallel arrays with constant fields once in columnar format,
+    or list of rows by default
+    """
+    return request.args.get('format') == 'columnar'
+
+
+def _get_pagination_args(
+    sort: str,
+    sort_keys: Sequence[str]
+) -> Tuple[Optional[int], Optional[int], Optional[Sequence[Any]]]:
+    """
+    return offset, limit and the sort key which cursor points after,
+    limit is added by one to tell whether there is next page
+    """
     offset_arg = request.args.get('offset')
     offset = None
     if offset_arg is not None:
@@ -23,111 +63,142 @@ def get_residents() -> Dict:
     limit_arg = request.args.get('limit')
     limit = None
     if limit_arg is not None:
-        limit = int(limit_arg)
+        limit = int(limit_arg) + 1
+
+    cursor = request.args.get('cursor')
+    after = None
+    if cursor is not None:
+        if offset:
+            raise BadRequest('offset and cursor are exclusive')
+        try:
+            after = decode_cursor(cursor, sort, [SORT_KEY_TYPES[key] for key in sort_keys])
+        except ValueError as e:
+            raise BadRequest(str(e))
+    return offset, limit, after
+
+
+def _paginate(result: Union[List[Any], Mapping[str, Any]], sort: str, sort_keys: Sequence[str]) -> Dict:
+    """
+    result is either list of rows, or parallel arrays in columnar format
+    """
+    limit_arg = request.args.get('limit')
+    if limit_arg is None:
+        return {
+            'data': result,
+            'pagination': None
+        }
+
+    limit = int(limit_arg)
+    data: Union[List[Any], Dict[str, Any]]
+    if isinstance(result, list):
+        has_next = len(result) > limit
+        data = result[:limit]
+        last_key = [data[-1][key] for key in sort_keys] if data else None
+    else:
+        has_next = len(result[sort_keys[0]]) > limit
+        data = {key: value[:limit] if isinstance(value, list) else value for key, value in result.items()}
+        last_key = [data[key][-1] for key in sort_keys] if data[sort_keys[0]] else None
+    cursor = request.args.get('cursor')
+    offset = None
+    next_offset = None
+    if cursor is None:
+        offset = int(request.args.get('offset') or 0)
+        next_offset = offset + limit if has_next else None
+    next_cursor = None
+    if has_next and last_key is not None:
+        next_cursor = encode_cursor(sort, last_key)
+    return {
+        'data': data,
+        'pagination': {
+            'offset': offset,
+            'limit': limit,
+            'next_offset': next_offset,
+            'cursor': cursor,
+            'next_cursor': next_cursor
+        }
+    }
+
+
+def _get_residents_updated_time() -> Optional[int]:
+    return QueryService.query_residents_updated_time()
+
+
+@conditional_response(_get_residents_updated_time)
+@cached_response
+def get_residents() -> Dict:
+    order_by = request.args.get('order_by') or 'resident_id'
+    order = request.args.get('order') or 'asc'
+    sort = f'{order_by}:{order}'
+    offset, limit, after = _get_pagination_args(sort, RESIDENT_SORT_KEYS[order_by])
 
     result = QueryService.query_residents(
         order_by,
         order,
         offset,
-        limit
+        limit,
+        after
     )
 
-    pagination = None
-    if limit is not None:
-        _offset = offset if offset else 0
-        pagination = {
-            'offset': _offset,
-            'limit': limit,
-            'next_offset': _offset + limit if len(result) == limit else None
-        }
+    return _paginate(result, sort, RESIDENT_SORT_KEYS[order_by])
 
-    return {
-        'data': result,
-        'pagination': pagination
-    }
 
+def _get_resident_balances_updated_time(resident_id: int) -> Optional[int]:
+    return QueryService.query_resident_balances_updated_time(resident_id)
 
+
+@conditional_response(_get_resident_balances_updated_time)
+@cached_response
 def get_resident_balances(resident_id: int) -> Dict:
-    start_date_arg = request.args.get('start_date')
-    start_date = None
-    if start_date_arg is not None:
-        start_date = datetime.datetime.strptime(
-            start_date_arg,
-            '%Y-%m-%d'
-        ).date()
-    end_date_arg = request.args.get('end_date')
-    end_date = None
-    if end_date_arg is not None:
-        end_date = datetime.datetime.strptime(
-            end_date_arg,
-            '%Y-%m-%d'
-        ).date()
-    order_by = request.args.get('order_by')
-    order = request.args.get('order')
-    offset_arg = request.args.get('offset')
-    offset = None
-    if offset_arg is not None:
-        offset = int(offset_arg)
-    limit_arg = request.args.get('limit')
-    limit = None
-    if limit_arg is not None:
-        limit = int(limit_arg)
+    start_date = _get_date_arg('start_date')
+    end_date = _get_date_arg('end_date')
+    order_by = request.args.get('order_by') or 'date'
+    order = request.args.get('order') or 'asc'
+    sort = f'{order_by}:{order}'
+    offset, limit, after = _get_pagination_args(sort, RESIDENT_FACT_SORT_KEYS[order_by])
 
-    result = QueryService.query_resident_balances(
+    query_func = (
+        QueryService.query_resident_balance_series
+        if _is_columnar() else QueryService.query_resident_balances
+    )
+    result = query_func(
         resident_id,
         start_date,
         end_date,
         order_by,
         order,
         offset,
-        limit
+        limit,
+        after
     )
 
-    pagination = None
-    if limit is not None:
-        _offset = offset if offset else 0
-        pagination = {
-            'offset': _offset,
-            'limit': limit,
-            'next_offset': _offset + limit if len(result) == limit else None
-        }
+    return _paginate(result, sort, RESIDENT_FACT_SORT_KEYS[order_by])
 
-    return {
-        'data': result,
-        'pagination': pagination
-    }
 
+def _get_resident_usages_updated_time(resident_id: int) -> Optional[int]:
+    return QueryService.query_resident_usages_updated_time(
+        resident_id,
+        request.args.get('granularity', 'monthly')
+    )
 
+
+@conditional_response(_get_resident_usages_updated_time)
+@cached_response
 def get_resident_usages(resident_id: int) -> Dict:
     granularity = request.args.get('granularity', 'monthly')
 
-    start_date_arg = request.args.get('start_date')
-    start_date = None
-    if start_date_arg is not None:
-        start_date = datetime.datetime.strptime(
-            start_date_arg,
-            '%Y-%m-%d'
-        ).date()
-    end_date_arg = request.args.get('end_date')
-    end_date = None
-    if end_date_arg is not None:
-        end_date = datetime.datetime.strptime(
-            end_date_arg,
-            '%Y-%m-%d'
-        ).date()
-
-    order_by = request.args.get('order_by')
-    order = request.args.get('order')
-    offset_arg = request.args.get('offset')
-    offset = None
-    if offset_arg is not None:
-        offset = int(offset_arg)
-    limit_arg = request.args.get('limit')
-    limit = None
-    if limit_arg is not None:
-        limit = int(limit_arg)
+    start_date = _get_date_arg('start_date')
+    end_date = _get_date_arg('end_date')
 
-    result = QueryService.query_resident_usages(
+    order_by = request.args.get('order_by') or 'date'
+    order = request.args.get('order') or 'asc'
+    sort = f'{order_by}:{order}'
+    offset, limit, after = _get_pagination_args(sort, RESIDENT_FACT_SORT_KEYS[order_by])
+
+    query_func = (
+        QueryService.query_resident_usage_series
+        if _is_columnar() else QueryService.query_resident_usages
+    )
+    result = query_func(
         resident_id,
         granularity,
         start_date,
@@ -135,19 +206,136 @@ def get_resident_usages(resident_id: int) -> Dict:
         order_by,
         order,
         offset,
-        limit
+        limit,
+        after
     )
 
-    pagination = None
-    if limit is not None:
-        _offset = offset if offset else 0
-        pagination = {
-            'offset': _offset,
-            'limit': limit,
-            'next_offset': _offset + limit if len(result) == limit else None
-        }
+    return _paginate(result, sort, RESIDENT_FACT_SORT_KEYS[order_by])
+
+
+def _get_residents_balances_updated_time() -> Optional[int]:
+    return QueryService.query_residents_balances_updated_time(_get_resident_ids_arg())
+
+
+@conditional_response(_get_residents_balances_updated_time)
+@cached_response
+def get_residents_balances() -> Dict:
+    resident_ids = _get_resident_ids_arg()
+    result = QueryService.query_residents_balances(
+        resident_ids,
+        _get_date_arg('start_date'),
+        _get_date_arg('end_date')
+    )
+    return {
+        'data': [
+            {'resident_id': resident_id, 'balances': balances}
+            for resident_id, balances in result.items()
+        ]
+    }
+
+
+def _get_residents_usages_updated_time() -> Optional[int]:
+    return QueryService.query_residents_usages_updated_time(
+        _get_resident_ids_arg(),
+        request.args.get('granularity', 'monthly')
+    )
+
+
+@conditional_response(_get_residents_usages_updated_time)
+@cached_response
+def get_residents_usages() -> Dict:
+    resident_ids = _get_resident_ids_arg()
+    result = QueryService.query_residents_usages(
+        resident_ids,
+        request.args.get('granularity', 'monthly'),
+        _get_date_arg('start_date'),
+        _get_date_arg('end_date')
+    )
+    return {
+        'data': [
+            {'resident_id': resident_id, 'usages': usages}
+            for resident_id, usages in result.items()
+        ]
+    }
+
+
+def _get_residents_usage_statistics_updated_time() -> Optional[int]:
+    return QueryService.query_residents_usages_updated_time(_get_resident_ids_arg(), 'daily')
+
+
+@conditional_response(_get_residents_usage_statistics_updated_time)
+@cached_response
+def get_residents_usage_statistics() -> Dict:
+    metrics = list(dict.fromkeys(request.args.getlist('metric'))) or USAGE_STATISTICS_METRICS
+    result = QueryService.query_residents_usage_statistics(
+        _get_resident_ids_arg(),
+        request.args.get('granularity', 'monthly'),
+        metrics,
+        request.args.get('field', 'elec_usage'),
+        _get_date_arg('start_date'),
+        _get_date_arg('end_date')
+    )
+    return {
+        'data': [
+            {'resident_id': resident_id, 'statistics': statistics}
+            for resident_id, statistics in result.items()
+        ]
+    }
+
+
+def _get_resident_dashboard_updated_time(resident_id: int) -> Optional[int]:
+    updated_times = [
+        QueryService.query_resident_balances_updated_time(resident_id),
+        QueryService.query_resident_usages_updated_time(resident_id, 'daily'),
+        QueryService.query_resident_usages_updated_time(resident_id, 'monthly')
+    ]
+    return max((item for item in updated_times if item is not None), default=None)
+
+
+@conditional_response(_get_resident_dashboard_updated_time)
+@cached_response
+def get_resident_dashboard(resident_id: int) -> Dict:
+    result = QueryService.query_resident_dashboard(
+        resident_id,
+        _get_date_arg('start_date'),
+        _get_date_arg('end_date'),
+        columnar=_is_columnar()
+    )
+    return {
+        'data': result
+    }
+
+
+def _stream_export(name: str, chunks: Iterator[str]) -> Response:
+    """
+    chunks are sent as they are formatted, within request context
+    """
+    export_format = request.args.get('format', 'ndjson')
+    mimetype, _ = EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={name}.{export_format}'}
+    )
+
+
+def export_usages() -> Response:
+    _, formatter = EXPORT_FORMATS[request.args.get('format', 'ndjson')]
+    batches = QueryService.iter_usages(
+        _get_resident_ids_arg() or None,
+        request.args.get('granularity')
+    )
+    return _stream_export('usages', formatter(USAGE_COLUMNS, batches))
+
+
+def export_balances() -> Response:
+    _, formatter = EXPORT_FORMATS[request.args.get('format', 'ndjson')]
+    batches = QueryService.iter_balances(_get_resident_ids_arg() or None)
+    return _stream_export('balances', formatter(BALANCE_COLUMNS, batches))
+
 
+def get_cache_stats() -> Dict:
+    cache = get_response_cache()
     return {
-        'data': result,
-        'pagination': pagination
+        'data': cache.get_stats() if cache is not None else None
     }
@@ -3,13 +3,14 @@ Utilities on login
 """
 import logging
 import random
-from typing import List, Tuple
+import time
+from typing import List, Optional, Tuple
 from urllib.parse import urlparse, urlunparse, urlencode
 
 from playwright.sync_api import Page
 from playwright._impl._errors import TimeoutError
 
-from .notch_service import NotchService
+from .notch_service import load_notch_params, NotchService
 from ..utils.common import retry
 from ..utils.page_action.common import load_locator
 from ...constants import (
@@ -17,11 +18,14 @@ from ...constants import (
     ERR_MSG_CAPTCHA_WRONG,
     ERR_MSG_REACH_LOGIN_LIMIT,
     ERR_MSG_WRONG_ACCOUNT_PWD,
+    SGCC_LOGIN_CAPTCHA_CANDIDATE_LIMIT,
+    SGCC_LOGIN_CAPTCHA_DRAG_BATCH_COUNT,
     SGCC_LOGIN_CAPTCHA_DRAG_SLIDE_SPEED_UP_RATIO,
     SGCC_LOGIN_CAPTCHA_DRAG_SLIDE_SPEED_UP_ACCELERATION,
     SGCC_LOGIN_CAPTCHA_DRAG_SLIDE_TIME_STEP,
-    SGCC_LOGIN_CAPTCHA_SLIDE_X_OFFSET_FACTOR,
+    SGCC_LOGIN_CAPTCHA_DRAG_Y_SHAKE,
     SGCC_LOGIN_CAPTCHA_REFRESH_RETRY_LIMIT,
+    SGCC_LOGIN_STATE_CACHE_TTL,
     SGCC_SCRIPT_TPL_IMG_ENCODE,
     SGCC_SCRIPT_TML_WAIT_CAPTCHA_CANVAS,
     SGCC_SELECTOR_LOGIN_CAPTCHA_BG_IMG,
@@ -48,6 +52,7 @@ from ...exceptions import (
     LoginError,
     LoginRateLimitError
 )
+from ...schemes import DragMove, NotchCandidate, NotchParams
 
 
 logger = logging.getLogger(__name__)
@@ -62,6 +67,8 @@ class SGCCLoginService:
         self._username = username
         self._password = password
         self._page = page
+        # login state with the monotonic time when it was checked
+        self._login_state: Optional[Tuple[bool, float]] = None
 
     @retry(
         retry_limit=SGCC_LOGIN_CAPTCHA_REFRESH_RETRY_LIMIT,
@@ -89,9 +96,44 @@ class SGCCLoginService:
         self._page.wait_for_timeout(timeout=SGCC_PAGE_VISITING_INTERVAL)
 
         self._verify_slide_captcha()
+        self._set_login_state(True)
         logger.info(f'{self._username} login succeed')
 
     def _is_login(self) -> bool:
+        """
+        1. reuse the login state checked within a short period
+        2. not login if browser context has no cookie of SGCC site,
+           which is always true for a fresh browser
+        3. otherwise verify the session on account page
+        """
+        if self._login_state is not None:
+            is_login, checked_time = self._login_state
+            if time.monotonic() - checked_time < SGCC_LOGIN_STATE_CACHE_TTL:
+                return is_login
+
+        if not self._has_site_cookies():
+            is_login = False
+        else:
+            is_login = self._verify_account_session()
+        self._set_login_state(is_login)
+        return is_login
+
+    def _set_login_state(self, is_login: bool) -> None:
+        self._login_state = (is_login, time.monotonic())
+
+    def _has_site_cookies(self) -> bool:
+        """
+        check whether there is any unexpired cookie for SGCC site,
+        without any page navigation
+        """
+        now = time.time()
+        cookies = self._page.context.cookies([SGCC_WEB_URL_LOGIN])
+        return any(
+            cookie.get('expires', -1) < 0 or cookie.get('expires', -1) > now
+            for cookie in cookies
+        )
+
+    def _verify_account_session(self) -> bool:
         """
         1. check whether the page has account session or not
         2. check whether login user is given one or not
@@ -231,11 +273,12 @@ class SGCCLoginService:
         exceptions=(CaptchaValidationError,)
     )
     def _verify_slide_captcha(self) -> None:
-        x_ordinate, _ = _identify_notch_ordinate(self._page)
+        notch_params = load_notch_params()
+        bg_data_url, candidates = _identify_notch_candidates(self._page, notch_params)
 
-        # when x_ordinate is equal to 0, it means no effective identification
+        # when there is no candidate, it means no effective identification
         retries = 0
-        while x_ordinate == 0 and retries < SGCC_LOGIN_CAPTCHA_REFRESH_RETRY_LIMIT:
+        while not candidates and retries < SGCC_LOGIN_CAPTCHA_REFRESH_RETRY_LIMIT:
             logger.warning(
                 f'Retrying identify captcha notch '
                 f'{retries} / {SGCC_LOGIN_CAPTCHA_REFRESH_RETRY_LIMIT}'
@@ -248,22 +291,40 @@ class SGCCLoginService:
             self._page.wait_for_timeout(timeout=SGCC_PAGE_VISITING_INTERVAL)
             self._popup_captcha_with_clicking_login()
 
-            x_ordinate, _ = _identify_notch_ordinate(self._page)
+            bg_data_url, candidates = _identify_notch_candidates(self._page, notch_params)
             retries += 1
             self._page.wait_for_timeout(timeout=SGCC_PAGE_VISITING_INTERVAL)
 
         # raise without attempt to save daily login times limit
-        if x_ordinate == 0:
+        if not candidates:
             raise CaptchaValidationError()
 
-        self._page.wait_for_timeout(timeout=SGCC_PAGE_VISITING_INTERVAL)
-
-        # the factor on x_offset is from experience
-        # which makes the slide block being in place
-        _slide_block(self._page, x_ordinate * SGCC_LOGIN_CAPTCHA_SLIDE_X_OFFSET_FACTOR)
+        candidates = candidates[: SGCC_LOGIN_CAPTCHA_CANDIDATE_LIMIT]
+        for idx, candidate in enumerate(candidates, start=1):
+            self._page.wait_for_timeout(timeout=SGCC_PAGE_VISITING_INTERVAL)
 
-        self._page.wait_for_timeout(timeout=SGCC_TIMEOUT_LOAD_PAGE)
+            # the factor on x_offset is from experience or tuning
+            # which makes the slide block being in place
+            _slide_block(self._page, candidate['x'] * notch_params['slide_x_offset_factor'])
+
+            self._page.wait_for_timeout(timeout=SGCC_TIMEOUT_LOAD_PAGE)
+
+            try:
+                self._check_login_result()
+            except CaptchaValidationError:
+                # try the next best candidate only if the site keeps the same captcha,
+                # otherwise leave the refreshed one to next round
+                if idx == len(candidates) or not self._is_same_captcha(bg_data_url):
+                    raise
+                logger.warning(
+                    f'Retrying next captcha notch candidate '
+                    f'{idx} / {len(candidates)} on the same captcha'
+                )
+            else:
+                logger.info(f'Captcha verification passed with notch candidate {idx} / {len(candidates)}')
+                return None
 
+    def _check_login_result(self) -> None:
         err_tip_div = self._page.locator(SGCC_SELECTOR_LOGIN_ERR_TIPS_CLASS)
         if err_tip_div.is_visible():
             err_msg = err_tip_div.locator('span').text_content()
@@ -279,15 +340,35 @@ class SGCCLoginService:
         if self._page.url == SGCC_WEB_URL_LOGIN:
             raise LoginError('Login failed with unknown error')
 
+    def _is_same_captcha(self, bg_data_url: Optional[str]) -> bool:
+        """
+        check whether the captcha is still visible with the same background image
+        """
+        captcha_div_locator = self._page.locator(
+            f'xpath={SGCC_XPATH_LOGIN_CAPTCHA_DIV}'
+        )
+        if not captcha_div_locator.is_visible():
+            return False
+        cur_bg_data_url, _ = _get_slide_captcha_raw_images(self._page)
+        return cur_bg_data_url == bg_data_url
+
 
-def _identify_notch_ordinate(page: Page) -> Tuple[int, int]:
+def _identify_notch_candidates(
+    page: Page,
+    notch_params: NotchParams
+) -> Tuple[Optional[str], List[NotchCandidate]]:
+    """
+    return the data URL of background image
+    and ranked notch candidates on it
+    """
     bg_data_url, slide_data_url = _get_slide_captcha_raw_images(page)
-    notch_service = NotchService(bg_data_url, slide_data_url)
-    x_ordinate, y_ordinate = notch_service.locate_notch()
-    return x_ordinate, y_ordinate
+    if bg_data_url is None or slide_data_url is None:
+        return bg_data_url, []
+    notch_service = NotchService(bg_data_url, slide_data_url, notch_params)
+    return bg_data_url, notch_service.rank_notch_candidates()
 
 
-def _get_slide_captcha_raw_images(page: Page) -> Tuple[str, str]:
+def _get_slide_captcha_raw_images(page: Page) -> Tuple[Optional[str], Optional[str]]:
     """
     get data URL of canvas for slide captcha's
     background image and block image
@@ -304,10 +385,18 @@ def _get_slide_captcha_raw_images(page: Page) -> Tuple[str, str]:
     return bg_img_data_url, slide_img_data_url
 
 
-def _slide_block(page: Page, x_offset: float) -> None:
+def _slide_block(
+    page: Page,
+    x_offset: float,
+    batch_count: int = SGCC_LOGIN_CAPTCHA_DRAG_BATCH_COUNT
+) -> None:
     """
     assume the page is with captcha,
     verify by slide action with the distance according to given offset
+
+    the whole trajectory is computed in advance,
+    then dispatched by a few coarse moves whose intermediate events
+    are interpolated by the browser driver instead of round trips from here
     """
     slide_button_locator = page.locator(
         f'xpath={SGCC_XPATH_LOGIN_CAPTCHA_SLIDE_BUTTON}'
@@ -319,18 +408,61 @@ def _slide_block(page: Page, x_offset: float) -> None:
     slide_button_x_ordinate = slide_button_box['x'] + slide_button_box['width'] / 2
     slide_button_y_ordinate = slide_button_box['y'] + slide_button_box['height'] / 2
 
+    moves = _batch_drag_moves(_simulate_drag_moves(x_offset), batch_count)
+
+    start = time.perf_counter()
     page.mouse.move(slide_button_x_ordinate, slide_button_y_ordinate)
     page.mouse.down()
-    for sub_x_offset in _simulate_horizontal_move_tracks(x_offset):
-        sub_dest_x = slide_button_x_ordinate + sub_x_offset
+    for move in moves:
+        page.mouse.move(
+            slide_button_x_ordinate + move['x_offset'],
+            slide_button_y_ordinate + move['y_offset'],
+            steps=move['steps']
+        )
+    page.mouse.up()
+    logger.info(
+        f'Slide block by {x_offset:.2f} px with {len(moves)} mouse moves '
+        f'in {time.perf_counter() - start:.3f}s'
+    )
 
-        # simulate the shake when slide
-        sub_y_offset = random.uniform(-2, 2)
-        sub_dest_y = slide_button_y_ordinate + sub_y_offset
 
-        page.mouse.move(sub_dest_x, sub_dest_y)
+def _simulate_drag_moves(x_offset: float) -> List[DragMove]:
+    """
+    build each point of the trajectory,
+    simulating the shake when slide on vertical direction
+    """
+    return [
+        {
+            'x_offset': sub_x_offset,
+            'y_offset': random.uniform(-SGCC_LOGIN_CAPTCHA_DRAG_Y_SHAKE, SGCC_LOGIN_CAPTCHA_DRAG_Y_SHAKE),
+            'steps': 1
+        }
+        for sub_x_offset in _simulate_horizontal_move_tracks(x_offset)
+    ]
 
-    page.mouse.up()
+
+def _batch_drag_moves(moves: List[DragMove], batch_count: int) -> List[DragMove]:
+    """
+    merge consecutive moves into batch_count coarse ones,
+    each ends at the last point of its batch with the steps of merged points,
+    so the speed up and speed down profile is kept piecewise
+    """
+    if batch_count <= 0 or batch_count >= len(moves):
+        return moves
+
+    batches: List[DragMove] = []
+    batch_size, remainder = divmod(len(moves), batch_count)
+    start = 0
+    for idx in range(batch_count):
+        end = start + batch_size + (1 if idx < remainder else 0)
+        last_move = moves[end - 1]
+        batches.append({
+            'x_offset': last_move['x_offset'],
+            'y_offset': last_move['y_offset'],
+            'steps': sum(move['steps'] for move in moves[start: end])
+        })
+        start = end
+    return batches
 
 
 def _simulate_horizontal_move_tracks(x_offset: float) -> List[float]:
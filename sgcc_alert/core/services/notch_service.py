@@ -3,24 +3,75 @@ Service for detect the notch in slide captcha
 """
 import base64
 import io
-from typing import Tuple
+import json
+import logging
+import pathlib
+from typing import List, Optional, Tuple
 
 import cv2
 import numpy as np
 from PIL import Image
 
+from ...conf import resolve_settings_path, settings
 from ...constants import (
     CANNY_LOWER_THRESHOLD,
     CANNY_UPPER_THRESHOLD,
     CV_BINARY_THRESH,
     CV_BINARY_MAXVAL,
-    CV_KERNAL_SIZE
+    CV_KERNAL_SIZE,
+    CV_NOTCH_CANDIDATE_MIN_X_DISTANCE,
+    CV_NOTCH_CANDIDATE_SIZE_TOLERANCE,
+    SGCC_LOGIN_CAPTCHA_SLIDE_X_OFFSET_FACTOR
 )
+from ...schemes import NotchCandidate, NotchParams
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_NOTCH_PARAMS: NotchParams = {
+    'canny_lower_threshold': CANNY_LOWER_THRESHOLD,
+    'canny_upper_threshold': CANNY_UPPER_THRESHOLD,
+    'binary_thresh': CV_BINARY_THRESH,
+    'kernel_size': CV_KERNAL_SIZE,
+    'slide_x_offset_factor': SGCC_LOGIN_CAPTCHA_SLIDE_X_OFFSET_FACTOR
+}
+
+
+def load_notch_params(path: Optional[str] = None) -> NotchParams:
+    """
+    load tuned parameters from JSON file,
+    the missing ones fall back to built-in parameters
+    """
+    if path is None:
+        path = resolve_settings_path(settings.CAPTCHA_NOTCH_PARAMS_PATH)
+
+    params_path_obj = pathlib.Path(path)
+    if not params_path_obj.is_file():
+        return DEFAULT_NOTCH_PARAMS.copy()
+
+    with params_path_obj.open('r') as f:
+        tuned_params = {**DEFAULT_NOTCH_PARAMS, **json.load(f)}
+    params: NotchParams = {
+        'canny_lower_threshold': int(tuned_params['canny_lower_threshold']),
+        'canny_upper_threshold': int(tuned_params['canny_upper_threshold']),
+        'binary_thresh': float(tuned_params['binary_thresh']),
+        'kernel_size': int(tuned_params['kernel_size']),
+        'slide_x_offset_factor': float(tuned_params['slide_x_offset_factor'])
+    }
+    logger.info(f'Captcha notch parameters loaded from {path}: {params}')
+    return params
 
 
 class NotchService:
 
-    def __init__(self, bg_data_url: str, slide_data_url: str):
+    def __init__(
+        self,
+        bg_data_url: str,
+        slide_data_url: str,
+        params: Optional[NotchParams] = None
+    ):
+        self._params = load_notch_params() if params is None else params
         self._bg_data_url = bg_data_url
         self._bg_bytes = self._decode_img_data_url(bg_data_url)
         self._slide_data_url = slide_data_url
@@ -42,16 +93,33 @@ class NotchService:
     def slide_bytes(self) -> bytes:
         return self._slide_bytes
 
+    @property
+    def params(self) -> NotchParams:
+        return self._params
+
     def locate_notch(self) -> Tuple[int, int]:
         """
         recognize the notch for slide block in background image
-        return the coordinate point of notch's left top
+        return the coordinate point of notch's left top,
+        which is (0, 0) when there is no candidate
+        """
+        candidates = self.rank_notch_candidates()
+        if not candidates:
+            return 0, 0
+        best_candidate = candidates[0]
+        return best_candidate['x'], best_candidate['y']
+
+    def rank_notch_candidates(self) -> List[NotchCandidate]:
+        """
+        recognize all contours whose size is close to slide block's
+        return them sorted by score in descending order,
+        the ones with approximate x ordinate are merged into the best of them
         """
         bg_cv_np = self._preprocess_background()
         bg_cv_cannied_np = cv2.Canny(
             bg_cv_np,
-            CANNY_LOWER_THRESHOLD,
-            CANNY_UPPER_THRESHOLD
+            self._params['canny_lower_threshold'],
+            self._params['canny_upper_threshold']
         )
         contours, _ = cv2.findContours(
             bg_cv_cannied_np,
@@ -60,17 +128,32 @@ class NotchService:
         )
 
         slide_width, slide_height = self.parse_slide_size()
-        dx, dy = 0, 0
-        for i, contour in enumerate(contours):
+        scored_candidates: List[NotchCandidate] = []
+        for contour in contours:
             x, y, w, h = cv2.boundingRect(contour)
-            if all([
-                (abs(w - slide_width) / slide_width <= 0.05),
-                (abs(h - slide_height) / slide_height <= 0.05)
-            ]):
-                dx = x
-                dy = y
-
-        return dx, dy
+            deviation = max(
+                abs(w - slide_width) / slide_width,
+                abs(h - slide_height) / slide_height
+            )
+            if deviation > CV_NOTCH_CANDIDATE_SIZE_TOLERANCE:
+                continue
+            scored_candidates.append({
+                'x': x,
+                'y': y,
+                'score': round(1 - deviation / CV_NOTCH_CANDIDATE_SIZE_TOLERANCE, 4)
+            })
+        # stable sort keeps the order of contours with same score
+        scored_candidates.sort(key=lambda item: item['score'], reverse=True)
+
+        candidates: List[NotchCandidate] = []
+        for candidate in scored_candidates:
+            if any(
+                abs(candidate['x'] - item['x']) < CV_NOTCH_CANDIDATE_MIN_X_DISTANCE
+                for item in candidates
+            ):
+                continue
+            candidates.append(candidate)
+        return candidates
 
     def parse_slide_size(self) -> Tuple[int, int]:
         """
@@ -115,10 +198,11 @@ class NotchService:
         bg_cv_gray_np = cv2.cvtColor(bg_cv_np, cv2.COLOR_BGR2GRAY)
         _, bg_cv_binary_np = cv2.threshold(
             bg_cv_gray_np,
-            CV_BINARY_THRESH,
+            self._params['binary_thresh'],
             CV_BINARY_MAXVAL,
             cv2.THRESH_BINARY_INV
         )
-        kernel = np.ones((CV_KERNAL_SIZE, CV_KERNAL_SIZE), np.uint8)
+        kernel_size = self._params['kernel_size']
+        kernel = np.ones((kernel_size, kernel_size), np.uint8)
         bg_cv_cleaned_binary_np = cv2.morphologyEx(bg_cv_binary_np, cv2.MORPH_OPEN, kernel)
         return bg_cv_cleaned_binary_np
@@ -2,15 +2,53 @@
 Query service
 """
 import datetime
-from typing import cast, Dict, List, Optional
+from itertools import islice
+from typing import Any, cast, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Union
 
-from sqlalchemy import asc, desc
+from sqlalchemy import and_, asc, case, cast as sql_cast, Date, desc, false, func, Integer, literal_column, or_, select
+from sqlalchemy import type_coerce
+from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.orm import Query, scoped_session
 
-from ...constants import DateGranularity
-from ...databases.models import DimResident, FactBalance, FactUsage
+from ..utils.archive import (
+    get_archived_years,
+    get_hot_window_start,
+    iter_archived_usages,
+    read_archive,
+    read_archived_usages
+)
+from ..utils.common import get_period_end, get_period_start
+from ...constants import (
+    DASHBOARD_RECENT_DAYS,
+    DATABASE_SQLITE_ORDINAL_JULIAN_DAY,
+    DateGranularity,
+    EXPORT_BATCH_SIZE,
+    ROLLUP_USAGE_SOURCE_GRANULARITIES,
+    USAGE_STATISTICS_METRICS
+)
+from ...databases.models import AggUsage, DataGeneration, DimResident, FactBalance, FactUsage, OrdinalDateType
 from ...databases.session import managed_session
-from ...schemes import Balance, Resident, Usage
+from ...schemes import Balance, BalanceSeries, Dashboard, Resident, Usage, UsageSeries, UsageStatistics
+
+
+# columns ordering the listings, which identify the row as keyset pagination needs
+RESIDENT_SORT_KEYS = {
+    'resident_id': ('resident_id',),
+    'resident_address': ('resident_address', 'resident_id')
+}
+RESIDENT_FACT_SORT_KEYS = {
+    'date': ('date',)
+}
+# types which values of sort key columns are decoded from cursor as, None for nullable columns
+SORT_KEY_TYPES: Dict[str, Tuple[Type, ...]] = {
+    'resident_id': (int,),
+    'resident_address': (str, type(None)),
+    'date': (datetime.date,)
+}
+
+# columns of rows streamed on export
+USAGE_COLUMNS = ('resident_id', 'date', 'granularity', 'elec_usage', 'elec_charge')
+BALANCE_COLUMNS = ('resident_id', 'date', 'granularity', 'balance', 'est_remain_days')
 
 
 class QueryService:
@@ -96,15 +134,20 @@ class QueryService:
         order_by: Optional[str] = 'resident_id',
         order: Optional[str] = 'asc',
         offset: Optional[int] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
     ) -> List[Resident]:
+        """
+        :params after: sort key of the row, the ones after which are queried
+        """
         with managed_session() as session:
             result = cls._query_residents(
                 session,
                 order_by,
                 order,
                 offset,
-                limit
+                limit,
+                after
             )
         return result
 
@@ -115,7 +158,8 @@ class QueryService:
         order_by: Optional[str] = 'resident_id',
         order: Optional[str] = 'asc',
         offset: Optional[int] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
     ) -> List[Resident]:
         if order_by is None:
             order_by = 'resident_id'
@@ -130,7 +174,10 @@ class QueryService:
         )
 
         order_func = get_order_func(order)
-        query = query.order_by(order_func(getattr(DimResident, order_by)))
+        sort_columns = [getattr(DimResident, key) for key in RESIDENT_SORT_KEYS[order_by]]
+        query = query.order_by(*[order_func(column) for column in sort_columns])
+        if after is not None:
+            query = query.filter(get_keyset_condition(session, sort_columns, after, order))
 
         if offset is not None:
             query = query.offset(offset)
@@ -152,8 +199,12 @@ class QueryService:
         order_by: Optional[str] = 'date',
         order: Optional[str] = 'asc',
         offset: Optional[int] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
     ) -> List[Balance]:
+        """
+        :params after: sort key of the row, the ones after which are queried
+        """
         with managed_session() as session:
             result = cls._query_resident_balances(
                 session,
@@ -163,7 +214,8 @@ class QueryService:
                 order_by,
                 order,
                 offset,
-                limit
+                limit,
+                after
             )
         return result
 
@@ -177,8 +229,79 @@ class QueryService:
         order_by: Optional[str] = 'date',
         order: Optional[str] = 'asc',
         offset: Optional[int] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
     ) -> List[Balance]:
+        query = cls._get_resident_balances_query(
+            session,
+            resident_id,
+            start_date,
+            end_date,
+            order_by,
+            order,
+            offset,
+            limit,
+            after
+        )
+        columns = [column['name'] for column in query.column_descriptions]
+        result = cast(
+            List[Balance],
+            [dict(zip(columns, item)) for item in query.all()]
+        )
+        return result
+
+    @classmethod
+    def query_resident_balance_series(
+        cls,
+        resident_id: int,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        order_by: Optional[str] = 'date',
+        order: Optional[str] = 'asc',
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
+    ) -> BalanceSeries:
+        """
+        query balances as query_resident_balances does,
+        return them as parallel arrays, with constant fields once
+        """
+        with managed_session() as session:
+            query = cls._get_resident_balances_query(
+                session,
+                resident_id,
+                start_date,
+                end_date,
+                order_by,
+                order,
+                offset,
+                limit,
+                after
+            ).with_entities(
+                FactBalance.date,
+                FactBalance.balance,
+                FactBalance.est_remain_days
+            )
+            series = get_series(query)
+        result = cast(
+            BalanceSeries,
+            {'resident_id': resident_id, 'granularity': DateGranularity.DAILY.value, **series}
+        )
+        return result
+
+    @classmethod
+    def _get_resident_balances_query(
+        cls,
+        session: scoped_session,
+        resident_id: int,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        order_by: Optional[str] = 'date',
+        order: Optional[str] = 'asc',
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
+    ) -> Query:
         if order_by is None:
             order_by = 'date'
         if order is None:
@@ -200,18 +323,16 @@ class QueryService:
             query = query.filter(FactBalance.date <= end_date)
 
         order_func = get_order_func(order)
-        query = query.order_by(order_func(getattr(FactBalance, order_by)))
+        sort_columns = [getattr(FactBalance, key) for key in RESIDENT_FACT_SORT_KEYS[order_by]]
+        query = query.order_by(*[order_func(column) for column in sort_columns])
+        if after is not None:
+            query = query.filter(get_keyset_condition(session, sort_columns, after, order))
 
         if offset is not None:
             query = query.offset(offset)
         if limit is not None:
             query = query.limit(limit)
-        columns = [column['name'] for column in query.column_descriptions]
-        result = cast(
-            List[Balance],
-            [dict(zip(columns, item)) for item in query.all()]
-        )
-        return result
+        return query
 
     @classmethod
     def query_resident_usages(
@@ -223,8 +344,31 @@ class QueryService:
         order_by: Optional[str] = 'date',
         order: Optional[str] = 'asc',
         offset: Optional[int] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
     ) -> List[Usage]:
+        """
+        :params after: sort key of the row, the ones after which are queried
+        """
+        hot_window_start = get_hot_window_start()
+        if (
+            granularity == DateGranularity.DAILY.value
+            and hot_window_start is not None
+            and (start_date is None or start_date < hot_window_start)
+        ):
+            # requested range reaches archived daily usages
+            return cls._query_resident_usages_with_archive(
+                resident_id,
+                hot_window_start,
+                start_date,
+                end_date,
+                order_by,
+                order,
+                offset,
+                limit,
+                after
+            )
+
         with managed_session() as session:
             result = cls._query_resident_usages(
                 session,
@@ -235,10 +379,73 @@ class QueryService:
                 order_by,
                 order,
                 offset,
-                limit
+                limit,
+                after
             )
         return result
 
+    @classmethod
+    def _query_resident_usages_with_archive(
+        cls,
+        resident_id: int,
+        hot_window_start: datetime.date,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        order_by: Optional[str] = 'date',
+        order: Optional[str] = 'asc',
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
+    ) -> List[Usage]:
+        """
+        query daily usages in database and archive, then merge and paginate them in memory,
+        the first offset + limit ones after the sort key are taken from each of them,
+        so that the work of a page is bounded by its size rather than the depth of history
+        """
+        if order_by is None:
+            order_by = 'date'
+        if order is None:
+            order = 'asc'
+        get_order_func(order)
+        is_desc = order == 'desc'
+        start = offset or 0
+        stop = start + limit if limit is not None else None
+
+        with managed_session() as session:
+            hot_usages = cls._query_resident_usages(
+                session,
+                resident_id,
+                DateGranularity.DAILY.value,
+                start_date,
+                end_date,
+                order_by,
+                order,
+                None,
+                stop,
+                after
+            )
+
+        # archived days are older than hot window, and only the ones after the sort key are read,
+        # whose only column is date
+        archived_start_date = start_date
+        archived_end_date = hot_window_start - datetime.timedelta(days=1)
+        if end_date is not None:
+            archived_end_date = min(archived_end_date, end_date)
+        if after is not None and is_desc:
+            archived_end_date = min(archived_end_date, after[0] - datetime.timedelta(days=1))
+        elif after is not None:
+            after_start_date = after[0] + datetime.timedelta(days=1)
+            archived_start_date = after_start_date if start_date is None else max(start_date, after_start_date)
+        archived_usages: Iterator[Usage] = iter([])
+        if archived_start_date is None or archived_start_date <= archived_end_date:
+            archived_usages = iter_archived_usages(resident_id, archived_start_date, archived_end_date, is_desc)
+
+        # the ones in database win since they are not archived yet
+        usages = {usage['date']: usage for usage in islice(archived_usages, stop)}
+        usages.update({usage['date']: usage for usage in hot_usages})
+        result = sorted(usages.values(), key=lambda item: item['date'], reverse=is_desc)
+        return result[start: stop]
+
     @classmethod
     def _query_resident_usages(
         cls,
@@ -250,42 +457,763 @@ class QueryService:
         order_by: Optional[str] = 'date',
         order: Optional[str] = 'asc',
         offset: Optional[int] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
     ) -> List[Usage]:
+        query = cls._get_resident_usages_query(
+            session,
+            resident_id,
+            granularity,
+            start_date,
+            end_date,
+            order_by,
+            order,
+            offset,
+            limit,
+            after
+        )
+        columns = [column['name'] for column in query.column_descriptions]
+        result = cast(
+            List[Usage],
+            [dict(zip(columns, item)) for item in query.all()]
+        )
+        return result
+
+    @classmethod
+    def query_resident_usage_series(
+        cls,
+        resident_id: int,
+        granularity: str,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        order_by: Optional[str] = 'date',
+        order: Optional[str] = 'asc',
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
+    ) -> UsageSeries:
+        """
+        query usages as query_resident_usages does,
+        return them as parallel arrays, with constant fields once
+        """
+        hot_window_start = get_hot_window_start()
+        if (
+            granularity == DateGranularity.DAILY.value
+            and hot_window_start is not None
+            and (start_date is None or start_date < hot_window_start)
+        ):
+            # archived usages are merged in memory anyway
+            usages = cls._query_resident_usages_with_archive(
+                resident_id,
+                hot_window_start,
+                start_date,
+                end_date,
+                order_by,
+                order,
+                offset,
+                limit,
+                after
+            )
+            return get_usage_series(resident_id, granularity, usages)
+
+        with managed_session() as session:
+            result = cls._query_resident_usage_series(
+                session,
+                resident_id,
+                granularity,
+                start_date,
+                end_date,
+                order_by,
+                order,
+                offset,
+                limit,
+                after
+            )
+        return result
+
+    @classmethod
+    def _query_resident_usage_series(
+        cls,
+        session: scoped_session,
+        resident_id: int,
+        granularity: str,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        order_by: Optional[str] = 'date',
+        order: Optional[str] = 'asc',
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
+    ) -> UsageSeries:
+        model = get_usage_model(granularity)
+        query = cls._get_resident_usages_query(
+            session,
+            resident_id,
+            granularity,
+            start_date,
+            end_date,
+            order_by,
+            order,
+            offset,
+            limit,
+            after
+        ).with_entities(
+            model.date,
+            model.elec_usage,
+            model.elec_charge
+        )
+        result = cast(
+            UsageSeries,
+            {'resident_id': resident_id, 'granularity': granularity, **get_series(query)}
+        )
+        return result
+
+    @classmethod
+    def _get_resident_usages_query(
+        cls,
+        session: scoped_session,
+        resident_id: int,
+        granularity: str,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        order_by: Optional[str] = 'date',
+        order: Optional[str] = 'asc',
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
+    ) -> Query:
         if order_by is None:
             order_by = 'date'
         if order is None:
             order = 'asc'
 
+        model = get_usage_model(granularity)
+
         query: Query = session.query(
-            FactUsage.resident_id,
-            FactUsage.date,
-            FactUsage.granularity,
-            FactUsage.elec_usage,
-            FactUsage.elec_charge
+            model.resident_id,
+            model.date,
+            model.granularity,
+            model.elec_usage,
+            model.elec_charge
         ).filter(
-            FactUsage.resident_id == resident_id,
-            FactUsage.granularity == granularity
+            model.resident_id == resident_id,
+            model.granularity == granularity
         )
         if start_date is not None:
-            query = query.filter(FactUsage.date >= start_date)
+            query = query.filter(model.date >= start_date)
         if end_date is not None:
-            query = query.filter(FactUsage.date <= end_date)
+            query = query.filter(model.date <= end_date)
 
         order_func = get_order_func(order)
-        query = query.order_by(order_func(getattr(FactUsage, order_by)))
+        sort_columns = [getattr(model, key) for key in RESIDENT_FACT_SORT_KEYS[order_by]]
+        query = query.order_by(*[order_func(column) for column in sort_columns])
+        if after is not None:
+            query = query.filter(get_keyset_condition(session, sort_columns, after, order))
 
         if offset is not None:
             query = query.offset(offset)
         if limit is not None:
             query = query.limit(limit)
+        return query
+
+    @classmethod
+    def query_residents_balances(
+        cls,
+        resident_ids: List[int],
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None
+    ) -> Dict[int, List[Balance]]:
+        """
+        query daily balances of residents in one query,
+        return them grouped by resident in the order of resident_ids
+        """
+        with managed_session() as session:
+            result = cls._query_residents_balances(session, resident_ids, start_date, end_date)
+        return result
+
+    @classmethod
+    def _query_residents_balances(
+        cls,
+        session: scoped_session,
+        resident_ids: List[int],
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None
+    ) -> Dict[int, List[Balance]]:
+        query: Query = session.query(
+            FactBalance.resident_id,
+            FactBalance.date,
+            FactBalance.granularity,
+            FactBalance.balance,
+            FactBalance.est_remain_days,
+        ).filter(
+            FactBalance.resident_id.in_(resident_ids),
+            FactBalance.granularity == DateGranularity.DAILY.value
+        )
+        if start_date is not None:
+            query = query.filter(FactBalance.date >= start_date)
+        if end_date is not None:
+            query = query.filter(FactBalance.date <= end_date)
+        # follow primary key, which groups the rows of each resident
+        query = query.order_by(asc(FactBalance.resident_id), asc(FactBalance.date))
+
         columns = [column['name'] for column in query.column_descriptions]
-        result = cast(
-            List[Usage],
-            [dict(zip(columns, item)) for item in query.all()]
+        result: Dict[int, List[Balance]] = {resident_id: [] for resident_id in resident_ids}
+        for item in query.all():
+            result[item.resident_id].append(cast(Balance, dict(zip(columns, item))))
+        return result
+
+    @classmethod
+    def query_residents_usages(
+        cls,
+        resident_ids: List[int],
+        granularity: str,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None
+    ) -> Dict[int, List[Usage]]:
+        """
+        query usages of residents in one query,
+        return them grouped by resident in the order of resident_ids
+        """
+        with managed_session() as session:
+            result = cls._query_residents_usages(session, resident_ids, granularity, start_date, end_date)
+
+        hot_window_start = get_hot_window_start()
+        if (
+            granularity == DateGranularity.DAILY.value
+            and hot_window_start is not None
+            and (start_date is None or start_date < hot_window_start)
+        ):
+            # requested range reaches archived daily usages
+            for resident_id, hot_usages in result.items():
+                result[resident_id] = merge_archived_usages(resident_id, hot_usages, start_date, end_date)
+        return result
+
+    @classmethod
+    def _query_residents_usages(
+        cls,
+        session: scoped_session,
+        resident_ids: List[int],
+        granularity: str,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None
+    ) -> Dict[int, List[Usage]]:
+        model = get_usage_model(granularity)
+
+        query: Query = session.query(
+            model.resident_id,
+            model.date,
+            model.granularity,
+            model.elec_usage,
+            model.elec_charge
+        ).filter(
+            model.resident_id.in_(resident_ids),
+            model.granularity == granularity
         )
+        if start_date is not None:
+            query = query.filter(model.date >= start_date)
+        if end_date is not None:
+            query = query.filter(model.date <= end_date)
+        # follow primary key, which groups the rows of each resident
+        query = query.order_by(asc(model.resident_id), asc(model.date))
+
+        columns = [column['name'] for column in query.column_descriptions]
+        result: Dict[int, List[Usage]] = {resident_id: [] for resident_id in resident_ids}
+        for item in query.all():
+            result[item.resident_id].append(cast(Usage, dict(zip(columns, item))))
+        return result
+
+    @classmethod
+    def query_resident_dashboard(
+        cls,
+        resident_id: int,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+        recent_days: int = DASHBOARD_RECENT_DAYS,
+        columnar: bool = False
+    ) -> Dashboard:
+        """
+        query what dashboard paints in one session,
+        which are latest balance, daily usages of recent days till the latest one,
+        and monthly usages within date range
+        :params columnar: whether usages are returned as parallel arrays
+        """
+        query_usages = cls._query_resident_usage_series if columnar else cls._query_resident_usages
+        hot_window_start = get_hot_window_start()
+        archived_range = None
+        with managed_session() as session:
+            latest_balance = cls._query_latest_balance(session, resident_id)
+            recent_end_date = session.scalar(
+                select(FactUsage.date).where(
+                    FactUsage.resident_id == resident_id,
+                    FactUsage.granularity == DateGranularity.DAILY.value
+                ).order_by(desc(FactUsage.date)).limit(1)
+            )
+            daily_usages: Union[List[Usage], UsageSeries] = (
+                get_usage_series(resident_id, DateGranularity.DAILY.value, []) if columnar else []
+            )
+            if recent_end_date is not None:
+                recent_start_date = recent_end_date - datetime.timedelta(days=recent_days - 1)
+                if hot_window_start is not None and recent_start_date < hot_window_start:
+                    # recent days reach archived daily usages, which are merged in memory
+                    archived_range = (recent_start_date, recent_end_date)
+                    daily_usages = cls._query_resident_usages(
+                        session,
+                        resident_id,
+                        DateGranularity.DAILY.value,
+                        recent_start_date,
+                        recent_end_date
+                    )
+                else:
+                    daily_usages = query_usages(
+                        session,
+                        resident_id,
+                        DateGranularity.DAILY.value,
+                        recent_start_date,
+                        recent_end_date
+                    )
+            monthly_usages = query_usages(
+                session,
+                resident_id,
+                DateGranularity.MONTHLY.value,
+                start_date,
+                end_date
+            )
+
+        if archived_range is not None:
+            daily_usages = merge_archived_usages(resident_id, cast(List[Usage], daily_usages), *archived_range)
+            if columnar:
+                daily_usages = get_usage_series(resident_id, DateGranularity.DAILY.value, daily_usages)
+
+        return {
+            'latest_balance': latest_balance[0] if latest_balance else None,
+            'daily_usages': daily_usages,
+            'monthly_usages': monthly_usages
+        }
+
+    @classmethod
+    def query_residents_usage_statistics(
+        cls,
+        resident_ids: List[int],
+        granularity: str,
+        metrics: Sequence[str] = USAGE_STATISTICS_METRICS,
+        field: str = 'elec_usage',
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None
+    ) -> Dict[int, List[UsageStatistics]]:
+        """
+        statistics of daily usages in each period of granularity,
+        return them grouped by resident in the order of resident_ids
+        date range is extended to whole periods,
+        and daily usages moved into archive are folded into their periods in memory
+        """
+        hot_window_start = get_hot_window_start()
+        if hot_window_start is None or (start_date is not None and start_date >= hot_window_start):
+            with managed_session() as session:
+                return cls._query_residents_usage_statistics(
+                    session,
+                    resident_ids,
+                    granularity,
+                    metrics,
+                    field,
+                    start_date,
+                    end_date
+                )
+
+        # requested range reaches archived daily usages,
+        # all metrics of the period before start one are queried as well, for the delta of start one
+        date_granularity = DateGranularity(granularity)
+        query_start_date = None
+        if start_date is not None:
+            start_date = get_period_start(start_date, date_granularity)
+            query_start_date = get_period_start(start_date - datetime.timedelta(days=1), date_granularity)
+        archived_end_date = hot_window_start - datetime.timedelta(days=1)
+        if end_date is not None:
+            archived_end_date = min(archived_end_date, end_date)
+        with managed_session() as session:
+            hot_result = cls._query_residents_usage_statistics(
+                session,
+                resident_ids,
+                granularity,
+                USAGE_STATISTICS_METRICS,
+                field,
+                query_start_date,
+                end_date
+            )
+            # days not archived yet are in database, which win
+            hot_dates = set(session.execute(
+                select(FactUsage.resident_id, FactUsage.date).where(
+                    FactUsage.resident_id.in_(resident_ids),
+                    FactUsage.granularity == DateGranularity.DAILY.value,
+                    FactUsage.date <= archived_end_date,
+                    *([FactUsage.date >= query_start_date] if query_start_date is not None else [])
+                )
+            ).tuples())
+
+        result: Dict[int, List[UsageStatistics]] = {}
+        for resident_id, statistics in hot_result.items():
+            archived_usages = (
+                usage for usage in iter_archived_usages(resident_id, query_start_date, archived_end_date)
+                if (resident_id, usage['date']) not in hot_dates
+            )
+            result[resident_id] = [
+                cast(UsageStatistics, {key: item.get(key) for key in ('date', *metrics)})
+                for item in fold_archived_statistics(statistics, archived_usages, date_granularity, field)
+                if start_date is None or item['date'] >= start_date
+            ]
         return result
 
+    @classmethod
+    def _query_residents_usage_statistics(
+        cls,
+        session: scoped_session,
+        resident_ids: List[int],
+        granularity: str,
+        metrics: Sequence[str] = USAGE_STATISTICS_METRICS,
+        field: str = 'elec_usage',
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None
+    ) -> Dict[int, List[UsageStatistics]]:
+        unavailable_metrics = set(metrics) - set(USAGE_STATISTICS_METRICS)
+        if unavailable_metrics:
+            raise ValueError(f'{sorted(unavailable_metrics)} are unavailable metrics')
+        date_granularity = DateGranularity(granularity)
+
+        # the period before start one is queried as well, for the delta of start one
+        query_start_date = None
+        if start_date is not None:
+            start_date = get_period_start(start_date, date_granularity)
+            query_start_date = get_period_start(start_date - datetime.timedelta(days=1), date_granularity)
+        if end_date is not None:
+            end_date = get_period_end(end_date, date_granularity)
+
+        period_start = get_period_start_clause(
+            FactUsage.date,
+            date_granularity,
+            session.get_bind().dialect.name
+        )
+        value = getattr(FactUsage, field)
+        period_query = select(
+            FactUsage.resident_id,
+            period_start.label('date'),
+            func.sum(value).label('sum'),
+            func.avg(value).label('avg'),
+            func.min(value).label('min'),
+            func.max(value).label('max'),
+            func.count(value).label('count')
+        ).where(
+            FactUsage.resident_id.in_(resident_ids),
+            FactUsage.granularity == DateGranularity.DAILY.value
+        )
+        if query_start_date is not None:
+            period_query = period_query.where(FactUsage.date >= query_start_date)
+        if end_date is not None:
+            period_query = period_query.where(FactUsage.date <= end_date)
+        periods = period_query.group_by(FactUsage.resident_id, period_start).subquery()
+
+        # delta is taken against the adjacent period only, rather than the previous one with usages
+        previous_period_start = get_period_start_clause(
+            type_coerce(type_coerce(periods.c.date, Integer) - 1, OrdinalDateType),
+            date_granularity,
+            session.get_bind().dialect.name
+        )
+        statistics = select(
+            periods,
+            case(
+                (
+                    func.lag(periods.c.date).over(
+                        partition_by=periods.c.resident_id,
+                        order_by=periods.c.date
+                    ) == previous_period_start,
+                    periods.c.sum - func.lag(periods.c.sum).over(
+                        partition_by=periods.c.resident_id,
+                        order_by=periods.c.date
+                    )
+                ),
+                else_=None
+            ).label('delta')
+        ).subquery()
+
+        query = select(
+            statistics.c.resident_id,
+            statistics.c.date,
+            *[statistics.c[metric] for metric in metrics]
+        )
+        if start_date is not None:
+            query = query.where(statistics.c.date >= start_date)
+        query = query.order_by(statistics.c.resident_id, statistics.c.date)
+
+        result: Dict[int, List[UsageStatistics]] = {resident_id: [] for resident_id in resident_ids}
+        for item in session.execute(query).mappings():
+            item_dict = dict(item)
+            result[item_dict.pop('resident_id')].append(cast(UsageStatistics, item_dict))
+        return result
+
+    @classmethod
+    def iter_usages(
+        cls,
+        resident_ids: Optional[List[int]] = None,
+        granularity: Optional[str] = None,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> Iterator[List[Tuple]]:
+        """
+        stream usages of residents, all of them by default, in batches of rows in USAGE_COLUMNS
+        rows are ordered by resident, granularity and date,
+        fetched from server-side cursor, so that memory is bounded by batch size
+        all collected granularities are streamed when granularity is omitted,
+        including archived daily usages
+        """
+        if resident_ids is None:
+            resident_ids = cls._query_resident_ids()
+        model = get_usage_model(granularity) if granularity is not None else FactUsage
+        hot_window_start = get_hot_window_start()
+
+        for resident_id in resident_ids:
+            if hot_window_start is not None and granularity in (None, DateGranularity.DAILY.value):
+                # archived days are older than the ones in database, one year in memory at a time
+                for year in get_archived_years(resident_id):
+                    archived_rows = [
+                        tuple(usage[column] for column in USAGE_COLUMNS)  # type: ignore[literal-required]
+                        for usage in read_archive(resident_id, year)
+                        if usage['date'] < hot_window_start
+                    ]
+                    for idx in range(0, len(archived_rows), batch_size):
+                        yield archived_rows[idx: idx + batch_size]
+
+            statement = select(*[getattr(model, column) for column in USAGE_COLUMNS]).where(
+                model.resident_id == resident_id
+            )
+            if granularity is not None:
+                statement = statement.where(model.granularity == granularity)
+            yield from cls._iter_rows(
+                statement.order_by(model.granularity, model.date),
+                batch_size
+            )
+
+    @classmethod
+    def iter_balances(
+        cls,
+        resident_ids: Optional[List[int]] = None,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> Iterator[List[Tuple]]:
+        """
+        stream daily balances of residents, all of them by default, in batches of rows in BALANCE_COLUMNS
+        rows are ordered by resident and date,
+        fetched from server-side cursor, so that memory is bounded by batch size
+        """
+        if resident_ids is None:
+            resident_ids = cls._query_resident_ids()
+
+        for resident_id in resident_ids:
+            statement = select(*[getattr(FactBalance, column) for column in BALANCE_COLUMNS]).where(
+                FactBalance.resident_id == resident_id,
+                FactBalance.granularity == DateGranularity.DAILY.value
+            )
+            yield from cls._iter_rows(statement.order_by(FactBalance.date), batch_size)
+
+    @classmethod
+    def _iter_rows(cls, statement: Any, batch_size: int) -> Iterator[List[Tuple]]:
+        with managed_session() as session:
+            result = session.execute(statement.execution_options(yield_per=batch_size))
+            for partition in result.partitions():
+                yield [tuple(row) for row in partition]
+
+    @classmethod
+    def _query_resident_ids(cls) -> List[int]:
+        with managed_session() as session:
+            resident_ids = list(session.scalars(
+                select(DimResident.resident_id).order_by(DimResident.resident_id)
+            ))
+        return resident_ids
+
+    @classmethod
+    def query_residents_updated_time(cls) -> Optional[int]:
+        with managed_session() as session:
+            updated_time = session.scalar(select(func.max(DimResident.updated_time)))
+        return updated_time
+
+    @classmethod
+    def query_resident_balances_updated_time(cls, resident_id: int) -> Optional[int]:
+        return cls.query_residents_balances_updated_time([resident_id])
+
+    @classmethod
+    def query_residents_balances_updated_time(cls, resident_ids: List[int]) -> Optional[int]:
+        with managed_session() as session:
+            updated_time = session.scalar(
+                select(func.max(FactBalance.updated_time)).where(
+                    FactBalance.resident_id.in_(resident_ids),
+                    FactBalance.granularity == DateGranularity.DAILY.value
+                )
+            )
+        return updated_time
+
+    @classmethod
+    def query_resident_usages_updated_time(cls, resident_id: int, granularity: str) -> Optional[int]:
+        return cls.query_residents_usages_updated_time([resident_id], granularity)
+
+    @classmethod
+    def query_residents_usages_updated_time(cls, resident_ids: List[int], granularity: str) -> Optional[int]:
+        model = get_usage_model(granularity)
+        with managed_session() as session:
+            updated_time = session.scalar(
+                select(func.max(model.updated_time)).where(
+                    model.resident_id.in_(resident_ids),
+                    model.granularity == granularity
+                )
+            )
+        return updated_time
+
+    @classmethod
+    def query_data_version(cls) -> str:
+        """
+        return the version of data, which is the token of database along with data generation,
+        since generation starts again on a reset or another database
+        """
+        with managed_session() as session:
+            row = session.execute(
+                select(DataGeneration.token, DataGeneration.generation).where(DataGeneration.id == 1)
+            ).one_or_none()
+        if row is None:
+            return '0'
+        return f'{row.token}.{row.generation}'
+
+
+def get_usage_model(granularity: str) -> Union[Type[FactUsage], Type[AggUsage]]:
+    """
+    usages of coarser granularities are served by rollup table
+    """
+    if DateGranularity(granularity) in ROLLUP_USAGE_SOURCE_GRANULARITIES:
+        return AggUsage
+    return FactUsage
+
+
+def get_series(query: Query) -> Dict[str, List[Any]]:
+    """
+    transpose rows of query into parallel arrays keyed by column name,
+    without building dictionary of each row
+    """
+    columns = [column['name'] for column in query.column_descriptions]
+    rows = query.all()
+    if not rows:
+        return {column: [] for column in columns}
+    return {column: list(values) for column, values in zip(columns, zip(*rows))}
+
+
+def get_usage_series(resident_id: int, granularity: str, usages: List[Usage]) -> UsageSeries:
+    return {
+        'resident_id': resident_id,
+        'granularity': granularity,
+        'date': [usage['date'] for usage in usages],
+        'elec_usage': [usage['elec_usage'] for usage in usages],
+        'elec_charge': [usage['elec_charge'] for usage in usages]
+    }
+
+
+def fold_archived_statistics(
+    statistics: List[UsageStatistics],
+    archived_usages: Iterable[Usage],
+    granularity: DateGranularity,
+    field: str
+) -> List[UsageStatistics]:
+    """
+    fold archived daily usages into the statistics of all metrics in database by period,
+    return them in ascending order of date, with delta taken against the adjacent period only
+    as database does
+    """
+    periods = {item['date']: item for item in statistics}
+    folded_dates = set()
+    for usage in archived_usages:
+        date = get_period_start(usage['date'], granularity)
+        item = periods.setdefault(date, {'date': date, 'sum': None, 'min': None, 'max': None, 'count': 0})
+        folded_dates.add(date)
+        value = usage[field]  # type: ignore[literal-required]
+        if value is None:
+            continue
+        item['sum'] = value if item['sum'] is None else item['sum'] + value
+        item['min'] = value if item['min'] is None else min(item['min'], value)
+        item['max'] = value if item['max'] is None else max(item['max'], value)
+        item['count'] += 1
+
+    result = sorted(periods.values(), key=lambda item: item['date'])
+    previous_date, previous_sum = None, None
+    for item in result:
+        if item['date'] in folded_dates:
+            item['avg'] = item['sum'] / item['count'] if item['sum'] is not None else None
+        is_adjacent = previous_date == get_period_start(item['date'] - datetime.timedelta(days=1), granularity)
+        item['delta'] = (
+            item['sum'] - previous_sum
+            if is_adjacent and item['sum'] is not None and previous_sum is not None else None
+        )
+        previous_date, previous_sum = item['date'], item['sum']
+    return result
+
+
+def merge_archived_usages(
+    resident_id: int,
+    hot_usages: List[Usage],
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None
+) -> List[Usage]:
+    """
+    merge archived daily usages with the ones in database,
+    where the latter win since they are not archived yet
+    return them in ascending order of date
+    """
+    usages = {
+        usage['date']: usage
+        for usage in read_archived_usages(resident_id, start_date, end_date)
+    }
+    usages.update({usage['date']: usage for usage in hot_usages})
+    return sorted(usages.values(), key=lambda item: item['date'])
+
+
+def get_period_start_clause(
+    column: Any,
+    granularity: DateGranularity,
+    dialect_name: str
+) -> ColumnElement:
+    """
+    SQL expression of the start date of the period which date column belongs to,
+    week starts on Monday as get_period_start does
+    """
+    if granularity == DateGranularity.DAILY:
+        return column
+
+    if dialect_name == 'sqlite':
+        # dates are stored as ordinal, where ordinal 1 is Monday
+        ordinal = type_coerce(column, Integer)
+        if granularity == DateGranularity.WEEKLY:
+            return type_coerce(ordinal - (ordinal - 1) % 7, OrdinalDateType)
+
+        julian_day = ordinal + literal_column(str(DATABASE_SQLITE_ORDINAL_JULIAN_DAY))
+        if granularity == DateGranularity.MONTHLY:
+            start = func.date(julian_day, literal_column("'start of month'"))
+        elif granularity == DateGranularity.QUARTERLY:
+            month_offset = (sql_cast(func.strftime(literal_column("'%m'"), julian_day), Integer) - 1) % 3
+            start = func.date(
+                julian_day,
+                literal_column("'start of month'"),
+                func.printf(literal_column("'-%d months'"), month_offset)
+            )
+        elif granularity == DateGranularity.YEARLY:
+            start = func.date(julian_day, literal_column("'start of year'"))
+        else:
+            raise ValueError(f'{granularity} is unavailable date granularity')
+        return type_coerce(
+            sql_cast(func.julianday(start) - literal_column(str(DATABASE_SQLITE_ORDINAL_JULIAN_DAY)), Integer),
+            OrdinalDateType
+        )
+
+    fields = {
+        DateGranularity.WEEKLY: 'week',
+        DateGranularity.MONTHLY: 'month',
+        DateGranularity.QUARTERLY: 'quarter',
+        DateGranularity.YEARLY: 'year'
+    }
+    return type_coerce(
+        sql_cast(func.date_trunc(literal_column(f"'{fields[granularity]}'"), column), Date),
+        OrdinalDateType
+    )
+
 
 def get_order_func(order: str):
     if order == 'asc':
@@ -293,3 +1221,41 @@ def get_order_func(order: str):
     if order == 'desc':
         return desc
     raise ValueError(f'{order} is unavailable sort')
+
+
+def get_keyset_condition(
+    session: scoped_session,
+    columns: Sequence[Any],
+    key: Sequence[Any],
+    order: str
+) -> ColumnElement:
+    """
+    condition of the rows after the sort key, in the order of columns,
+    which is expanded as (c1 > v1) OR (c1 = v1 AND c2 > v2) ...
+    to place NULL as database does, i.e. the smallest in SQLite and the largest in PostgreSQL
+    """
+    if len(columns) != len(key):
+        raise ValueError(f'Sort key {key} mismatches columns')
+    get_order_func(order)
+    nulls_largest = session.get_bind().dialect.name != 'sqlite'
+
+    def _after(column, value) -> ColumnElement:
+        if (order == 'asc') == nulls_largest:
+            # NULL is placed at the end
+            if value is None:
+                return false()
+            condition = column > value if order == 'asc' else column < value
+            return or_(condition, column.is_(None)) if column.nullable else condition
+        # NULL is placed at the beginning
+        if value is None:
+            return column.is_not(None)
+        return column > value if order == 'asc' else column < value
+
+    conditions = []
+    for idx, (column, value) in enumerate(zip(columns, key)):
+        equals = [
+            prev_column.is_(None) if prev_value is None else prev_column == prev_value
+            for prev_column, prev_value in zip(columns[:idx], key[:idx])
+        ]
+        conditions.append(and_(*equals, _after(column, value)))
+    return conditions[0] if len(conditions) == 1 else or_(*conditions)
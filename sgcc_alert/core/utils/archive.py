@@ -0,0 +1,200 @@
+"""
+Utilities on archive of daily usages
+
+Daily usages older than retention days are moved out of database,
+into compressed columnar files of each resident and year
+    <USAGE_ARCHIVE_DIR>/<resident_id>/daily_usage_<year>.npz
+which store arrays of ordinal date, electricity usage and charge,
+where NaN means the value is unknown
+"""
+import datetime
+import logging
+import os
+import pathlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pytz
+from sqlalchemy import delete, select
+
+from .common import get_period_start
+from ...conf import resolve_settings_path, settings
+from ...constants import DAILY_USAGE_RETENTION_MIN_DAYS, DateGranularity
+from ...databases import FactUsage, managed_session
+from ...schemes import Usage
+
+
+logger = logging.getLogger(__name__)
+
+
+def check_retention() -> None:
+    """
+    validate retention settings once on start of processes,
+    rather than on each call of get_hot_window_start
+    """
+    if 0 < settings.DAILY_USAGE_RETENTION_DAYS < DAILY_USAGE_RETENTION_MIN_DAYS:
+        raise ValueError(
+            f'Retention of daily usages {settings.DAILY_USAGE_RETENTION_DAYS} days is shorter than '
+            f'{DAILY_USAGE_RETENTION_MIN_DAYS} days, which archives the days reloaded by scrape'
+        )
+
+
+def get_hot_window_start(today: Optional[datetime.date] = None) -> Optional[datetime.date]:
+    """
+    return the date since which daily usages are kept in database,
+    which is the start of week so that a week is either archived or kept as a whole
+    return None when retention is disabled
+    """
+    if settings.DAILY_USAGE_RETENTION_DAYS <= 0:
+        return None
+    if today is None:
+        today = datetime.datetime.now(pytz.timezone(settings.TIMEZONE)).date()
+    return get_period_start(
+        today - datetime.timedelta(days=settings.DAILY_USAGE_RETENTION_DAYS),
+        DateGranularity.WEEKLY
+    )
+
+
+def get_archive_path(resident_id: int, year: int) -> pathlib.Path:
+    archive_dir = pathlib.Path(resolve_settings_path(settings.USAGE_ARCHIVE_DIR))
+    return archive_dir / str(resident_id) / f'daily_usage_{year}.npz'
+
+
+def get_archived_years(resident_id: int) -> List[int]:
+    return sorted(
+        int(path.stem.rsplit('_', 1)[-1])
+        for path in get_archive_path(resident_id, 0).parent.glob('daily_usage_*.npz')
+    )
+
+
+def read_archive(resident_id: int, year: int) -> List[Usage]:
+    path = get_archive_path(resident_id, year)
+    if not path.exists():
+        return []
+
+    # numpy is imported on reaching archive only, which keeps it out of API workers on start
+    import numpy as np
+
+    with np.load(path) as archive:
+        return [
+            {
+                'resident_id': resident_id,
+                'date': datetime.date.fromordinal(int(ordinal)),
+                'granularity': DateGranularity.DAILY.value,
+                'elec_usage': None if np.isnan(elec_usage) else float(elec_usage),
+                'elec_charge': None if np.isnan(elec_charge) else float(elec_charge)
+            }
+            for ordinal, elec_usage, elec_charge in zip(
+                archive['date'],
+                archive['elec_usage'],
+                archive['elec_charge']
+            )
+        ]
+
+
+def write_archive(resident_id: int, year: int, usages: List[Usage]) -> None:
+    """
+    replace the file atomically,
+    since it could be read by web workers at the same time
+    """
+    import numpy as np
+
+    path = get_archive_path(resident_id, year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    usages = sorted(usages, key=lambda item: item['date'])
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            date=np.array([usage['date'].toordinal() for usage in usages], dtype=np.int32),
+            elec_usage=np.array([usage['elec_usage'] for usage in usages], dtype=np.float64),
+            elec_charge=np.array([usage['elec_charge'] for usage in usages], dtype=np.float64)
+        )
+    os.replace(tmp_path, path)
+
+
+def iter_archived_usages(
+    resident_id: int,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    reverse: bool = False
+) -> Iterator[Usage]:
+    """
+    yield archived daily usages of the resident within date range,
+    ordered by date, descending if reverse,
+    one year is read at a time, so that the years beyond the consumed ones are never read
+    """
+    years = [
+        year for year in get_archived_years(resident_id)
+        if (start_date is None or year >= start_date.year) and (end_date is None or year <= end_date.year)
+    ]
+    for year in reversed(years) if reverse else years:
+        usages = read_archive(resident_id, year)
+        for usage in reversed(usages) if reverse else usages:
+            if start_date is not None and usage['date'] < start_date:
+                continue
+            if end_date is not None and usage['date'] > end_date:
+                continue
+            yield usage
+
+
+def read_archived_usages(
+    resident_id: int,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None
+) -> List[Usage]:
+    """
+    return archived daily usages of the resident within date range,
+    ordered by date
+    """
+    return list(iter_archived_usages(resident_id, start_date, end_date))
+
+
+def archive_daily_usages(today: Optional[datetime.date] = None) -> int:
+    """
+    move daily usages before hot window into archive files,
+    which are merged with the ones archived before, so that rerun is harmless
+    rows are deleted only after their files are written
+    return the count of archived rows
+    """
+    hot_window_start = get_hot_window_start(today)
+    if hot_window_start is None:
+        return 0
+
+    with managed_session() as session:
+        rows = session.execute(
+            select(
+                FactUsage.resident_id,
+                FactUsage.date,
+                FactUsage.elec_usage,
+                FactUsage.elec_charge
+            ).where(
+                FactUsage.granularity == DateGranularity.DAILY.value,
+                FactUsage.date < hot_window_start
+            )
+        ).all()
+
+        groups: Dict[Tuple[int, int], Dict[datetime.date, Usage]] = {}
+        for resident_id, date, elec_usage, elec_charge in rows:
+            group = groups.setdefault((resident_id, date.year), {})
+            group[date] = {
+                'resident_id': resident_id,
+                'date': date,
+                'granularity': DateGranularity.DAILY.value,
+                'elec_usage': elec_usage,
+                'elec_charge': elec_charge
+            }
+
+        for (resident_id, year), group in groups.items():
+            archived = {usage['date']: usage for usage in read_archive(resident_id, year)}
+            archived.update(group)
+            write_archive(resident_id, year, list(archived.values()))
+
+        session.execute(
+            delete(FactUsage).where(
+                FactUsage.granularity == DateGranularity.DAILY.value,
+                FactUsage.date < hot_window_start
+            )
+        )
+
+    logger.info(f'Archived {len(rows)} daily usages before {hot_window_start}')
+    return len(rows)
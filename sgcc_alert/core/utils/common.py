@@ -1,11 +1,14 @@
 """
 Common utilities
 """
+import datetime
 from functools import wraps
 import logging
 import time
 from typing import Any, Callable, Tuple
 
+from ...constants import DateGranularity
+
 
 logger = logging.getLogger(__name__)
 
@@ -62,3 +65,39 @@ def get_ordinal_suffix(value: int) -> str:
     if units_digit == 3:
         return 'rd'
     return 'th'
+
+
+def get_period_start(date: datetime.date, granularity: DateGranularity) -> datetime.date:
+    """
+    start date of the period which given date belongs to,
+    week starts on Monday
+    """
+    if granularity == DateGranularity.DAILY:
+        return date
+    if granularity == DateGranularity.WEEKLY:
+        return date - datetime.timedelta(days=date.weekday())
+    if granularity == DateGranularity.MONTHLY:
+        return date.replace(day=1)
+    if granularity == DateGranularity.QUARTERLY:
+        return date.replace(month=(date.month - 1) // 3 * 3 + 1, day=1)
+    if granularity == DateGranularity.YEARLY:
+        return date.replace(month=1, day=1)
+    raise ValueError(f'{granularity} is unavailable date granularity')
+
+
+def get_period_end(date: datetime.date, granularity: DateGranularity) -> datetime.date:
+    """
+    end date (inclusive) of the period which given date belongs to
+    """
+    start = get_period_start(date, granularity)
+    if granularity == DateGranularity.DAILY:
+        return start
+    if granularity == DateGranularity.WEEKLY:
+        return start + datetime.timedelta(days=6)
+    if granularity == DateGranularity.MONTHLY:
+        next_start = (start + datetime.timedelta(days=31)).replace(day=1)
+    elif granularity == DateGranularity.QUARTERLY:
+        next_start = (start + datetime.timedelta(days=92)).replace(day=1)
+    else:
+        next_start = start.replace(year=start.year + 1)
+    return next_start - datetime.timedelta(days=1)
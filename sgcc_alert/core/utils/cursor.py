@@ -0,0 +1,61 @@
+"""
+Utilities on cursor of keyset pagination
+
+Cursor is opaque to clients, which is URL-safe base64 of JSON
+containing the sort it is issued for, and the sort key of the last row in page
+"""
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime.date):
+        return {'date': value.isoformat()}
+    raise TypeError(f'{type(value).__name__} is unavailable in cursor')
+
+
+def _decode_value(value: Dict[str, Any]) -> Any:
+    if 'sort' in value:
+        return value
+    if set(value) == {'date'}:
+        return datetime.date.fromisoformat(value['date'])
+    raise ValueError(f'{value} is unavailable in cursor')
+
+
+def encode_cursor(sort: str, key: Sequence[Any]) -> str:
+    """
+    :params sort: the sort which cursor is issued for, e.g. 'date:asc'
+    :type sort: str
+    :params key: values of sort key of the last row in page
+    :type key: sequence
+    """
+    content = json.dumps({'sort': sort, 'key': list(key)}, default=_encode_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(content.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, key_types: Optional[Sequence[Tuple[Type, ...]]] = None) -> List[Any]:
+    """
+    return values of sort key in cursor,
+    raise ValueError if cursor is malformed or issued for another sort
+
+    :params key_types: types available for each value of sort key, which isn't checked if None
+    :type key_types: sequence
+    """
+    try:
+        content = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(content, object_hook=_decode_value)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f'{cursor} is malformed cursor') from e
+    if not isinstance(payload, dict) or not isinstance(payload.get('key'), list):
+        raise ValueError(f'{cursor} is malformed cursor')
+    if payload.get('sort') != sort:
+        raise ValueError(f'Cursor is issued for sort {payload.get("sort")}, rather than {sort}')
+    key = payload['key']
+    if key_types is not None:
+        # exact types, so that e.g. booleans aren't taken as integers
+        if len(key) != len(key_types) or any(type(value) not in types for value, types in zip(key, key_types)):
+            raise ValueError(f'Cursor key {key} mismatches sort {sort}')
+    return key
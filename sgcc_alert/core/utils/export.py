@@ -0,0 +1,50 @@
+"""
+Utilities on export of rows
+
+Batches of rows are formatted into chunks of text one by one,
+so that the export is streamed rather than built in memory
+"""
+import csv
+import datetime
+import io
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, Sequence, Tuple
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is unavailable in export')
+
+
+def iter_ndjson(columns: Sequence[str], batches: Iterable[Sequence[Tuple]]) -> Iterator[str]:
+    """
+    one JSON object per line
+    """
+    for batch in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=_encode_value, ensure_ascii=False) + '\n'
+            for row in batch
+        )
+
+
+def iter_csv(columns: Sequence[str], batches: Iterable[Sequence[Tuple]]) -> Iterator[str]:
+    """
+    header goes out before querying any row, and unknown value is empty
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+# format name to its MIME type and formatter
+EXPORT_FORMATS: Dict[str, Tuple[str, Callable[[Sequence[str], Iterable[Sequence[Tuple]]], Iterator[str]]]] = {
+    'ndjson': ('application/x-ndjson', iter_ndjson),
+    'csv': ('text/csv', iter_csv)
+}
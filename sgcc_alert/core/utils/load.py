@@ -1,15 +1,30 @@
 """
 Utilities on store data
 """
+from collections import defaultdict
 import datetime
-from typing import List
+import logging
+import operator
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Type, TypedDict
 
-from sqlalchemy import text
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import scoped_session
 
-from ...databases import DimResident, FactBalance, FactUsage, managed_session
+from .archive import get_hot_window_start, read_archived_usages
+from .common import get_period_end, get_period_start
+from ...constants import DATABASE_EXECUTEMANY_PAGE_SIZE, DateGranularity, ROLLUP_USAGE_SOURCE_GRANULARITIES
+from ...databases import AggUsage, DataGeneration, DimResident, FactBalance, FactUsage, managed_session
+from ...databases.models import BaseModel
 from ...schemes import Balance, Resident, Usage
 
 
+logger = logging.getLogger(__name__)
+
+
 SQL_TML_INSERT_RESIDENTS = f'''
     INSERT INTO {DimResident.__tablename__} (
         resident_id,
@@ -36,6 +51,10 @@ SQL_TML_INSERT_RESIDENTS = f'''
         resident_address = EXCLUDED.resident_address,
         developer_name = EXCLUDED.developer_name,
         updated_time = EXCLUDED.updated_time
+    WHERE
+        {DimResident.__tablename__}.is_main IS DISTINCT FROM EXCLUDED.is_main
+        OR {DimResident.__tablename__}.resident_address IS DISTINCT FROM EXCLUDED.resident_address
+        OR {DimResident.__tablename__}.developer_name IS DISTINCT FROM EXCLUDED.developer_name
 '''
 
 
@@ -68,6 +87,9 @@ SQL_TML_INSERT_BALANCES = f'''
         balance = EXCLUDED.balance,
         est_remain_days = EXCLUDED.est_remain_days,
         updated_time = EXCLUDED.updated_time
+    WHERE
+        {FactBalance.__tablename__}.balance IS DISTINCT FROM EXCLUDED.balance
+        OR {FactBalance.__tablename__}.est_remain_days IS DISTINCT FROM EXCLUDED.est_remain_days
 '''
 
 
@@ -100,15 +122,118 @@ SQL_TML_INSERT_USAGE = f'''
         elec_usage = EXCLUDED.elec_usage,
         elec_charge = EXCLUDED.elec_charge,
         updated_time = EXCLUDED.updated_time
+    WHERE
+        {FactUsage.__tablename__}.elec_usage IS DISTINCT FROM EXCLUDED.elec_usage
+        OR {FactUsage.__tablename__}.elec_charge IS DISTINCT FROM EXCLUDED.elec_charge
+'''
+
+
+SQL_TML_INSERT_AGG_USAGE = f'''
+    INSERT INTO {AggUsage.__tablename__} (
+        resident_id,
+        date,
+        granularity,
+        elec_usage,
+        elec_charge,
+        created_time,
+        updated_time
+    )
+    VALUES (
+        :resident_id,
+        :date,
+        :granularity,
+        :elec_usage,
+        :elec_charge,
+        :created_time,
+        :updated_time
+    )
+    ON CONFLICT (
+        resident_id,
+        date,
+        granularity
+    )
+    DO UPDATE
+    SET
+        elec_usage = EXCLUDED.elec_usage,
+        elec_charge = EXCLUDED.elec_charge,
+        updated_time = EXCLUDED.updated_time
+    WHERE
+        {AggUsage.__tablename__}.elec_usage IS DISTINCT FROM EXCLUDED.elec_usage
+        OR {AggUsage.__tablename__}.elec_charge IS DISTINCT FROM EXCLUDED.elec_charge
+'''
+
+
+SQL_TML_BUMP_DATA_GENERATION = f'''
+    INSERT INTO {DataGeneration.__tablename__} (
+        id,
+        generation,
+        token,
+        created_time,
+        updated_time
+    )
+    VALUES (
+        1,
+        1,
+        :token,
+        :created_time,
+        :updated_time
+    )
+    ON CONFLICT (
+        id
+    )
+    DO UPDATE
+    SET
+        generation = {DataGeneration.__tablename__}.generation + 1,
+        updated_time = EXCLUDED.updated_time
 '''
 
 
-def load_residents(residents: List[Resident]) -> None:
+class UpsertResult(TypedDict):
+
+    row_count: int              # rows after deduplication
+    inserted_count: int
+    changed_count: int
+    unchanged_count: int        # rows skipped since values are the same
+
+
+class LoadResult(UpsertResult):
+
+    elapsed: float              # unit is second
+    rows_per_second: float
+
+
+def load_residents(residents: List[Resident]) -> LoadResult:
+    return load_sgcc_data(residents=residents)
+
+
+def load_balances(balances: List[Balance]) -> LoadResult:
+    return load_sgcc_data(balances=balances)
+
+
+def load_usages(usages: List[Usage]) -> LoadResult:
+    return load_sgcc_data(usages=usages)
+
+
+def load_sgcc_data(
+    residents: Optional[List[Resident]] = None,
+    balances: Optional[List[Balance]] = None,
+    usages: Optional[List[Usage]] = None
+) -> LoadResult:
+    """
+    load data collected by one run within one transaction,
+    rows are deduplicated by primary key (the last one wins)
+    and sorted by it for locality of B-tree pages
+
+    rows are updated only when their values change,
+    so that updated_time marks the latest change of each row,
+    and data generation is increased only when any row changes
+    """
+    start = time.perf_counter()
     cur_utc_timestamp = int(datetime.datetime.utcnow().timestamp())
+    upsert_results: List[UpsertResult] = []
     with managed_session() as session:
-        session.execute(
-            text(SQL_TML_INSERT_RESIDENTS),
-            [
+        if residents:
+            upsert_results.append(_executemany(session, DimResident, SQL_TML_INSERT_RESIDENTS, [
                 {
                     'resident_id': resident['resident_id'],
                     'is_main': resident['is_main'],
@@ -118,16 +243,9 @@ def load_residents(residents: List[Resident]) -> None:
                     'updated_time': cur_utc_timestamp
                 }
                 for resident in residents
-            ]
-        )
-
-
-def load_balances(balances: List[Balance]) -> None:
-    cur_utc_timestamp = int(datetime.datetime.utcnow().timestamp())
-    with managed_session() as session:
-        session.execute(
-            text(SQL_TML_INSERT_BALANCES),
-            [
+            ]))
+        if balances:
+            upsert_results.append(_executemany(session, FactBalance, SQL_TML_INSERT_BALANCES, [
                 {
                     'resident_id': balance['resident_id'],
                     'date': balance['date'],
@@ -138,16 +256,9 @@ def load_balances(balances: List[Balance]) -> None:
                     'updated_time': cur_utc_timestamp
                 }
                 for balance in balances
-            ]
-        )
-
-
-def load_usages(usages: List[Usage]) -> None:
-    cur_utc_timestamp = int(datetime.datetime.utcnow().timestamp())
-    with managed_session() as session:
-        session.execute(
-            text(SQL_TML_INSERT_USAGE),
-            [
+            ]))
+        if usages:
+            upsert_results.append(_executemany(session, FactUsage, SQL_TML_INSERT_USAGE, [
                 {
                     'resident_id': usage['resident_id'],
                     'date': usage['date'],
@@ -158,5 +269,234 @@ def load_usages(usages: List[Usage]) -> None:
                     'updated_time': cur_utc_timestamp
                 }
                 for usage in usages
+            ]))
+            rollup_usages(session, usages, cur_utc_timestamp)
+
+        if any(item['inserted_count'] or item['changed_count'] for item in upsert_results):
+            # caches of responses are invalidated once data changes are committed,
+            # token is written on the first bump only, which identifies the database
+            session.execute(
+                text(SQL_TML_BUMP_DATA_GENERATION),
+                {'token': uuid.uuid4().hex, 'created_time': cur_utc_timestamp, 'updated_time': cur_utc_timestamp}
+            )
+
+    elapsed = time.perf_counter() - start
+    row_count = sum(item['row_count'] for item in upsert_results)
+    result: LoadResult = {
+        'row_count': row_count,
+        'inserted_count': sum(item['inserted_count'] for item in upsert_results),
+        'changed_count': sum(item['changed_count'] for item in upsert_results),
+        'unchanged_count': sum(item['unchanged_count'] for item in upsert_results),
+        'elapsed': round(elapsed, 4),
+        'rows_per_second': round(row_count / elapsed, 2) if elapsed > 0 else 0.0
+    }
+    logger.info(
+        f'Loaded {result["row_count"]} rows in {result["elapsed"]}s, '
+        f'{result["rows_per_second"]} rows per second, '
+        f'{result["inserted_count"]} inserted, {result["changed_count"]} changed, '
+        f'{result["unchanged_count"]} unchanged'
+    )
+    return result
+
+
+def _executemany(
+    session: scoped_session,
+    model: Type[BaseModel],
+    statement: str,
+    rows: List[Dict[str, Any]]
+) -> UpsertResult:
+    """
+    execute upsert statement by executemany of database driver,
+    which skips parameter processing of SQLAlchemy on each row
+
+    modified rows are counted by driver, which are either inserted or changed,
+    and inserted ones are counted by rows of the residents before and after
+    """
+    table = model.__table__
+    get_key = operator.itemgetter(
+        *[column.name for column in table.primary_key.columns]  # type: ignore[attr-defined]
+    )
+    unique_rows = {get_key(row): row for row in rows}
+    sorted_rows = [unique_rows[key] for key in sorted(unique_rows)]
+
+    connection = session.connection()
+    dialect = connection.dialect
+    # convert values as SQLAlchemy does, e.g. granularity into its code
+    processors = [
+        (column.name, processor)
+        for column in table.columns
+        if (processor := column.type.dialect_impl(dialect).bind_processor(dialect)) is not None
+    ]
+    for row in sorted_rows:
+        for key, processor in processors:
+            row[key] = processor(row[key])
+
+    compiled = text(statement).compile(dialect=dialect)
+    params: List[Any] = sorted_rows
+    if compiled.positiontup:
+        getter = operator.itemgetter(*compiled.positiontup)
+        params = [getter(row) for row in sorted_rows]
+
+    count_statement = select(func.count()).select_from(table).where(
+        table.c.resident_id.in_({row['resident_id'] for row in sorted_rows})
+    )
+    count_before = connection.execute(count_statement).scalar_one()
+
+    cursor = connection.connection.cursor()
+    try:
+        if dialect.driver == 'psycopg2':
+            modified_count = _execute_values(cursor, str(compiled), params)
+        else:
+            cursor.executemany(str(compiled), params)
+            modified_count = cursor.rowcount
+    except dialect.loaded_dbapi.Error as e:
+        # raise the same exception as SQLAlchemy does
+        raise DBAPIError.instance(
+            str(compiled),
+            None,
+            e,
+            dialect.loaded_dbapi.Error,
+            dialect=dialect
+        ) from e
+    finally:
+        cursor.close()
+
+    inserted_count = connection.execute(count_statement).scalar_one() - count_before
+    return {
+        'row_count': len(sorted_rows),
+        'inserted_count': inserted_count,
+        'changed_count': modified_count - inserted_count,
+        'unchanged_count': len(sorted_rows) - modified_count
+    }
+
+
+def _execute_values(cursor: Any, statement: str, params: List[Dict[str, Any]]) -> int:
+    """
+    executemany of psycopg2 sends statements one by one,
+    and the row count of execute_batch is the one of the last statement only,
+    so that rows are sent page by page as multi-row VALUES
+    return the count of modified rows
+    """
+    from psycopg2.extras import execute_values
+
+    # placeholders are parenthesized as %(name)s
+    matched = re.search(r'VALUES\s*(\((?:[^()]|\([^()]*\))*\))', statement)
+    if matched is None:
+        raise ValueError('Statement should insert rows by VALUES clause')
+    values_statement = f'{statement[:matched.start(1)]}%s{statement[matched.end(1):]}'
+
+    modified_count = 0
+    for idx in range(0, len(params), DATABASE_EXECUTEMANY_PAGE_SIZE):
+        page = params[idx: idx + DATABASE_EXECUTEMANY_PAGE_SIZE]
+        execute_values(cursor, values_statement, page, template=matched.group(1), page_size=len(page))
+        modified_count += cursor.rowcount
+    return modified_count
+
+
+def rollup_usages(
+    session: scoped_session,
+    usages: List[Usage],
+    cur_utc_timestamp: int
+) -> None:
+    """
+    refresh the rollup periods touched by given usages only,
+    within the transaction which loads them into fact table
+    """
+    hot_window_start = get_hot_window_start()
+    rows = []
+    for rollup_granularity, source_granularity in ROLLUP_USAGE_SOURCE_GRANULARITIES.items():
+        # many residents share the dates, compute period of each date once
+        period_start_of: Dict[datetime.date, datetime.date] = {}
+
+        def _get_period_start(date: datetime.date) -> datetime.date:
+            if date not in period_start_of:
+                period_start_of[date] = get_period_start(date, rollup_granularity)
+            return period_start_of[date]
+
+        source_granularity_value = source_granularity.value
+        touched_periods: Dict[int, Set[datetime.date]] = defaultdict(set)
+        for usage in usages:
+            if usage['granularity'] != source_granularity_value:
+                continue
+            touched_periods[usage['resident_id']].add(_get_period_start(usage['date']))
+
+        for resident_id, period_starts in touched_periods.items():
+            start_date = min(period_starts)
+            end_date = get_period_end(max(period_starts), rollup_granularity)
+            statement = select(
+                FactUsage.date,
+                FactUsage.elec_usage,
+                FactUsage.elec_charge
+            ).where(
+                FactUsage.resident_id == resident_id,
+                FactUsage.granularity == source_granularity_value,
+                FactUsage.date >= start_date,
+                FactUsage.date <= end_date
+            )
+            source_rows: Sequence[Tuple[datetime.date, Optional[float], Optional[float]]] = [
+                tuple(row) for row in session.execute(statement)
             ]
-        )
+            if (
+                source_granularity == DateGranularity.DAILY
+                and hot_window_start is not None
+                and start_date < hot_window_start
+            ):
+                source_rows = merge_archived_rows(resident_id, source_rows, start_date, end_date)
+
+            totals: Dict[datetime.date, Dict[str, Optional[float]]] = {
+                period_start: {'elec_usage': None, 'elec_charge': None}
+                for period_start in period_starts
+            }
+            for date, elec_usage, elec_charge in source_rows:
+                total = totals.get(_get_period_start(date))
+                if total is None:
+                    continue
+                total['elec_usage'] = _sum_nullable(total['elec_usage'], elec_usage)
+                total['elec_charge'] = _sum_nullable(total['elec_charge'], elec_charge)
+
+            rows.extend([
+                {
+                    'resident_id': resident_id,
+                    'date': period_start,
+                    'granularity': rollup_granularity.value,
+                    'elec_usage': total['elec_usage'],
+                    'elec_charge': total['elec_charge'],
+                    'created_time': cur_utc_timestamp,
+                    'updated_time': cur_utc_timestamp
+                }
+                for period_start, total in totals.items()
+            ])
+
+    if rows:
+        _executemany(session, AggUsage, SQL_TML_INSERT_AGG_USAGE, rows)
+
+
+def merge_archived_rows(
+    resident_id: int,
+    rows: Sequence[Tuple[datetime.date, Optional[float], Optional[float]]],
+    start_date: datetime.date,
+    end_date: datetime.date
+) -> List[Tuple[datetime.date, Optional[float], Optional[float]]]:
+    """
+    daily usages reloaded after their days are archived stay in fact table till next archive,
+    while the other days of their periods are archived,
+    so merge the archived ones with the rows of fact table, where the latter win
+    rows are tuples of date, electricity usage and charge
+    """
+    merged = {
+        usage['date']: (usage['date'], usage['elec_usage'], usage['elec_charge'])
+        for usage in read_archived_usages(resident_id, start_date, end_date)
+    }
+    merged.update({row[0]: row for row in rows})
+    return list(merged.values())
+
+
+def _sum_nullable(total: Optional[float], value: Optional[float]) -> Optional[float]:
+    """
+    follow SQL SUM, which ignores NULL and is NULL only when all values are
+    """
+    if value is None:
+        return total
+    if total is None:
+        return value
+    return total + value
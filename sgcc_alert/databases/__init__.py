@@ -1,5 +1,5 @@
 """
 SGCC data database storage module
 """
-from .models import DimResident, FactBalance, FactUsage  # NOQA
-from .session import managed_session, prepare_models  # NOQA
+from .models import AggUsage, DataGeneration, DimResident, FactBalance, FactUsage  # NOQA
+from .session import configure_session, managed_session  # NOQA
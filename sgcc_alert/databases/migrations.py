@@ -0,0 +1,213 @@
+"""
+Versioned schema migrations
+
+Each migration is a function registered with an ascending version,
+applied in order within one transaction, and recorded in schema_version table.
+Migrations are applied by the periodic task process on start, or explicitly by
+    python -m sgcc_alert.databases.migrations
+
+Tables are created from current models with existence check,
+so that a migration should also tolerate the schema which is already
+created by the former ones, e.g. check the column before adding it
+"""
+import datetime
+import logging
+import uuid
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Connection, func, insert, inspect, Integer, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DatabaseError
+
+from .models import AggUsage, DataGeneration, DimResident, FactBalance, FactUsage, SchemaVersion
+from .session import configure_session, SESSION
+from ..conf import settings
+from ..constants import DATABASE_MIGRATION_LOCK_KEY, DatabaseRole
+from ..log import config_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    'check_schema_version',
+    'get_latest_version',
+    'migrate'
+]
+
+
+MigrationFunc = Callable[[Connection], None]
+MIGRATIONS: List[Tuple[int, str, MigrationFunc]] = []
+
+
+def migration(version: int, description: str) -> Callable[[MigrationFunc], MigrationFunc]:
+    """
+    A decorator to register schema migration
+    :params version: version of the migration, which should be ascending
+    :type version: int
+    :params description: what the migration changes
+    :type description: str
+    """
+    def decorator(func: MigrationFunc) -> MigrationFunc:
+        if MIGRATIONS and MIGRATIONS[-1][0] >= version:
+            raise ValueError(f'Migration version {version} should be greater than {MIGRATIONS[-1][0]}')
+        MIGRATIONS.append((version, description, func))
+        return func
+
+    return decorator
+
+
+def get_latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(SchemaVersion.__tablename__):
+        return 0
+    version = conn.execute(select(func.max(SchemaVersion.version))).scalar()
+    return version or 0
+
+
+def migrate(engine: Optional[Engine] = None) -> int:
+    """
+    apply pending migrations under database-wide lock,
+    so that concurrent callers apply them only once
+    return the schema version after migration
+    """
+    if engine is None:
+        engine = SESSION.get_bind()
+
+    with engine.connect() as conn:
+        _lock(conn)
+        SchemaVersion.__table__.create(conn, checkfirst=True)  # type: ignore[attr-defined]
+
+        version = get_schema_version(conn)
+        for migration_version, description, migration_func in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            logger.info(f'Applying schema migration {migration_version}: {description}')
+            migration_func(conn)
+            cur_utc_timestamp = int(datetime.datetime.utcnow().timestamp())
+            conn.execute(
+                insert(SchemaVersion),
+                {
+                    'version': migration_version,
+                    'description': description,
+                    'created_time': cur_utc_timestamp,
+                    'updated_time': cur_utc_timestamp
+                }
+            )
+            version = migration_version
+        conn.commit()
+    return version
+
+
+def _lock(conn: Connection) -> None:
+    """
+    SQLite takes the write lock by immediate transaction,
+    which also makes DDL transactional since Python driver won't begin it implicitly
+    PostgreSQL takes advisory lock released on transaction end
+    """
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+    elif conn.dialect.name == 'postgresql':
+        conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': DATABASE_MIGRATION_LOCK_KEY})
+
+
+def check_schema_version(engine: Optional[Engine] = None) -> bool:
+    """
+    cheap check for the processes which don't migrate,
+    return whether the schema is up to date
+    """
+    if engine is None:
+        engine = SESSION.get_bind()
+
+    try:
+        with engine.connect() as conn:
+            version = get_schema_version(conn)
+    except DatabaseError as e:
+        logger.warning(f'Failed to check schema version: {e}')
+        return False
+
+    latest_version = get_latest_version()
+    if version < latest_version:
+        logger.warning(
+            f'Schema version {version} is behind {latest_version}, '
+            f'waiting for migration by periodic task'
+        )
+        return False
+    return True
+
+
+@migration(1, 'create dimension and fact tables')
+def _create_base_tables(conn: Connection) -> None:
+    for model in (DimResident, FactBalance, FactUsage):
+        model.__table__.create(conn, checkfirst=True)  # type: ignore[attr-defined]
+
+
+@migration(2, 'add query-shaped indexes')
+def _add_query_indexes(conn: Connection) -> None:
+    for model in (DimResident, FactBalance, FactUsage):
+        for index in model.__table__.indexes:  # type: ignore[attr-defined]
+            index.create(conn, checkfirst=True)
+
+
+@migration(3, 'create usage rollup table')
+def _create_agg_usage_table(conn: Connection) -> None:
+    AggUsage.__table__.create(conn, checkfirst=True)  # type: ignore[attr-defined]
+
+
+@migration(4, 'compact storage of fact tables')
+def _compact_fact_tables(conn: Connection) -> None:
+    """
+    rebuild the tables storing granularity as text,
+    into the ones storing granularity code, ordinal date (SQLite)
+    and without rowid (SQLite)
+    """
+    for model in (FactBalance, FactUsage, AggUsage):
+        table = model.__table__
+        columns = {
+            column['name']: column
+            for column in inspect(conn).get_columns(table.name)  # type: ignore[attr-defined]
+        }
+        if isinstance(columns['granularity']['type'], Integer):
+            continue
+
+        rows = [
+            dict(row)
+            for row in conn.execute(text(f'SELECT * FROM {table.name}')).mappings()  # type: ignore[attr-defined]
+        ]
+        for row in rows:
+            if isinstance(row['date'], str):
+                row['date'] = datetime.date.fromisoformat(row['date'])
+        table.drop(conn)  # type: ignore[attr-defined]
+        table.create(conn)  # type: ignore[attr-defined]
+        if rows:
+            conn.execute(insert(table), rows)  # type: ignore[arg-type]
+        logger.info(f'Rebuilt {len(rows)} rows of table {table.name}')  # type: ignore[attr-defined]
+
+
+@migration(5, 'create data generation table')
+def _create_data_generation_table(conn: Connection) -> None:
+    DataGeneration.__table__.create(conn, checkfirst=True)  # type: ignore[attr-defined]
+
+
+@migration(6, 'add database token of data generation')
+def _add_data_generation_token(conn: Connection) -> None:
+    table = DataGeneration.__table__
+    columns = {
+        column['name']
+        for column in inspect(conn).get_columns(table.name)  # type: ignore[attr-defined]
+    }
+    if 'token' not in columns:
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN token VARCHAR'))  # type: ignore[attr-defined]
+    conn.execute(
+        text(f'UPDATE {table.name} SET token = :token WHERE token IS NULL'),  # type: ignore[attr-defined]
+        {'token': uuid.uuid4().hex}
+    )
+
+
+if __name__ == '__main__':
+    config_logging('sgcc-alert-migration', settings.DEBUG)
+    configure_session(DatabaseRole.WRITER)
+    logger.info(f'Schema version is {migrate()}')
@@ -2,9 +2,77 @@
 Database schemes used by SQLAlchemy, which store data
 """
 import datetime
+from typing import Optional
 
-from sqlalchemy import Boolean, Date, Float, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Date,
+    Float,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    SmallInteger,
+    String
+)
+from sqlalchemy.engine import Dialect
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.types import TypeDecorator, TypeEngine
+
+from ..constants import DATE_GRANULARITY_CODES
+
+
+# resident ID is beyond 32-bit integer,
+# while SQLite keeps INTEGER which could be alias of rowid
+ResidentIdType = BigInteger().with_variant(Integer, 'sqlite')
+
+DATE_GRANULARITY_NAMES = {code: name for name, code in DATE_GRANULARITY_CODES.items()}
+
+
+class GranularityType(TypeDecorator):
+    """
+    date granularity is stored as small integer code,
+    and it is still its name out of database
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect: Dialect) -> Optional[int]:
+        if value is None:
+            return None
+        return DATE_GRANULARITY_CODES[value]
+
+    def process_result_value(self, value: Optional[int], dialect: Dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return DATE_GRANULARITY_NAMES[value]
+
+
+class OrdinalDateType(TypeDecorator):
+    """
+    SQLite stores date as ISO format text,
+    which is stored as proleptic Gregorian ordinal instead
+    other databases keep their native date type
+    """
+
+    impl = Date
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect: Dialect) -> TypeEngine:
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(Integer())
+        return dialect.type_descriptor(Date())
+
+    def process_bind_param(self, value: Optional[datetime.date], dialect: Dialect):
+        if value is None or dialect.name != 'sqlite':
+            return value
+        return value.toordinal()
+
+    def process_result_value(self, value, dialect: Dialect) -> Optional[datetime.date]:
+        if value is None or dialect.name != 'sqlite':
+            return value
+        return datetime.date.fromordinal(value)
 
 
 class BaseModel(DeclarativeBase):
@@ -26,9 +94,13 @@ class BaseModel(DeclarativeBase):
 class DimResident(BaseModel):
 
     __tablename__ = 'dim_resident'
+    __table_args__ = (
+        # listing residents ordered by address
+        Index('ix_dim_resident_resident_address', 'resident_address'),
+    )
 
     resident_id: Mapped[int] = mapped_column(
-        Integer, primary_key=True,
+        ResidentIdType, primary_key=True, autoincrement=False,
         doc='Identifier of resident',
         comment='Identifier of resident'
     )
@@ -52,19 +124,26 @@ class DimResident(BaseModel):
 class FactBalance(BaseModel):
 
     __tablename__ = 'fact_balance'
+    __table_args__ = (
+        # primary key serves balance history of a resident with date range and order,
+        # and the latest balance by backward scan
+        PrimaryKeyConstraint('resident_id', 'granularity', 'date'),
+        # rows are clustered by primary key, without the redundant rowid
+        {'sqlite_with_rowid': False}
+    )
 
     resident_id: Mapped[int] = mapped_column(
-        Integer, primary_key=True,
+        ResidentIdType, primary_key=True,
         doc='Identifier of resident',
         comment='Identifier of resident'
     )
     date: Mapped[datetime.date] = mapped_column(
-        Date, primary_key=True,
+        OrdinalDateType, primary_key=True,
         doc='Ordinal date',
         comment='Ordinal date'
     )
     granularity: Mapped[str] = mapped_column(
-        String, primary_key=True,
+        GranularityType, primary_key=True,
         doc='Date granularity',
         comment='Date granularity'
     )
@@ -83,19 +162,26 @@ class FactBalance(BaseModel):
 class FactUsage(BaseModel):
 
     __tablename__ = 'fact_usage'
+    __table_args__ = (
+        # primary key serves usage history of a resident on given granularity
+        # with date range and order
+        PrimaryKeyConstraint('resident_id', 'granularity', 'date'),
+        # rows are clustered by primary key, without the redundant rowid
+        {'sqlite_with_rowid': False}
+    )
 
     resident_id: Mapped[int] = mapped_column(
-        Integer, primary_key=True,
+        ResidentIdType, primary_key=True,
         doc='Identifier of resident',
         comment='Identifier of resident'
     )
     date: Mapped[datetime.date] = mapped_column(
-        Date, primary_key=True,
+        OrdinalDateType, primary_key=True,
         doc='Ordinal date',
         comment='Ordinal date'
     )
     granularity: Mapped[str] = mapped_column(
-        String, primary_key=True,
+        GranularityType, primary_key=True,
         doc='Date granularity',
         comment='Date granularity'
     )
@@ -109,3 +195,76 @@ class FactUsage(BaseModel):
         doc='Incremental electricity charge',
         comment='Incremental electricity charge'
     )
+
+
+class AggUsage(BaseModel):
+
+    __tablename__ = 'agg_usage'
+    __table_args__ = (
+        PrimaryKeyConstraint('resident_id', 'granularity', 'date'),
+        # rows are clustered by primary key, without the redundant rowid
+        {'sqlite_with_rowid': False}
+    )
+
+    resident_id: Mapped[int] = mapped_column(
+        ResidentIdType, primary_key=True,
+        doc='Identifier of resident',
+        comment='Identifier of resident'
+    )
+    date: Mapped[datetime.date] = mapped_column(
+        OrdinalDateType, primary_key=True,
+        doc='Start date of the period',
+        comment='Start date of the period'
+    )
+    granularity: Mapped[str] = mapped_column(
+        GranularityType, primary_key=True,
+        doc='Date granularity rolled up to, e.g. weekly, quarterly and yearly',
+        comment='Date granularity rolled up to, e.g. weekly, quarterly and yearly'
+    )
+    elec_usage: Mapped[float] = mapped_column(
+        Float, nullable=True,
+        doc='Total usage of electricity within the period',
+        comment='Total usage of electricity within the period'
+    )
+    elec_charge: Mapped[float] = mapped_column(
+        Float, nullable=True,
+        doc='Total electricity charge within the period',
+        comment='Total electricity charge within the period'
+    )
+
+
+class DataGeneration(BaseModel):
+
+    __tablename__ = 'data_generation'
+
+    id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=False,
+        doc='Identifier of the only row',
+        comment='Identifier of the only row'
+    )
+    generation: Mapped[int] = mapped_column(
+        Integer, nullable=False,
+        doc='Generation of data, which is increased by each load changing data',
+        comment='Generation of data, which is increased by each load changing data'
+    )
+    token: Mapped[Optional[str]] = mapped_column(
+        String, nullable=True,
+        doc='Random token written along with the row, which identifies the database',
+        comment='Random token written along with the row, which identifies the database'
+    )
+
+
+class SchemaVersion(BaseModel):
+
+    __tablename__ = 'schema_version'
+
+    version: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=False,
+        doc='Version of applied schema migration',
+        comment='Version of applied schema migration'
+    )
+    description: Mapped[str] = mapped_column(
+        String, nullable=False,
+        doc='Description of applied schema migration',
+        comment='Description of applied schema migration'
+    )
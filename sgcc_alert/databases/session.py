@@ -3,31 +3,185 @@ Database session
 """
 from contextlib import contextmanager
 import pathlib
-import time
+import threading
+from typing import Any, Dict, Hashable, List, Optional
+from urllib.parse import quote
 
-from sqlalchemy import create_engine
-from sqlalchemy.exc import DatabaseError
+from flask import has_app_context
+from flask.globals import app_ctx
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, URL
+from sqlalchemy.exc import DisconnectionError
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
-from .models import BaseModel
 from ..conf import settings
-from ..constants import DATABASE_INIT_RETRY_LIMIT
+from ..constants import (
+    DATABASE_POSTGRESQL_DEFAULT_OPTIONS,
+    DATABASE_POSTGRESQL_DRIVER,
+    DATABASE_READER_MAX_OVERFLOW,
+    DATABASE_READER_POOL_SIZE,
+    DATABASE_SQLITE_DEFAULT_OPTIONS,
+    DATABASE_SQLITE_JOURNAL_MODES,
+    DATABASE_SQLITE_SYNCHRONOUS_MODES,
+    DatabaseRole
+)
+from .snapshot import get_snapshot_id, get_snapshot_path
 
 
-def get_engine():
-    db_conf = settings.DATABASES['default']
-    if db_conf.get('ENGINE') != 'sqlite':
-        raise NotImplementedError
+def get_engine(
+    role: DatabaseRole = DatabaseRole.READER,
+    db_conf: Optional[Dict[str, Any]] = None
+) -> Engine:
+    """
+    readers keep a pool of connections to serve requests,
+    writer opens connection on demand since it loads data periodically
+    """
+    if db_conf is None:
+        db_conf = settings.DATABASES['default']
+
+    engine_name = db_conf.get('ENGINE')
+    if engine_name == 'sqlite':
+        return _get_sqlite_engine(role, db_conf)
+    if engine_name == 'postgresql':
+        return _get_postgresql_engine(role, db_conf)
+    raise NotImplementedError
+
+
+def _get_sqlite_engine(role: DatabaseRole, db_conf: Dict[str, Any]) -> Engine:
+    snapshot_path = get_snapshot_path(db_conf)
+    if role == DatabaseRole.READER and snapshot_path is not None:
+        return _get_sqlite_snapshot_engine(snapshot_path, db_conf)
 
     db_path = db_conf['NAME']
     db_path_obj = pathlib.Path(db_path)
-    return create_engine(f'sqlite:///{str(db_path_obj.resolve())}')
+    if role == DatabaseRole.WRITER:
+        engine = create_engine(
+            f'sqlite:///{str(db_path_obj.resolve())}',
+            poolclass=NullPool
+        )
+    else:
+        engine = create_engine(
+            f'sqlite:///{str(db_path_obj.resolve())}',
+            poolclass=QueuePool,
+            pool_size=DATABASE_READER_POOL_SIZE,
+            max_overflow=DATABASE_READER_MAX_OVERFLOW
+        )
+
+    options = {**DATABASE_SQLITE_DEFAULT_OPTIONS, **db_conf.get('OPTIONS', {})}
+    pragmas = _build_sqlite_pragmas(options)
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+def _get_sqlite_snapshot_engine(snapshot_path: str, db_conf: Dict[str, Any]) -> Engine:
+    """
+    snapshot is opened in immutable mode, which skips locking and change detection,
+    so that connections are replaced once a newer snapshot is published
+    """
+    engine = create_engine(
+        f'sqlite:///file:{quote(snapshot_path)}?mode=ro&immutable=1&uri=true',
+        poolclass=QueuePool,
+        pool_size=DATABASE_READER_POOL_SIZE,
+        max_overflow=DATABASE_READER_MAX_OVERFLOW
+    )
+
+    options = {**DATABASE_SQLITE_DEFAULT_OPTIONS, **db_conf.get('OPTIONS', {})}
+    pragmas = [
+        'PRAGMA query_only=ON',
+        f'PRAGMA cache_size={int(options["CACHE_SIZE"])}',
+        f'PRAGMA mmap_size={int(options["MMAP_SIZE"])}'
+    ]
+
+    @event.listens_for(engine, 'do_connect')
+    def _record_snapshot_id(_dialect, connection_record, _cargs, _cparams) -> None:
+        # identify the snapshot before opening it,
+        # a snapshot replaced in between is reopened on next checkout
+        connection_record.info['snapshot_id'] = get_snapshot_id(snapshot_path)
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, 'checkout')
+    def _check_snapshot(_dbapi_connection, connection_record, _connection_proxy) -> None:
+        if connection_record.info.get('snapshot_id') != get_snapshot_id(snapshot_path):
+            # pool discards the connection and opens the newer snapshot
+            raise DisconnectionError('Database snapshot is replaced')
+
+    return engine
+
 
+def _get_postgresql_engine(role: DatabaseRole, db_conf: Dict[str, Any]) -> Engine:
+    url = URL.create(
+        DATABASE_POSTGRESQL_DRIVER,
+        username=db_conf.get('USER') or None,
+        password=db_conf.get('PASSWORD') or None,
+        host=db_conf.get('HOST') or None,
+        port=int(db_conf['PORT']) if db_conf.get('PORT') else None,
+        database=db_conf['NAME']
+    )
+    if role == DatabaseRole.WRITER:
+        return create_engine(url, poolclass=NullPool)
+
+    options = {**DATABASE_POSTGRESQL_DEFAULT_OPTIONS, **db_conf.get('OPTIONS', {})}
+    return create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=int(options['POOL_SIZE']),
+        max_overflow=int(options['MAX_OVERFLOW']),
+        pool_timeout=float(options['POOL_TIMEOUT']),
+        pool_recycle=int(options['POOL_RECYCLE']),
+        pool_pre_ping=bool(options['POOL_PRE_PING'])
+    )
+
+
+def _build_sqlite_pragmas(options: Dict[str, Any]) -> List[str]:
+    journal_mode = str(options['JOURNAL_MODE']).upper()
+    if journal_mode not in DATABASE_SQLITE_JOURNAL_MODES:
+        raise ValueError(f'{journal_mode} is unavailable SQLite journal mode')
+    synchronous = str(options['SYNCHRONOUS']).upper()
+    if synchronous not in DATABASE_SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f'{synchronous} is unavailable SQLite synchronous mode')
+
+    return [
+        f'PRAGMA journal_mode={journal_mode}',
+        f'PRAGMA synchronous={synchronous}',
+        f'PRAGMA busy_timeout={int(options["BUSY_TIMEOUT"])}',
+        f'PRAGMA cache_size={int(options["CACHE_SIZE"])}',
+        f'PRAGMA mmap_size={int(options["MMAP_SIZE"])}'
+    ]
+
+
+def get_session_scope() -> Hashable:
+    """
+    sessions are scoped to Flask app context while serving request,
+    which is pushed for each request whatever the worker serves requests by threads or not,
+    and scoped to thread otherwise, e.g. periodic tasks
+    """
+    if has_app_context():
+        return id(app_ctx._get_current_object())  # type: ignore[attr-defined]
+    return threading.get_ident()
 
-def get_session():
-    engine = get_engine()
+
+def get_session(
+    role: DatabaseRole = DatabaseRole.READER,
+    db_conf: Optional[Dict[str, Any]] = None
+):
+    engine = get_engine(role, db_conf)
     session = scoped_session(
-        sessionmaker(bind=engine, autoflush=True, expire_on_commit=True)
+        sessionmaker(bind=engine, autoflush=True, expire_on_commit=True),
+        scopefunc=get_session_scope
     )
     return session
 
@@ -35,6 +189,28 @@ def get_session():
 SESSION = get_session()
 
 
+def configure_session(
+    role: DatabaseRole,
+    db_conf: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    rebind the session with the engine fitting the role of current process
+    """
+    previous_engine = SESSION.bind
+    SESSION.remove()
+    SESSION.configure(bind=get_engine(role, db_conf))
+    if isinstance(previous_engine, Engine):
+        previous_engine.dispose()
+
+
+def remove_session(_exception: Optional[BaseException] = None) -> None:
+    """
+    discard the session of current scope, which returns its connection to pool,
+    called on Flask app context teardown so that sessions don't outlive requests
+    """
+    SESSION.remove()
+
+
 @contextmanager
 def managed_session():
     try:
@@ -45,19 +221,3 @@ def managed_session():
         raise
     finally:
         SESSION.close()
-
-
-def prepare_models() -> None:
-    retries = 0
-    while True:
-        try:
-            with managed_session() as session:
-                BaseModel.metadata.create_all(session.bind)
-        except DatabaseError:
-            if retries < DATABASE_INIT_RETRY_LIMIT:
-                time.sleep(10)
-                retries += 1
-            else:
-                break
-        else:
-            break
@@ -0,0 +1,79 @@
+"""
+Read snapshot of SQLite database
+
+The periodic task process publishes a consistent copy of the database
+after each load, by SQLite online backup API and atomic rename.
+Web workers open the snapshot read-only in immutable mode,
+so that they never contend with the writer,
+and reconnect when a newer snapshot replaces the one they opened
+"""
+import logging
+import os
+import pathlib
+import sqlite3
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+__all__ = [
+    'get_snapshot_id',
+    'get_snapshot_path',
+    'publish_snapshot'
+]
+
+
+def get_snapshot_path(db_conf: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    return the path of snapshot,
+    which is None when snapshot isn't enabled
+    """
+    if db_conf is None:
+        db_conf = settings.DATABASES['default']
+    if db_conf.get('ENGINE') != 'sqlite' or not db_conf.get('SNAPSHOT_NAME'):
+        return None
+    return str(pathlib.Path(db_conf['SNAPSHOT_NAME']).resolve())
+
+
+def get_snapshot_id(snapshot_path: str) -> Optional[Tuple[int, int]]:
+    """
+    identify the published snapshot by its inode and modification time,
+    both change when a newer one is renamed onto the path
+    """
+    try:
+        stat = os.stat(snapshot_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def publish_snapshot(db_conf: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    copy the database into a temporary file next to the snapshot,
+    then rename it onto the snapshot, which readers never see half written
+    return the path of snapshot, or None when snapshot isn't enabled
+    """
+    if db_conf is None:
+        db_conf = settings.DATABASES['default']
+    snapshot_path = get_snapshot_path(db_conf)
+    if snapshot_path is None:
+        return None
+
+    start = time.perf_counter()
+    tmp_path = f'{snapshot_path}.tmp'
+    source = sqlite3.connect(str(pathlib.Path(db_conf['NAME']).resolve()))
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.backup(target)
+        # snapshot is a single file, since immutable readers never look at WAL
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, snapshot_path)
+    logger.info(f'Published database snapshot {snapshot_path} in {round(time.perf_counter() - start, 4)}s')
+    return snapshot_path
@@ -0,0 +1,71 @@
+"""
+Export usage or balance history of residents as NDJSON or CSV,
+streamed from database with constant memory
+
+Usage:
+    python -m sgcc_alert.export usages --format csv --resident-id 1000000000001 --output usages.csv
+    python -m sgcc_alert.export balances > balances.ndjson
+"""
+import argparse
+import logging
+import sys
+from typing import Iterator, Optional, Sequence, TextIO
+
+from .conf import settings
+from .core.services.query_service import BALANCE_COLUMNS, QueryService, USAGE_COLUMNS
+from .core.utils.export import EXPORT_FORMATS
+from .log import config_logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def iter_export(
+    kind: str,
+    export_format: str,
+    resident_ids: Optional[Sequence[int]] = None,
+    granularity: Optional[str] = None
+) -> Iterator[str]:
+    _, formatter = EXPORT_FORMATS[export_format]
+    resident_id_list = list(resident_ids) if resident_ids else None
+    if kind == 'usages':
+        return formatter(USAGE_COLUMNS, QueryService.iter_usages(resident_id_list, granularity))
+    if kind == 'balances':
+        return formatter(BALANCE_COLUMNS, QueryService.iter_balances(resident_id_list))
+    raise ValueError(f'{kind} is unavailable export')
+
+
+def write_export(chunks: Iterator[str], output: TextIO) -> int:
+    """
+    return the count of characters written
+    """
+    size = 0
+    for chunk in chunks:
+        output.write(chunk)
+        size += len(chunk)
+    output.flush()
+    return size
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=['usages', 'balances'])
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='ndjson')
+    parser.add_argument('--resident-id', type=int, action='append', help='repeatable, all residents if omitted')
+    parser.add_argument('--granularity', default=None, help='usages only, all collected granularities if omitted')
+    parser.add_argument('--output', default=None, help='file path, defaults to stdout')
+    args = parser.parse_args(argv)
+
+    config_logging('sgcc-alert-export', settings.DEBUG)
+
+    chunks = iter_export(args.kind, args.format, args.resident_id, args.granularity)
+    if args.output is None:
+        write_export(chunks, sys.stdout)
+        return
+    with open(args.output, 'w', newline='') as f:
+        size = write_export(chunks, f)
+    logger.info(f'Exported {args.kind} of {size} characters into {args.output}')
+
+
+if __name__ == '__main__':
+    main()
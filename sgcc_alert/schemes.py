@@ -2,7 +2,7 @@
 Object type-hint definition
 """
 import datetime
-from typing import Optional, TypedDict
+from typing import List, Optional, TypedDict, Union
 
 
 class Resident(TypedDict):
@@ -29,3 +29,68 @@ class Balance(TypedDict):
     granularity: str        # date granularity
     balance: float          # unit is CNY
     est_remain_days: float  # unit is day
+
+
+class BalanceSeries(TypedDict):
+    """
+    balances as parallel arrays, with constant fields once
+    """
+
+    resident_id: int
+    granularity: str
+    date: List[datetime.date]
+    balance: List[float]
+    est_remain_days: List[float]
+
+
+class UsageSeries(TypedDict):
+    """
+    usages as parallel arrays, with constant fields once
+    """
+
+    resident_id: int
+    granularity: str
+    date: List[datetime.date]
+    elec_usage: List[Optional[float]]
+    elec_charge: List[Optional[float]]
+
+
+class Dashboard(TypedDict):
+
+    latest_balance: Optional[Balance]
+    daily_usages: Union[List[Usage], UsageSeries]    # recent days till the latest one
+    monthly_usages: Union[List[Usage], UsageSeries]  # within requested date range
+
+
+class UsageStatistics(TypedDict, total=False):
+
+    date: datetime.date       # start date of the period
+    sum: Optional[float]
+    avg: Optional[float]
+    min: Optional[float]
+    max: Optional[float]
+    count: int                # days with known value
+    delta: Optional[float]    # difference of sum to the previous period
+
+
+class NotchCandidate(TypedDict):
+
+    x: int        # left top x ordinate of the notch
+    y: int        # left top y ordinate of the notch
+    score: float  # 1.0 means the size matches slide block exactly
+
+
+class NotchParams(TypedDict):
+
+    canny_lower_threshold: int
+    canny_upper_threshold: int
+    binary_thresh: float
+    kernel_size: int
+    slide_x_offset_factor: float  # ratio of drag distance to notch x ordinate
+
+
+class DragMove(TypedDict):
+
+    x_offset: float  # horizontal offset to the start point of the drag
+    y_offset: float  # vertical offset to the start point of the drag
+    steps: int       # intermediate mouse events interpolated by the browser driver
@@ -0,0 +1,129 @@
+"""
+JSON provider of the application
+
+Connexion serialises API responses by the JSON provider of Flask app,
+whose default one is built on json module of standard library.
+OrjsonProvider encodes them by orjson instead, which serialises dates natively,
+and keeps the output identical with the default one (with connexion's encoder),
+e.g. indentation, sorted keys, escaped non-ASCII characters and float representation.
+Arguments which orjson can't express, e.g. custom separators or encoder class,
+and objects which it can't serialise as identical, e.g. integers beyond 64-bit
+or non-string keys, fall back to the default one.
+
+Known differences are that non-finite floats are encoded as null
+rather than NaN or Infinity, which are invalid JSON either,
+and aware datetimes in UTC end with 'Z' rather than '+00:00'
+"""
+import decimal
+import re
+from typing import Any, Dict, Optional, Type, Union
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+import orjson
+
+
+__all__ = [
+    'install_json_provider',
+    'JSON_PROVIDERS',
+    'OrjsonProvider'
+]
+
+
+# dumps arguments which orjson can express
+ORJSON_DUMPS_ARGS = {'indent', 'separators', 'sort_keys', 'ensure_ascii'}
+# non-string keys are left to the default one,
+# since standard library sorts them before they are converted to strings
+ORJSON_DUMPS_OPTION = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+# cheap checks on output before the exact scan,
+# standard library represents floats below 1e-4 or from 1e16 in exponent,
+# while orjson represents the ones above 1e-5 in decimal and omits plus sign of exponent.
+# Literal-led patterns are searched separately, which is much faster than alternation
+FLOAT_EXPONENT_MATCH = re.compile(rb'e[-0-9]').search
+FLOAT_SMALL_DECIMAL = b'0.0000'
+# JSON string tokens are matched ahead of number ones, so that texts in strings are kept
+FLOAT_TOKEN_SUB = re.compile(rb'"(?:[^"\\]|\\.)*"|-?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?').sub
+# standard library escapes DEL as well with ensure_ascii
+NON_ASCII_SUB = re.compile('[\x7f-\U0010ffff]').sub
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+def _replace_float_token(match: re.Match) -> bytes:
+    token = match.group()
+    if token.startswith(b'"') or not (b'e' in token or b'E' in token or b'0.0000' in token):
+        return token
+    return repr(float(token)).encode()
+
+
+def _escape_non_ascii(match: re.Match) -> str:
+    code = ord(match.group())
+    if code < 0x10000:
+        return f'\\u{code:04x}'
+    code -= 0x10000
+    return f'\\u{0xd800 | (code >> 10):04x}\\u{0xdc00 | (code & 0x3ff):04x}'
+
+
+class OrjsonProvider(DefaultJSONProvider):
+
+    def _get_dumps_option(self, kwargs: Dict[str, Any]) -> Optional[int]:
+        """
+        return orjson option equivalent with dumps arguments,
+        or None if they are inexpressible
+        """
+        if not set(kwargs).issubset(ORJSON_DUMPS_ARGS):
+            return None
+
+        option = ORJSON_DUMPS_OPTION
+        indent = kwargs.get('indent')
+        separators = kwargs.get('separators')
+        if indent == 2 and separators in (None, (',', ': ')):
+            option |= orjson.OPT_INDENT_2
+        elif indent is not None or separators != (',', ':'):
+            return None
+
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = self._get_dumps_option(kwargs)
+        if option is None:
+            return super().dumps(obj, **kwargs)
+
+        try:
+            content = orjson.dumps(obj, default=_default, option=option)
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+        if FLOAT_EXPONENT_MATCH(content) or FLOAT_SMALL_DECIMAL in content:
+            content = FLOAT_TOKEN_SUB(_replace_float_token, content)
+        if kwargs.get('ensure_ascii', self.ensure_ascii) and (not content.isascii() or b'\x7f' in content):
+            return NON_ASCII_SUB(_escape_non_ascii, content.decode())
+        return content.decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # e.g. NaN, or integers beyond 64-bit
+            return super().loads(s)
+
+
+JSON_PROVIDERS: Dict[str, Type[JSONProvider]] = {
+    'default': DefaultJSONProvider,
+    'orjson': OrjsonProvider
+}
+
+
+def install_json_provider(app: Flask, name: str) -> None:
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f'{name} is unavailable JSON provider')
+    app.json = JSON_PROVIDERS[name](app)
@@ -149,45 +149,14 @@ function initDateRangeFilter() {
   });
 }
 
-async function getLatestBalanceData(residentId) {
-  const url = `/api/v1.0/residents/${residentId}/balances?order_by=date&order=desc&limit=1`;
+async function getDashboardData(residentId, startDate, endDate) {
+  const url = `/api/v1.0/residents/${residentId}/dashboard?start_date=${startDate}&end_date=${endDate}&format=columnar`
   const response = await axios.get(url);
-  const data = response.data;
-
-  if (data.data.length > 0) {
-    const latestData = data.data[0];
-    return { value: latestData.balance, date: latestData.date };
-  }
-  return { value: null, date: null }
+  return response.data.data;
 }
 
-async function getRecentThirtyDaysUsageData(residentId) {
-  const { startDate, endDate } = getRecentDateRange(30);
-  const url = `/api/v1.0/residents/${residentId}/usages?start_date=${startDate}&end_date=${endDate}&granularity=daily`
-  const response = await axios.get(url);
-  const data = response.data;
-
-  if (data.data.length > 0) {
-    return data.data;
-  }
-  return [];
-}
-
-async function getMonthlyUsageData(residentId, startDate, endDate) {
-  const url = `/api/v1.0/residents/${residentId}/usages?start_date=${startDate}&end_date=${endDate}&granularity=monthly`
-  const response = await axios.get(url);
-  const data = response.data;
-
-  if (data.data.length > 0) {
-    return data.data;
-  }
-  return [];
-}
-
-async function renderBalanceChart(residentId) {
-  const latestBalanceData = await getLatestBalanceData(residentId);
-  const { value, date } = latestBalanceData;
-  const recentDailyUsageData = await getRecentThirtyDaysUsageData(residentId);
+function renderBalanceChart(latestBalanceData, recentDailyUsageSeries) {
+  const { balance: value, date } = latestBalanceData ?? { balance: null, date: null };
 
   latestBalanceSparklineChart.updateOptions({
     title: {
@@ -196,35 +165,28 @@ async function renderBalanceChart(residentId) {
     subtitle: {
       text: `更新日期：${date}`,
     },
+    labels: recentDailyUsageSeries.date,
   });
   latestBalanceSparklineChart.updateSeries([{
     name: '电量（KWh）',
-    data: recentDailyUsageData.map(item => ({
-      x: item.date,
-      y: item.elec_usage,
-    })),
+    data: recentDailyUsageSeries.elec_usage,
   }]);
 }
 
-async function renderMonthlyUsageChart(residentId, startDate, endDate) {
-  const monthlyUsageData = await getMonthlyUsageData(residentId, startDate, endDate);
-
+function renderMonthlyUsageChart(monthlyUsageSeries) {
+  monthlyUsageChart.updateOptions({
+    labels: monthlyUsageSeries.date,
+  });
   monthlyUsageChart.updateSeries([
     {
       name: '用电量（KWh）',
       type: 'column',
-      data: monthlyUsageData.map(item => ({
-        x: item.date,
-        y: item.elec_usage,
-      })),
+      data: monthlyUsageSeries.elec_usage,
     },
     {
       name: '电费（CNY）',
       type: 'line',
-      data: monthlyUsageData.map(item => ({
-        x: item.date,
-        y: item.elec_charge,
-      })),
+      data: monthlyUsageSeries.elec_charge,
     },
   ]);
 }
@@ -236,8 +198,9 @@ async function loadCharts() {
   const endDate = dateRange[1];
 
   if (residentId) {
-    await renderBalanceChart(residentId);
-    await renderMonthlyUsageChart(residentId, startDate, endDate);
+    const dashboardData = await getDashboardData(residentId, startDate, endDate);
+    renderBalanceChart(dashboardData.latest_balance, dashboardData.daily_usages);
+    renderMonthlyUsageChart(dashboardData.monthly_usages);
   } else {
     alert('请填写所有筛选条件');
   }
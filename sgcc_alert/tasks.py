@@ -11,17 +11,15 @@ import time
 from types import FrameType
 from typing import Optional
 
-from playwright.sync_api import sync_playwright
 from schedule import Scheduler
 
 from .conf import settings
-from .core.services.acquisition_service import AcquisitionService
-from .databases import prepare_models
-from .core.utils.load import (
-    load_balances,
-    load_residents,
-    load_usages
-)
+from .constants import DatabaseRole
+from .databases import configure_session
+from .databases.migrations import migrate
+from .databases.snapshot import publish_snapshot
+from .core.utils.archive import archive_daily_usages, check_retention
+from .core.utils.load import load_sgcc_data
 from .log import config_logging
 
 
@@ -63,6 +61,12 @@ def collect_sgcc_data() -> None:
     collect data by headless browser,
     loading into database
     """
+    # scraping stack (Playwright, OpenCV, etc.) is imported on collection only,
+    # which keeps it out of the processes never scraping
+    from playwright.sync_api import sync_playwright
+
+    from .core.services.acquisition_service import AcquisitionService
+
     with sync_playwright() as p:
         browser = p.chromium.launch()
         service = AcquisitionService(
@@ -75,14 +79,17 @@ def collect_sgcc_data() -> None:
         daily_usage = service.get_daily_usage_history()
         monthly_usage = service.get_monthly_usage_history()
 
-    prepare_models()
-    load_residents(residents)
-    load_balances(balance)
-    load_usages(daily_usage + monthly_usage)
+    load_sgcc_data(residents, balance, daily_usage + monthly_usage)
+    archive_daily_usages()
+    publish_snapshot()
 
 
 def run() -> None:
     config_logging('sgcc-alert-periodic', settings.DEBUG)
+    check_retention()
+    configure_session(DatabaseRole.WRITER)
+    migrate()
+    publish_snapshot()
 
     def _exit(signal_number: int, _frame: Optional[FrameType]) -> None:
         logger.warning(
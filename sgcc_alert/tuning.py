@@ -0,0 +1,219 @@
+"""
+Tune captcha notch computer vision parameters
+on labelled captcha corpus, in a process pool
+
+Each sample of corpus is a JSON file with
+- background_data_url: data URL of captcha background image
+- slide_data_url: data URL of captcha slide block image
+- notch_x: labelled x ordinate of notch's left top
+- slide_x_offset: (optional) drag distance which passed the verification
+
+Usage:
+    python -m sgcc_alert.tuning --corpus tests/mock_data --trials 50
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import logging
+import os
+import pathlib
+import random
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, TypedDict
+
+from .conf import resolve_settings_path, settings
+from .constants import (
+    CV_TUNING_NOTCH_MARGIN_ERR,
+    CV_TUNING_SEARCH_SPACE,
+    CV_TUNING_SLIDE_X_OFFSET_FACTORS
+)
+from .core.services.notch_service import DEFAULT_NOTCH_PARAMS, NotchService
+from .log import config_logging
+from .schemes import NotchParams
+
+
+logger = logging.getLogger(__name__)
+
+
+class TuningResult(TypedDict):
+
+    params: NotchParams
+    hit_rate: float         # ratio of samples whose notch is within margin
+    mean_abs_error: float   # unit is pixel
+    mean_latency: float     # unit is millisecond
+
+
+# corpus of each worker process, installed by pool initializer
+# to avoid pickling the images for every parameter set
+_CORPUS: List[Dict[str, Any]] = []
+
+
+def load_corpus(corpus_dir: str) -> List[Dict[str, Any]]:
+    corpus = []
+    for sample_path in sorted(pathlib.Path(corpus_dir).glob('*.json')):
+        with sample_path.open('r') as f:
+            sample = json.load(f)
+        if 'notch_x' not in sample:
+            logger.warning(f'Skip unlabelled captcha sample {sample_path}')
+            continue
+        corpus.append(sample)
+    return corpus
+
+
+def build_candidate_params(
+    search_space: Mapping[str, Sequence],
+    trials: Optional[int] = None,
+    seed: Optional[int] = None
+) -> List[NotchParams]:
+    """
+    build the grid of detection parameters,
+    which is randomly sampled when trials is given
+
+    slide_x_offset_factor isn't part of the grid
+    since it doesn't affect detection, and it is fitted per parameter set
+    """
+    keys = list(search_space)
+    candidates: List[NotchParams] = []
+    for values in itertools.product(*[search_space[key] for key in keys]):
+        params = DEFAULT_NOTCH_PARAMS.copy()
+        params.update(dict(zip(keys, values)))  # type: ignore[typeddict-item]
+        if params['canny_lower_threshold'] >= params['canny_upper_threshold']:
+            continue
+        candidates.append(params)
+
+    if trials is not None and trials < len(candidates):
+        candidates = random.Random(seed).sample(candidates, trials)
+    return candidates
+
+
+def evaluate_params(params: NotchParams) -> TuningResult:
+    hits = 0
+    abs_errors = []
+    elapsed = 0.0
+    detected_x_ordinates = []
+    for sample in _CORPUS:
+        start = time.perf_counter()
+        service = NotchService(
+            sample['background_data_url'],
+            sample['slide_data_url'],
+            params
+        )
+        x_ordinate, _ = service.locate_notch()
+        elapsed += time.perf_counter() - start
+
+        abs_error = abs(x_ordinate - sample['notch_x'])
+        abs_errors.append(abs_error)
+        if abs_error <= CV_TUNING_NOTCH_MARGIN_ERR:
+            hits += 1
+        detected_x_ordinates.append(x_ordinate)
+
+    result_params = params.copy()
+    result_params['slide_x_offset_factor'] = _fit_slide_x_offset_factor(
+        detected_x_ordinates,
+        params['slide_x_offset_factor']
+    )
+    sample_count = max(len(_CORPUS), 1)
+    return {
+        'params': result_params,
+        'hit_rate': round(hits / sample_count, 4),
+        'mean_abs_error': round(sum(abs_errors) / sample_count, 4),
+        'mean_latency': round(elapsed * 1000 / sample_count, 4)
+    }
+
+
+def _fit_slide_x_offset_factor(
+    detected_x_ordinates: List[int],
+    default_factor: float
+) -> float:
+    """
+    choose the factor which makes drag distance closest to the labelled one,
+    keep the given factor when no sample is labelled with drag distance
+    """
+    pairs = [
+        (x_ordinate, sample['slide_x_offset'])
+        for x_ordinate, sample in zip(detected_x_ordinates, _CORPUS)
+        if 'slide_x_offset' in sample and x_ordinate > 0
+    ]
+    if not pairs:
+        return default_factor
+    return min(
+        CV_TUNING_SLIDE_X_OFFSET_FACTORS,
+        key=lambda factor: sum(abs(x * factor - offset) for x, offset in pairs)
+    )
+
+
+def _init_corpus(corpus: List[Dict[str, Any]]) -> None:
+    global _CORPUS
+    _CORPUS = corpus
+
+
+def tune(
+    corpus: List[Dict[str, Any]],
+    candidates: List[NotchParams],
+    workers: Optional[int] = None
+) -> List[TuningResult]:
+    """
+    evaluate each parameter set on the corpus in process pool
+    return results from the best to the worst
+    """
+    chunksize = max(len(candidates) // ((workers or os.cpu_count() or 1) * 4), 1)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_corpus,
+        initargs=(corpus,)
+    ) as executor:
+        results = list(executor.map(evaluate_params, candidates, chunksize=chunksize))
+
+    results.sort(key=lambda item: (-item['hit_rate'], item['mean_abs_error'], item['mean_latency']))
+    return results
+
+
+def dump_params(result: TuningResult, path: str) -> None:
+    """
+    replace the file atomically,
+    since it could be read by running task at the same time
+    """
+    content: Dict[str, Any] = dict(result['params'])
+    content['metrics'] = {
+        'hit_rate': result['hit_rate'],
+        'mean_abs_error': result['mean_abs_error'],
+        'mean_latency': result['mean_latency']
+    }
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(content, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', required=True, help='directory of labelled captcha JSON files')
+    parser.add_argument('--output', default=None, help='defaults to settings.CAPTCHA_NOTCH_PARAMS_PATH')
+    parser.add_argument('--trials', type=int, default=None, help='random search trials, grid search if omitted')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None, help='size of process pool')
+    args = parser.parse_args(argv)
+
+    config_logging('sgcc-alert-tuning', settings.DEBUG)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise ValueError(f'No labelled captcha sample in {args.corpus}')
+    candidates = build_candidate_params(CV_TUNING_SEARCH_SPACE, args.trials, args.seed)
+    logger.info(f'Tuning {len(candidates)} parameter sets on {len(corpus)} captcha samples')
+
+    _init_corpus(corpus)
+    baseline = evaluate_params(DEFAULT_NOTCH_PARAMS)
+    results = tune(corpus, candidates, args.workers)
+    best = results[0]
+    logger.info(f'Built-in parameters: {baseline}')
+    logger.info(f'Best parameters: {best}')
+
+    output = args.output if args.output is not None else resolve_settings_path(settings.CAPTCHA_NOTCH_PARAMS_PATH)
+    dump_params(best, output)
+    logger.info(f'Parameters are written into {output}')
+
+
+if __name__ == '__main__':
+    main()
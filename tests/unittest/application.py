@@ -0,0 +1,22 @@
+"""
+Application of test cases
+
+Application module creates the app on import, which checks schema version,
+so that it is imported after the session is configured with test database
+"""
+from typing import Any, Dict, Optional
+
+from flask.testing import FlaskClient
+
+from sgcc_alert.cache import configure_response_cache
+
+
+def get_test_client(cache_conf: Optional[Dict[str, Any]] = None) -> FlaskClient:
+    """
+    response cache is disabled unless it is configured by test case,
+    so that test cases never share a cache, or write it into working directory
+    """
+    from sgcc_alert.app import app
+
+    configure_response_cache(cache_conf or {'PATH': '', 'MAX_SIZE': 0})
+    return app.test_client()
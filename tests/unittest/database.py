@@ -0,0 +1,37 @@
+"""
+Database configuration of test cases
+
+Test cases run on a temporary SQLite file by default,
+set SGCC_TEST_DATABASE_ENGINE=postgresql along with
+SGCC_TEST_DATABASE_NAME, SGCC_TEST_DATABASE_USER, SGCC_TEST_DATABASE_PASSWORD,
+SGCC_TEST_DATABASE_HOST and SGCC_TEST_DATABASE_PORT to run them on PostgreSQL
+"""
+import os
+from typing import Any, Dict, Optional
+
+
+TEST_DATABASE_ENV_PREFIX = 'SGCC_TEST_DATABASE_'
+
+
+def get_test_db_conf(
+    tmp_dir: str,
+    sqlite_options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    engine_name = os.environ.get(f'{TEST_DATABASE_ENV_PREFIX}ENGINE', 'sqlite')
+    if engine_name == 'sqlite':
+        return {
+            'ENGINE': 'sqlite',
+            'NAME': os.path.join(tmp_dir, 'sgcc.sqlite'),
+            'OPTIONS': sqlite_options or {}
+        }
+    return {
+        'ENGINE': engine_name,
+        **{
+            key: os.environ.get(f'{TEST_DATABASE_ENV_PREFIX}{key}', '')
+            for key in ('NAME', 'USER', 'PASSWORD', 'HOST', 'PORT')
+        }
+    }
+
+
+def is_sqlite(db_conf: Dict[str, Any]) -> bool:
+    return db_conf['ENGINE'] == 'sqlite'
@@ -0,0 +1,221 @@
+"""
+Unit test for archive of daily usages
+"""
+import datetime
+import os
+import pathlib
+import tempfile
+from unittest import mock, TestCase
+
+from sqlalchemy import select
+
+from sgcc_alert.conf import resolve_settings_path, settings
+from sgcc_alert.constants import DAILY_USAGE_RETENTION_MIN_DAYS, DatabaseRole, DateGranularity
+from sgcc_alert.core.services.query_service import QueryService
+from sgcc_alert.core.utils.archive import (
+    archive_daily_usages,
+    check_retention,
+    get_archive_path,
+    get_hot_window_start,
+    read_archive
+)
+from sgcc_alert.core.utils.load import load_usages
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import AggUsage, BaseModel
+from sgcc_alert.databases.session import SESSION
+from .application import get_test_client
+from .database import get_test_db_conf
+from .test_load import DAILY_USAGES
+
+
+RESIDENT_ID = 1000000000001
+URL_RESIDENTS_USAGE_STATISTICS = '/api/v1.0/residents/usages/statistics'
+# hot window starts from 2025-01-06, the Monday of 37 days ago
+TODAY = datetime.date(2025, 2, 17)
+USAGES = [
+    {**DAILY_USAGES[0], 'date': datetime.date(2024, 12, 31), 'elec_charge': None},
+    *DAILY_USAGES
+]
+
+
+class ArchiveTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._patchers = [
+            mock.patch.object(settings, 'DAILY_USAGE_RETENTION_DAYS', DAILY_USAGE_RETENTION_MIN_DAYS),
+            mock.patch.object(settings, 'USAGE_ARCHIVE_DIR', os.path.join(self._tmp_dir.name, 'archive'))
+        ]
+        for patcher in self._patchers:
+            patcher.start()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        for patcher in self._patchers:
+            patcher.stop()
+        self._tmp_dir.cleanup()
+
+    def test_get_hot_window_start(self):
+        self.assertEqual(get_hot_window_start(TODAY), datetime.date(2025, 1, 6))
+        with mock.patch.object(settings, 'DAILY_USAGE_RETENTION_DAYS', 0):
+            self.assertIsNone(get_hot_window_start(TODAY))
+        # retention shorter than scraped days archives the days reloaded by next scrape
+        with mock.patch.object(settings, 'DAILY_USAGE_RETENTION_DAYS', DAILY_USAGE_RETENTION_MIN_DAYS - 1):
+            with self.assertRaises(ValueError):
+                check_retention()
+        check_retention()
+
+    def test_get_archive_path(self):
+        self.assertEqual(
+            get_archive_path(1000000000001, 2024),
+            pathlib.Path(self._tmp_dir.name) / 'archive' / '1000000000001' / 'daily_usage_2024.npz'
+        )
+        # relative directory is next to settings module rather than working directory
+        with mock.patch.object(settings, 'USAGE_ARCHIVE_DIR', 'archive'):
+            expected = pathlib.Path(resolve_settings_path('archive')) / '1000000000001' / 'daily_usage_2024.npz'
+            cwd = os.getcwd()
+            os.chdir(self._tmp_dir.name)
+            try:
+                self.assertEqual(get_archive_path(1000000000001, 2024), expected)
+            finally:
+                os.chdir(cwd)
+        self.assertTrue(expected.is_absolute())
+
+    def test_archive_daily_usages(self):
+        load_usages(USAGES)
+
+        self.assertEqual(archive_daily_usages(TODAY), 6)
+        self.assertTrue(get_archive_path(RESIDENT_ID, 2024).exists())
+        self.assertTrue(get_archive_path(RESIDENT_ID, 2025).exists())
+        # rerun finds nothing to archive, and keeps the archived ones
+        self.assertEqual(archive_daily_usages(TODAY), 0)
+
+        with mock.patch(
+            'sgcc_alert.core.services.query_service.get_hot_window_start',
+            return_value=get_hot_window_start(TODAY)
+        ):
+            self.assertEqual(
+                QueryService.query_resident_usages(RESIDENT_ID, DateGranularity.DAILY.value),
+                USAGES
+            )
+            self.assertEqual(
+                QueryService.query_resident_usage_series(RESIDENT_ID, DateGranularity.DAILY.value)['date'],
+                [usage['date'] for usage in USAGES]
+            )
+            self.assertEqual(
+                QueryService.query_resident_usages(
+                    RESIDENT_ID,
+                    DateGranularity.DAILY.value,
+                    start_date=datetime.date(2025, 1, 3),
+                    end_date=datetime.date(2025, 1, 8),
+                    order='desc',
+                    offset=1,
+                    limit=3
+                ),
+                USAGES[7: 4: -1]
+            )
+            self.assertEqual(
+                QueryService.query_resident_usages(
+                    RESIDENT_ID,
+                    DateGranularity.DAILY.value,
+                    order='desc',
+                    limit=3,
+                    after=[datetime.date(2025, 1, 8)]
+                ),
+                USAGES[7: 4: -1]
+            )
+
+    def test_paginate_archived_usages(self):
+        usages = [
+            {**DAILY_USAGES[0], 'date': datetime.date(year, 1, day)}
+            for year in range(2021, 2024)
+            for day in range(1, 4)
+        ] + USAGES
+        load_usages(usages)
+        archive_daily_usages(TODAY)
+
+        with mock.patch(
+            'sgcc_alert.core.services.query_service.get_hot_window_start',
+            return_value=get_hot_window_start(TODAY)
+        ), mock.patch('sgcc_alert.core.utils.archive.read_archive', wraps=read_archive) as read_archive_mock:
+            for order, first_year in (('asc', 2021), ('desc', 2025)):
+                with self.subTest(order=order):
+                    expected = QueryService.query_resident_usages(RESIDENT_ID, DateGranularity.DAILY.value, order=order)
+                    self.assertEqual(expected, sorted(usages, key=lambda item: item['date'], reverse=order == 'desc'))
+
+                    pages = []
+                    after = None
+                    while True:
+                        read_archive_mock.reset_mock()
+                        page = QueryService.query_resident_usages(
+                            RESIDENT_ID,
+                            DateGranularity.DAILY.value,
+                            order=order,
+                            limit=3,
+                            after=after
+                        )
+                        pages.append(page)
+                        if len(pages) == 1:
+                            self.assertEqual(read_archive_mock.call_args_list, [mock.call(RESIDENT_ID, first_year)])
+                        if len(page) < 3:
+                            break
+                        # each page reads the archive years from the sort key till the last one in page
+                        years = sorted(
+                            (after[0].year if after is not None else first_year, page[-1]['date'].year)
+                        )
+                        for call in read_archive_mock.call_args_list:
+                            self.assertTrue(years[0] <= call.args[1] <= years[1])
+                        after = [page[-1]['date']]
+                    self.assertEqual([item for page in pages for item in page], expected)
+
+    def test_usage_statistics_of_archived_usages(self):
+        load_usages(USAGES)
+        client = get_test_client()
+        urls = [
+            f'{URL_RESIDENTS_USAGE_STATISTICS}?resident_id={RESIDENT_ID}&granularity={granularity}'
+            for granularity in ('daily', 'weekly', 'monthly')
+        ] + [
+            f'{URL_RESIDENTS_USAGE_STATISTICS}?resident_id={RESIDENT_ID}&granularity=weekly&start_date=2025-01-01',
+            f'{URL_RESIDENTS_USAGE_STATISTICS}?resident_id={RESIDENT_ID}&granularity=daily'
+            f'&field=elec_charge&start_date=2025-01-02&end_date=2025-01-07'
+        ]
+        expected = [client.get(url).get_json() for url in urls]
+        self.assertEqual(expected[2]['data'][0]['statistics'][1]['count'], 10)
+
+        archive_daily_usages(TODAY)
+        # reloaded archived day is in both database and archive
+        load_usages([USAGES[3]])
+        with mock.patch(
+            'sgcc_alert.core.services.query_service.get_hot_window_start',
+            return_value=get_hot_window_start(TODAY)
+        ):
+            for url, expected_response in zip(urls, expected):
+                with self.subTest(url=url):
+                    self.assertEqual(client.get(url).get_json(), expected_response)
+
+    def test_reload_archived_usages(self):
+        load_usages(USAGES)
+        archive_daily_usages(TODAY)
+
+        # reload one archived day of the week starting from 2024-12-30
+        load_usages([USAGES[3]])
+
+        weekly_usage = SESSION.execute(
+            select(AggUsage.elec_usage, AggUsage.elec_charge).where(
+                AggUsage.resident_id == RESIDENT_ID,
+                AggUsage.granularity == DateGranularity.WEEKLY.value,
+                AggUsage.date == datetime.date(2024, 12, 30)
+            )
+        ).one()
+        SESSION.close()
+        self.assertEqual(
+            tuple(weekly_usage),
+            (
+                sum(usage['elec_usage'] for usage in USAGES[:6]),
+                sum(usage['elec_charge'] for usage in USAGES[1:6])
+            )
+        )
@@ -0,0 +1,67 @@
+"""
+Unit test for benchmarks
+"""
+import tempfile
+from unittest import TestCase
+
+from sgcc_alert.benchmarks.encode import compare_providers
+from sgcc_alert.benchmarks.load import run_benchmark
+from sgcc_alert.benchmarks.serve import run_load_test
+from sgcc_alert.benchmarks.storage import compare_layouts
+from sgcc_alert.constants import DatabaseRole
+from sgcc_alert.databases.models import BaseModel
+from sgcc_alert.databases.session import get_engine
+from .database import get_test_db_conf
+
+
+class LoadBenchmarkTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._db_conf = get_test_db_conf(self._tmp_dir.name)
+
+    def tearDown(self):
+        engine = get_engine(DatabaseRole.WRITER, self._db_conf)
+        BaseModel.metadata.drop_all(engine)
+        engine.dispose()
+        self._tmp_dir.cleanup()
+
+    def test_run_benchmark(self):
+        results = run_benchmark({'executemany': self._db_conf}, 1000, 2, 10)
+
+        self.assertEqual([item['batch'] for item in results], [0, 1])
+        self.assertTrue(all(item['rows_per_second'] > 0 for item in results))
+
+
+class StorageBenchmarkTestCase(TestCase):
+
+    def test_compare_layouts(self):
+        legacy, compact = compare_layouts(2, 60, 10, seed=0)
+
+        self.assertEqual((legacy['layout'], compact['layout']), ('legacy', 'compact'))
+        self.assertEqual(legacy['row_count'], compact['row_count'])
+        self.assertLess(compact['file_size'], legacy['file_size'])
+
+
+class EncodeBenchmarkTestCase(TestCase):
+
+    def test_compare_providers(self):
+        results = compare_providers(100, 2)
+
+        self.assertEqual(
+            [(item['provider'], item['response_format']) for item in results],
+            [('default', 'rows'), ('orjson', 'rows'), ('default', 'columnar'), ('orjson', 'columnar')]
+        )
+        self.assertTrue(all(item['identical'] for item in results))
+
+
+class ServeBenchmarkTestCase(TestCase):
+
+    def test_run_load_test(self):
+        results = run_load_test(2, 30, [1, 4], 8, 4, seed=0)
+
+        self.assertEqual(
+            [(item['worker_class'], item['concurrency']) for item in results],
+            [('sync', 1), ('sync', 4), ('gthread', 1), ('gthread', 4)]
+        )
+        self.assertTrue(all(item['error_count'] == 0 for item in results))
@@ -0,0 +1,175 @@
+"""
+Unit test for response cache
+"""
+import os
+import sqlite3
+import tempfile
+from typing import List
+from unittest import TestCase
+
+from sqlalchemy import event
+
+from sgcc_alert.cache import configure_response_cache, get_response_cache_path, ResponseCache
+from sgcc_alert.constants import DatabaseRole
+from sgcc_alert.core.utils.load import load_residents, load_usages
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import BaseModel
+from sgcc_alert.databases.session import SESSION
+from .application import get_test_client
+from .database import get_test_db_conf
+from .test_load import DAILY_USAGES, RESIDENTS
+
+
+URL_RESIDENT_USAGES = '/api/v1.0/residents/1000000000001/usages'
+
+
+class ResponseCacheTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._cache = ResponseCache(os.path.join(self._tmp_dir.name, 'cache.sqlite'), 1024)
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_get_and_set(self):
+        self.assertIsNone(self._cache.get('/residents?', 'token.1'))
+        self._cache.set('/residents?', 'token.1', {'data': []}, 0.5, 1735660800)
+        self.assertEqual(self._cache.get('/residents?', 'token.1'), {'value': {'data': []}, 'updated_time': 1735660800})
+        # responses built on former version are never hit
+        self.assertIsNone(self._cache.get('/residents?', 'token.2'))
+
+        stats = self._cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 2, 0.3333))
+        self.assertGreater(stats['saved_latency'], 0)
+
+    def test_flush(self):
+        path = os.path.join(self._tmp_dir.name, 'cache.sqlite')
+        self._cache.set('/residents?', 'token.1', {'data': [{'address': '北京'}]}, 0.5)
+        # stored as JSON rather than pickle
+        with sqlite3.connect(path) as conn:
+            body = conn.execute('SELECT body FROM response_cache').fetchone()[0]
+        self.assertEqual(body, '{"data":[{"address":"北京"}]}')
+
+        # reads don't write, and counters of another process are seen once flushed
+        another_cache = ResponseCache(path, 1024)
+        for _ in range(3):
+            self._cache.get('/residents?', 'token.1')
+        self._cache.get('/residents?offset=1', 'token.1')
+        self.assertEqual(another_cache.get_stats()['hits'], 0)
+        self._cache.flush()
+        stats = another_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 1))
+
+        # flushed by interval
+        eager_cache = ResponseCache(path, 1024, flush_interval=0.0)
+        eager_cache.get('/residents?', 'token.1')
+        self.assertEqual(another_cache.get_stats()['hits'], 4)
+
+    def test_former_layout(self):
+        path = os.path.join(self._tmp_dir.name, 'former.sqlite')
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE response_cache (key TEXT PRIMARY KEY, body BLOB NOT NULL)')
+            conn.execute("INSERT INTO response_cache VALUES ('/residents?', x'80')")
+        cache = ResponseCache(path, 1024)
+        self.assertIsNone(cache.get('/residents?', 'token.1'))
+        self.assertEqual(cache.get_stats()['entry_count'], 0)
+
+    def test_evict(self):
+        for idx in range(3):
+            self._cache.set(f'/residents?offset={idx}', 'token.1', 'x' * 300, 0.1)
+        self._cache.get('/residents?offset=0', 'token.1')
+        self._cache.set('/residents?offset=3', 'token.1', 'x' * 300, 0.1)
+
+        stats = self._cache.get_stats()
+        self.assertLessEqual(stats['size'], 1024)
+        self.assertIsNotNone(self._cache.get('/residents?offset=0', 'token.1'))
+        self.assertIsNone(self._cache.get('/residents?offset=1', 'token.1'))
+
+        # store of new version evicts the responses of former ones
+        self._cache.set('/residents?', 'token.2', [], 0.1)
+        self.assertEqual(self._cache.get_stats()['entry_count'], 1)
+
+    def test_get_response_cache_path(self):
+        db_conf = {'ENGINE': 'sqlite', 'NAME': os.path.join(self._tmp_dir.name, 'sgcc.sqlite')}
+        self.assertEqual(
+            get_response_cache_path('sgcc.cache.sqlite', db_conf),
+            os.path.join(self._tmp_dir.name, 'sgcc.cache.sqlite')
+        )
+        self.assertEqual(get_response_cache_path('/var/cache.sqlite', db_conf), '/var/cache.sqlite')
+        self.assertEqual(
+            get_response_cache_path('sgcc.cache.sqlite', {'ENGINE': 'postgresql', 'NAME': 'sgcc'}),
+            'sgcc.cache.sqlite'
+        )
+
+
+class CachedResponseTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+        self._client = get_test_client({
+            'PATH': os.path.join(self._tmp_dir.name, 'cache.sqlite'),
+            'MAX_SIZE': 1048576
+        })
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        configure_response_cache({'PATH': '', 'MAX_SIZE': 0})
+        self._tmp_dir.cleanup()
+
+    def _get(self, url: str, statements: List[str]) -> dict:
+        def _capture(_conn, _cursor, statement, _parameters, _context, _executemany):
+            statements.append(statement)
+
+        event.listen(SESSION.bind, 'before_cursor_execute', _capture)
+        try:
+            response = self._client.get(url)
+        finally:
+            event.remove(SESSION.bind, 'before_cursor_execute', _capture)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_cached_response(self):
+        load_residents(RESIDENTS)
+        load_usages(DAILY_USAGES)
+
+        statements: List[str] = []
+        response = self._get(f'{URL_RESIDENT_USAGES}?granularity=daily&limit=5', statements)
+        self.assertEqual(len(response['data']), 5)
+        self.assertTrue(any('fact_usage' in statement for statement in statements))
+
+        # arguments are normalised, and fact tables are untouched on hit
+        statements.clear()
+        self.assertEqual(self._get(f'{URL_RESIDENT_USAGES}?limit=5&granularity=daily', statements), response)
+        self.assertFalse(any('fact_usage' in statement for statement in statements))
+
+        # unchanged data keeps the cache, while changed data invalidates it
+        load_usages(DAILY_USAGES)
+        self._get(f'{URL_RESIDENT_USAGES}?granularity=daily&limit=5', statements)
+        self.assertFalse(any('fact_usage' in statement for statement in statements))
+        load_usages([{**DAILY_USAGES[0], 'elec_usage': 99.0}])
+        changed_response = self._get(f'{URL_RESIDENT_USAGES}?granularity=daily&limit=5', statements)
+        self.assertEqual(changed_response['data'][0]['elec_usage'], 99.0)
+
+        stats = self._client.get('/api/v1.0/cache/stats').get_json()['data']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_cached_response_of_another_database(self):
+        load_residents(RESIDENTS)
+        load_usages(DAILY_USAGES)
+        url = f'{URL_RESIDENT_USAGES}?granularity=daily&limit=5'
+        self.assertEqual(self._get(url, [])['data'][0]['elec_usage'], DAILY_USAGES[0]['elec_usage'])
+
+        # a fresh database starts generation again, while the cache file survives
+        BaseModel.metadata.drop_all(SESSION.bind)
+        another_dir = os.path.join(self._tmp_dir.name, 'another')
+        os.mkdir(another_dir)
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(another_dir))
+        migrate()
+        load_residents(RESIDENTS)
+        load_usages([{**DAILY_USAGES[0], 'elec_usage': 42.0}])
+        self.assertEqual(self._get(url, [])['data'][0]['elec_usage'], 42.0)
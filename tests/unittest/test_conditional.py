@@ -0,0 +1,115 @@
+"""
+Unit test for conditional GET of responses
+"""
+import os
+import tempfile
+from typing import List
+from unittest import TestCase
+
+from flask import Response
+from sqlalchemy import event
+
+from sgcc_alert.cache import configure_response_cache
+from sgcc_alert.constants import DatabaseRole
+from sgcc_alert.core.utils.load import load_residents, load_usages
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import BaseModel
+from sgcc_alert.databases.session import SESSION
+from .application import get_test_client
+from .database import get_test_db_conf
+from .test_load import DAILY_USAGES, RESIDENTS
+
+
+URL_RESIDENTS = '/api/v1.0/residents'
+URL_RESIDENT_USAGES = '/api/v1.0/residents/1000000000001/usages'
+
+
+class ConditionalResponseTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+        self._client = get_test_client()
+        load_residents(RESIDENTS)
+        load_usages(DAILY_USAGES)
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        configure_response_cache({'PATH': '', 'MAX_SIZE': 0})
+        self._tmp_dir.cleanup()
+
+    def test_validators(self):
+        response = self._client.get(URL_RESIDENTS)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.headers.get('ETag'))
+        self.assertIsNotNone(response.headers.get('Last-Modified'))
+
+        # validators differ on query arguments
+        other_response = self._client.get(f'{URL_RESIDENTS}?limit=1')
+        self.assertNotEqual(other_response.headers['ETag'], response.headers['ETag'])
+        self.assertEqual(other_response.headers['Last-Modified'], response.headers['Last-Modified'])
+
+    def _get(self, url: str, statements: List[str], **kwargs) -> Response:
+        def _capture(_conn, _cursor, statement, _parameters, _context, _executemany):
+            statements.append(statement)
+
+        event.listen(SESSION.bind, 'before_cursor_execute', _capture)
+        try:
+            return self._client.get(url, **kwargs)
+        finally:
+            event.remove(SESSION.bind, 'before_cursor_execute', _capture)
+
+    def test_not_modified(self):
+        url = f'{URL_RESIDENT_USAGES}?granularity=daily&limit=5'
+        response = self._client.get(url)
+        etag = response.headers['ETag']
+        last_modified = response.headers['Last-Modified']
+
+        # matched entity tag is answered by data version only
+        statements: List[str] = []
+        not_modified = self._get(url, statements, headers={'If-None-Match': etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.headers['ETag'], etag)
+        self.assertEqual(not_modified.data, b'')
+        self.assertEqual(len(statements), 1)
+        self.assertIn('data_generation', statements[0])
+
+        statements.clear()
+        not_modified = self._get(url, statements, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertFalse(any('fact_usage.elec_usage' in statement for statement in statements))
+
+        # mismatched entity tag takes precedence over If-Modified-Since
+        response = self._client.get(url, headers={'If-None-Match': '"stale"', 'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+
+        # changed data is served again with new entity tag
+        load_usages([{**DAILY_USAGES[0], 'elec_usage': 99.0}])
+        response = self._client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_not_modified_on_cached_response(self):
+        self._client = get_test_client({'PATH': os.path.join(self._tmp_dir.name, 'cache.sqlite'), 'MAX_SIZE': 1048576})
+        url = f'{URL_RESIDENT_USAGES}?granularity=daily&limit=5'
+        response = self._client.get(url)
+        last_modified = response.headers['Last-Modified']
+
+        # updated_time is stored along with the cached response,
+        # so neither hit nor revalidation touches fact tables, and data version is read once
+        for headers in ({}, {'If-Modified-Since': last_modified}, {'If-None-Match': '"stale"'}):
+            with self.subTest(**headers):
+                statements: List[str] = []
+                cached = self._get(url, statements, headers=headers)
+                self.assertEqual(cached.headers['ETag'], response.headers['ETag'])
+                if 'If-Modified-Since' in headers:
+                    self.assertEqual(cached.status_code, 304)
+                else:
+                    self.assertEqual(cached.status_code, 200)
+                    self.assertEqual(cached.headers['Last-Modified'], last_modified)
+                    self.assertEqual(cached.get_json(), response.get_json())
+                self.assertFalse(any('fact_' in statement for statement in statements))
+                self.assertEqual(len(statements), 1)
@@ -0,0 +1,248 @@
+"""
+Unit test for controllers
+"""
+import tempfile
+from typing import List
+from unittest import TestCase
+
+from sqlalchemy import event
+
+from sgcc_alert.constants import DatabaseRole
+from sgcc_alert.core.services.query_service import QueryService
+from sgcc_alert.core.utils.cursor import encode_cursor
+from sgcc_alert.core.utils.load import load_balances, load_residents, load_usages
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import BaseModel
+from sgcc_alert.databases.session import SESSION
+from .application import get_test_client
+from .database import get_test_db_conf
+from .test_load import BALANCES, DAILY_USAGES, MONTHLY_USAGES, RESIDENTS
+
+
+URL_RESIDENTS = '/api/v1.0/residents'
+URL_RESIDENT_USAGES = '/api/v1.0/residents/1000000000001/usages'
+URL_RESIDENT_DASHBOARD = '/api/v1.0/residents/1000000000001/dashboard'
+URL_RESIDENTS_BALANCES = '/api/v1.0/residents/balances'
+URL_RESIDENTS_USAGES = '/api/v1.0/residents/usages'
+URL_RESIDENTS_USAGE_STATISTICS = '/api/v1.0/residents/usages/statistics'
+
+
+class PaginationTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+        self._client = get_test_client()
+        load_residents(RESIDENTS)
+        load_usages(DAILY_USAGES)
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def _walk(self, url: str) -> List[dict]:
+        """
+        follow next_cursor from the first page, return all pages
+        """
+        pages = []
+        response = self._client.get(url).get_json()
+        pages.append(response)
+        while response['pagination']['next_cursor'] is not None:
+            response = self._client.get(f'{url}&cursor={response["pagination"]["next_cursor"]}').get_json()
+            pages.append(response)
+        return pages
+
+    def test_cursor(self):
+        url = f'{URL_RESIDENT_USAGES}?granularity=daily&order=desc&limit=4'
+        expected = self._client.get(f'{URL_RESIDENT_USAGES}?granularity=daily&order=desc').get_json()['data']
+        pages = self._walk(url)
+        self.assertEqual([item for page in pages for item in page['data']], expected)
+        self.assertEqual([len(page['data']) for page in pages], [4, 4, 2])
+        self.assertIsNone(pages[1]['pagination']['offset'])
+
+        # cursor is bound to the sort, and exclusive with offset
+        cursor = pages[0]['pagination']['next_cursor']
+        response = self._client.get(f'{URL_RESIDENT_USAGES}?granularity=daily&limit=4&cursor={cursor}')
+        self.assertEqual(response.status_code, 400)
+        response = self._client.get(f'{url}&offset=4&cursor={cursor}')
+        self.assertEqual(response.status_code, 400)
+        response = self._client.get(f'{url}&cursor=malformed')
+        self.assertEqual(response.status_code, 400)
+
+        # cursor key is checked against the sort keys
+        for key in ([], ['x'], [5], [None], [True]):
+            with self.subTest(key=key):
+                response = self._client.get(f'{url}&cursor={encode_cursor("date:desc", key)}')
+                self.assertEqual(response.status_code, 400)
+        for key in (['Address'], ['Address', 'x'], [5, 1000000000001], ['Address', 1000000000001, 1]):
+            with self.subTest(key=key):
+                cursor = encode_cursor('resident_address:asc', key)
+                response = self._client.get(f'{URL_RESIDENTS}?order_by=resident_address&limit=1&cursor={cursor}')
+                self.assertEqual(response.status_code, 400)
+        cursor = encode_cursor('resident_address:asc', [None, 1000000000001])
+        response = self._client.get(f'{URL_RESIDENTS}?order_by=resident_address&limit=1&cursor={cursor}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_columnar(self):
+        url = f'{URL_RESIDENT_USAGES}?granularity=daily&order=desc&limit=4'
+        rows = self._client.get(url).get_json()
+        columnar = self._client.get(f'{url}&format=columnar').get_json()
+        self.assertEqual(columnar['pagination'], rows['pagination'])
+        self.assertEqual(columnar['data'], {
+            'resident_id': 1000000000001,
+            'granularity': 'daily',
+            'date': [item['date'] for item in rows['data']],
+            'elec_usage': [item['elec_usage'] for item in rows['data']],
+            'elec_charge': [item['elec_charge'] for item in rows['data']]
+        })
+
+        # pages of columnar format are chained by cursor as well
+        response = self._client.get(f'{url}&format=columnar&cursor={columnar["pagination"]["next_cursor"]}')
+        self.assertEqual(
+            response.get_json()['data']['date'],
+            [item['date'] for item in self._walk(url)[1]['data']]
+        )
+        response = self._client.get('/api/v1.0/residents/1000000000002/balances?format=columnar&limit=4')
+        self.assertEqual(response.get_json()['data'], {
+            'resident_id': 1000000000002,
+            'granularity': 'daily',
+            'date': [],
+            'balance': [],
+            'est_remain_days': []
+        })
+
+    def test_cursor_on_nullable_sort_key(self):
+        load_residents([{**RESIDENTS[0], 'resident_id': 1000000000003, 'resident_address': None}])
+        for order in ('asc', 'desc'):
+            url = f'{URL_RESIDENTS}?order_by=resident_address&order={order}'
+            expected = self._client.get(url).get_json()['data']
+            pages = self._walk(f'{url}&limit=1')
+            self.assertEqual([item for page in pages for item in page['data']], expected)
+            self.assertEqual(len(pages), 3)
+
+    def test_offset(self):
+        response = self._client.get(f'{URL_RESIDENT_USAGES}?granularity=daily&offset=8&limit=4').get_json()
+        self.assertEqual(len(response['data']), 2)
+        self.assertIsNone(response['pagination']['next_offset'])
+        self.assertIsNone(response['pagination']['next_cursor'])
+        response = self._client.get(f'{URL_RESIDENT_USAGES}?granularity=daily&offset=2&limit=4').get_json()
+        self.assertEqual(response['pagination']['next_offset'], 6)
+
+
+class BatchQueryTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+        self._client = get_test_client()
+        load_residents(RESIDENTS)
+        load_balances(BALANCES)
+        load_usages(DAILY_USAGES)
+        load_usages([{**item, 'resident_id': 1000000000002, 'elec_usage': 1.0} for item in DAILY_USAGES[:3]])
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def test_residents_usages(self):
+        response = self._client.get(
+            f'{URL_RESIDENTS_USAGES}?resident_id=1000000000002&resident_id=1000000000001'
+            f'&resident_id=1000000000002&granularity=daily&end_date=2025-01-05'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertEqual([item['resident_id'] for item in data], [1000000000002, 1000000000001])
+        self.assertEqual(len(data[0]['usages']), 3)
+        self.assertTrue(all(usage['elec_usage'] == 1.0 for usage in data[0]['usages']))
+        self.assertEqual(
+            data[1]['usages'],
+            self._client.get(f'{URL_RESIDENT_USAGES}?granularity=daily&end_date=2025-01-05').get_json()['data']
+        )
+
+    def test_residents_usage_statistics(self):
+        response = self._client.get(
+            f'{URL_RESIDENTS_USAGE_STATISTICS}?resident_id=1000000000001&resident_id=1000000000002'
+            f'&granularity=weekly&metric=sum&metric=count'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertEqual(
+            [sum(item['count'] for item in resident['statistics']) for resident in data],
+            [len(DAILY_USAGES), 3]
+        )
+        self.assertEqual(set(data[1]['statistics'][0]), {'date', 'sum', 'count'})
+        response = self._client.get(
+            f'{URL_RESIDENTS_USAGE_STATISTICS}?resident_id=1000000000001&granularity=weekly&metric=median'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_residents_balances(self):
+        response = self._client.get(f'{URL_RESIDENTS_BALANCES}?resident_id=1000000000001&resident_id=1000000000009')
+        data = response.get_json()['data']
+        self.assertEqual(len(data[0]['balances']), len(BALANCES))
+        self.assertEqual(data[1], {'resident_id': 1000000000009, 'balances': []})
+        self.assertEqual(self._client.get(URL_RESIDENTS_BALANCES).status_code, 400)
+
+
+class DashboardTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+        self._client = get_test_client()
+        load_residents(RESIDENTS)
+        load_balances(BALANCES)
+        load_usages([*DAILY_USAGES, *MONTHLY_USAGES])
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def test_query_resident_dashboard(self):
+        checkouts: List[object] = []
+
+        def _capture(_dbapi_connection, _connection_record, connection_proxy):
+            checkouts.append(connection_proxy)
+
+        event.listen(SESSION.bind, 'checkout', _capture)
+        try:
+            result = QueryService.query_resident_dashboard(
+                1000000000001,
+                MONTHLY_USAGES[3]['date'],
+                MONTHLY_USAGES[5]['date'],
+                recent_days=3
+            )
+        finally:
+            event.remove(SESSION.bind, 'checkout', _capture)
+        self.assertEqual(len(checkouts), 1)
+
+        self.assertEqual(
+            result['latest_balance'],
+            {key: value for key, value in BALANCES[-1].items() if key != 'granularity'}
+        )
+        self.assertEqual(result['daily_usages'], DAILY_USAGES[-3:])
+        self.assertEqual(result['monthly_usages'], MONTHLY_USAGES[3: 6])
+
+    def test_resident_dashboard(self):
+        response = self._client.get(f'{URL_RESIDENT_DASHBOARD}?start_date=2024-01-01&end_date=2024-12-31')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['data']
+        self.assertEqual(data['latest_balance']['date'], '2025-01-10')
+        self.assertEqual(len(data['daily_usages']), 10)
+        self.assertEqual(len(data['monthly_usages']), 12)
+
+        data = self._client.get('/api/v1.0/residents/1000000000002/dashboard').get_json()['data']
+        self.assertEqual(data, {'latest_balance': None, 'daily_usages': [], 'monthly_usages': []})
+
+        data = self._client.get(
+            f'{URL_RESIDENT_DASHBOARD}?start_date=2024-01-01&end_date=2024-12-31&format=columnar'
+        ).get_json()['data']
+        self.assertEqual(len(data['daily_usages']['date']), 10)
+        self.assertEqual(data['monthly_usages']['elec_usage'], [item['elec_usage'] for item in MONTHLY_USAGES])
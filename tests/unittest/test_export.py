@@ -0,0 +1,97 @@
+"""
+Unit test for export of usages and balances
+"""
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+from unittest import mock, TestCase
+
+from sgcc_alert.conf import settings
+from sgcc_alert.constants import DAILY_USAGE_RETENTION_MIN_DAYS, DatabaseRole, DateGranularity
+from sgcc_alert.core.services.query_service import QueryService
+from sgcc_alert.core.utils.archive import archive_daily_usages, get_hot_window_start
+from sgcc_alert.core.utils.load import load_balances, load_residents, load_usages
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import BaseModel
+from sgcc_alert.databases.session import SESSION
+from sgcc_alert.export import main
+from .application import get_test_client
+from .database import get_test_db_conf
+from .test_load import BALANCES, DAILY_USAGES, MONTHLY_USAGES, RESIDENTS
+
+
+class ExportTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+        load_residents(RESIDENTS)
+        load_balances(BALANCES)
+        load_usages([*DAILY_USAGES, *MONTHLY_USAGES])
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def test_iter_usages(self):
+        batches = list(QueryService.iter_usages(batch_size=4))
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        rows = [row for batch in batches for row in batch]
+        self.assertEqual(
+            rows,
+            [
+                tuple(usage.values())
+                for usage in [*DAILY_USAGES, *sorted(MONTHLY_USAGES, key=lambda item: item['date'])]
+            ]
+        )
+        self.assertEqual(list(QueryService.iter_usages([1000000000002])), [])
+
+    def test_iter_usages_with_archive(self):
+        today = datetime.date(2025, 2, 17)
+        with mock.patch.object(settings, 'DAILY_USAGE_RETENTION_DAYS', DAILY_USAGE_RETENTION_MIN_DAYS), \
+                mock.patch.object(settings, 'USAGE_ARCHIVE_DIR', os.path.join(self._tmp_dir.name, 'archive')), \
+                mock.patch(
+                    'sgcc_alert.core.services.query_service.get_hot_window_start',
+                    return_value=get_hot_window_start(today)
+                ):
+            self.assertGreater(archive_daily_usages(today), 0)
+            rows = [
+                row for batch in QueryService.iter_usages(granularity=DateGranularity.DAILY.value)
+                for row in batch
+            ]
+        self.assertEqual(rows, [tuple(usage.values()) for usage in DAILY_USAGES])
+
+    def test_export_api(self):
+        client = get_test_client()
+        response = client.get('/api/v1.0/export/balances?resident_id=1000000000001')
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), len(BALANCES))
+        self.assertEqual(json.loads(lines[0]), {**BALANCES[0], 'date': BALANCES[0]['date'].isoformat()})
+
+        response = client.get('/api/v1.0/export/usages?format=csv&granularity=monthly')
+        self.assertEqual(response.mimetype, 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(len(rows), len(MONTHLY_USAGES))
+        self.assertEqual(rows[0]['date'], '2024-01-01')
+
+    def test_export_cli(self):
+        output = os.path.join(self._tmp_dir.name, 'usages.csv')
+        main([
+            'usages', '--format', 'csv', '--resident-id', '1000000000001', '--granularity', 'daily',
+            '--output', output
+        ])
+        with open(output) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), len(DAILY_USAGES))
+        self.assertEqual(
+            (rows[0]['date'], float(rows[0]['elec_usage'])),
+            (DAILY_USAGES[0]['date'].isoformat(), DAILY_USAGES[0]['elec_usage'])
+        )
@@ -0,0 +1,59 @@
+"""
+Unit test for the import footprint of API workers
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+
+# wall time budget of importing the API application, unit is second
+IMPORT_TIME_BUDGET = 3.0
+SCRAPING_MODULES = ('cv2', 'numpy', 'PIL', 'playwright')
+SCRIPT_TPL_IMPORT_PROFILE = '''
+import json
+import sys
+import time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {modules!r} if name in sys.modules]
+print(json.dumps({{'elapsed': elapsed, 'loaded': loaded}}))
+'''
+
+
+def _profile_import(statement: str, env: dict) -> dict:
+    script = SCRIPT_TPL_IMPORT_PROFILE.format(statement=statement, modules=SCRAPING_MODULES)
+    output = subprocess.check_output([sys.executable, '-c', script], env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+class ImportFootprintTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._env = {
+            **os.environ,
+            'DATABASES_DEFAULT_NAME': os.path.join(self._tmp_dir.name, 'sgcc.sqlite')
+        }
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_app_import_excludes_scraping_stack(self):
+        profile = _profile_import('import sgcc_alert.app', self._env)
+        self.assertEqual(profile['loaded'], [])
+        self.assertLess(profile['elapsed'], IMPORT_TIME_BUDGET)
+
+    def test_gunicorn_conf_import_excludes_scraping_stack(self):
+        profile = _profile_import(
+            "exec(open('gunicorn.conf.py').read())",
+            self._env
+        )
+        self.assertEqual(profile['loaded'], [])
+
+    def test_tasks_import_excludes_scraping_stack(self):
+        profile = _profile_import('import sgcc_alert.tasks', self._env)
+        self.assertEqual(profile['loaded'], [])
@@ -0,0 +1,202 @@
+"""
+Unit test for loading data into database
+"""
+import datetime
+import tempfile
+from unittest import TestCase
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from sgcc_alert.constants import DatabaseRole, DateGranularity
+from sgcc_alert.core.services.query_service import QueryService
+from sgcc_alert.core.utils.load import load_balances, load_residents, load_sgcc_data, load_usages
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import BaseModel, FactUsage
+from sgcc_alert.databases.session import SESSION
+from .database import get_test_db_conf
+
+
+RESIDENTS = [
+    {
+        'resident_id': 1000000000001,
+        'is_main': True,
+        'resident_address': 'Pingleyuan 100',
+        'developer_name': 'Local Developer'
+    },
+    {
+        'resident_id': 1000000000002,
+        'is_main': False,
+        'resident_address': None,
+        'developer_name': 'Local Developer'
+    }
+]
+BALANCES = [
+    {
+        'resident_id': 1000000000001,
+        'date': datetime.date(2025, 1, day),
+        'granularity': DateGranularity.DAILY.value,
+        'balance': 100.0 - day,
+        'est_remain_days': 30.0 - day
+    }
+    for day in range(1, 11)
+]
+DAILY_USAGES = [
+    {
+        'resident_id': 1000000000001,
+        'date': datetime.date(2025, 1, day),
+        'granularity': DateGranularity.DAILY.value,
+        'elec_usage': float(day),
+        'elec_charge': day * 0.5
+    }
+    for day in range(1, 11)
+]
+MONTHLY_USAGES = [
+    {
+        'resident_id': 1000000000001,
+        'date': datetime.date(2024, month, 1),
+        'granularity': DateGranularity.MONTHLY.value,
+        'elec_usage': month * 100.0,
+        'elec_charge': month * 50.0
+    }
+    for month in range(1, 13)
+]
+
+
+class LoadTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def test_load_and_query(self):
+        load_residents(RESIDENTS)
+        load_balances(BALANCES)
+        load_usages(DAILY_USAGES + MONTHLY_USAGES)
+
+        self.assertEqual(QueryService.query_residents(), RESIDENTS)
+        self.assertEqual(
+            QueryService.query_resident_balances(1000000000001, order='desc', limit=1),
+            [BALANCES[-1]]
+        )
+        self.assertEqual(
+            QueryService.query_resident_usages(
+                1000000000001,
+                DateGranularity.MONTHLY.value,
+                start_date=datetime.date(2024, 3, 1),
+                end_date=datetime.date(2024, 5, 1)
+            ),
+            MONTHLY_USAGES[2: 5]
+        )
+
+    def test_load_upsert(self):
+        load_usages(DAILY_USAGES)
+        changed_usage = {**DAILY_USAGES[0], 'elec_usage': 99.0}
+        load_usages([changed_usage])
+        load_residents([{**RESIDENTS[1], 'is_main': True}])
+
+        usages = QueryService.query_resident_usages(1000000000001, DateGranularity.DAILY.value)
+        self.assertEqual(len(usages), len(DAILY_USAGES))
+        self.assertEqual(usages[0], changed_usage)
+        self.assertEqual(QueryService.query_residents(), [{**RESIDENTS[1], 'is_main': True}])
+
+    def test_load_rollup(self):
+        load_usages(DAILY_USAGES + MONTHLY_USAGES)
+
+        # 2025-01-01 is Wednesday, so days are split into weeks of 5 and 5
+        self.assertEqual(
+            QueryService.query_resident_usages(1000000000001, DateGranularity.WEEKLY.value),
+            [
+                {
+                    'resident_id': 1000000000001,
+                    'date': datetime.date(2024, 12, 30),
+                    'granularity': DateGranularity.WEEKLY.value,
+                    'elec_usage': 15.0,
+                    'elec_charge': 7.5
+                },
+                {
+                    'resident_id': 1000000000001,
+                    'date': datetime.date(2025, 1, 6),
+                    'granularity': DateGranularity.WEEKLY.value,
+                    'elec_usage': 40.0,
+                    'elec_charge': 20.0
+                }
+            ]
+        )
+        quarterly_usages = QueryService.query_resident_usages(1000000000001, DateGranularity.QUARTERLY.value)
+        self.assertEqual(
+            [(item['date'], item['elec_usage']) for item in quarterly_usages],
+            [
+                (datetime.date(2024, 1, 1), 600.0),
+                (datetime.date(2024, 4, 1), 1500.0),
+                (datetime.date(2024, 7, 1), 2400.0),
+                (datetime.date(2024, 10, 1), 3300.0)
+            ]
+        )
+        yearly_usages = QueryService.query_resident_usages(1000000000001, DateGranularity.YEARLY.value)
+        self.assertEqual(
+            [(item['date'], item['elec_usage'], item['elec_charge']) for item in yearly_usages],
+            [(datetime.date(2024, 1, 1), 7800.0, 3900.0)]
+        )
+
+    def test_load_rollup_touched_periods(self):
+        load_usages(DAILY_USAGES)
+        load_usages([
+            {**DAILY_USAGES[-1], 'elec_usage': 20.0},
+            {**DAILY_USAGES[-1], 'date': datetime.date(2025, 1, 13), 'elec_usage': None, 'elec_charge': None}
+        ])
+
+        weekly_usages = QueryService.query_resident_usages(1000000000001, DateGranularity.WEEKLY.value)
+        self.assertEqual(
+            [(item['date'], item['elec_usage']) for item in weekly_usages],
+            [
+                (datetime.date(2024, 12, 30), 15.0),
+                (datetime.date(2025, 1, 6), 50.0),
+                (datetime.date(2025, 1, 13), None)
+            ]
+        )
+
+    def test_load_deduplicated(self):
+        changed_usage = {**DAILY_USAGES[0], 'elec_usage': 99.0}
+        result = load_sgcc_data(RESIDENTS, BALANCES, DAILY_USAGES + [changed_usage])
+
+        self.assertEqual(result['row_count'], len(RESIDENTS) + len(BALANCES) + len(DAILY_USAGES))
+        usages = QueryService.query_resident_usages(1000000000001, DateGranularity.DAILY.value)
+        self.assertEqual(usages, [changed_usage, *DAILY_USAGES[1:]])
+
+    def test_load_atomic(self):
+        invalid_usage = {**DAILY_USAGES[0], 'granularity': None}
+        with self.assertRaises(IntegrityError):
+            load_sgcc_data(RESIDENTS, BALANCES, [invalid_usage])
+
+        self.assertEqual(QueryService.query_residents(), [])
+        self.assertEqual(QueryService.query_resident_balances(1000000000001), [])
+
+    def test_load_unchanged(self):
+        result = load_sgcc_data(RESIDENTS, BALANCES, DAILY_USAGES)
+        self.assertEqual(
+            (result['inserted_count'], result['changed_count'], result['unchanged_count']),
+            (len(RESIDENTS) + len(BALANCES) + len(DAILY_USAGES), 0, 0)
+        )
+        SESSION.execute(update(FactUsage).values(updated_time=0))
+        SESSION.commit()
+
+        changed_usage = {**DAILY_USAGES[0], 'elec_charge': None}
+        new_usage = {**DAILY_USAGES[0], 'date': datetime.date(2025, 1, 11)}
+        result = load_sgcc_data(RESIDENTS, BALANCES, DAILY_USAGES[1:] + [changed_usage, new_usage])
+        self.assertEqual(
+            (result['inserted_count'], result['changed_count'], result['unchanged_count']),
+            (1, 1, len(RESIDENTS) + len(BALANCES) + len(DAILY_USAGES) - 1)
+        )
+        updated_dates = SESSION.scalars(
+            select(FactUsage.date).where(FactUsage.updated_time > 0).order_by(FactUsage.date)
+        ).all()
+        SESSION.close()
+        self.assertEqual(updated_dates, [changed_usage['date'], new_usage['date']])
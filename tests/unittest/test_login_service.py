@@ -0,0 +1,90 @@
+"""
+Unit test for SGCCLoginService
+"""
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from sgcc_alert.core.services.login_service import (
+    SGCCLoginService,
+    _batch_drag_moves,
+    _simulate_drag_moves,
+    _simulate_horizontal_move_tracks,
+    _slide_block
+)
+
+
+SLIDE_BUTTON_BOX = {'x': 100.0, 'y': 200.0, 'width': 40.0, 'height': 40.0}
+X_OFFSET = 200.0
+
+
+def _mock_page() -> MagicMock:
+    page = MagicMock()
+    page.locator.return_value.bounding_box.return_value = SLIDE_BUTTON_BOX
+    return page
+
+
+class SlideBlockTestCase(TestCase):
+
+    def test_batch_drag_moves(self):
+        moves = _simulate_drag_moves(X_OFFSET)
+        batches = _batch_drag_moves(moves, 6)
+
+        self.assertEqual(len(batches), 6)
+        self.assertEqual(sum(batch['steps'] for batch in batches), len(moves))
+        self.assertEqual(batches[-1]['x_offset'], moves[-1]['x_offset'])
+        x_offsets = [batch['x_offset'] for batch in batches]
+        self.assertEqual(x_offsets, sorted(x_offsets))
+
+        self.assertEqual(_batch_drag_moves(moves, 0), moves)
+
+    def test_slide_block_with_batched_moves(self):
+        tracks = _simulate_horizontal_move_tracks(X_OFFSET)
+        page = _mock_page()
+        _slide_block(page, X_OFFSET, batch_count=6)
+        batched_calls = page.mouse.move.call_args_list
+
+        page = _mock_page()
+        _slide_block(page, X_OFFSET, batch_count=0)
+        stepwise_calls = page.mouse.move.call_args_list
+
+        # the first move is hovering the slide button
+        self.assertEqual(len(batched_calls), 1 + 6)
+        self.assertEqual(len(stepwise_calls), 1 + len(tracks))
+        self.assertEqual(
+            sum(call.kwargs['steps'] for call in batched_calls[1:]),
+            sum(call.kwargs['steps'] for call in stepwise_calls[1:])
+        )
+
+        start_x = SLIDE_BUTTON_BOX['x'] + SLIDE_BUTTON_BOX['width'] / 2
+        self.assertAlmostEqual(batched_calls[-1].args[0], start_x + tracks[-1])
+        self.assertAlmostEqual(stepwise_calls[-1].args[0], start_x + tracks[-1])
+
+
+class LoginStateTestCase(TestCase):
+
+    def test_not_login_without_site_cookies(self):
+        page = _mock_page()
+        page.context.cookies.return_value = [
+            {'name': 'expired', 'value': '1', 'expires': time.time() - 1}
+        ]
+        service = SGCCLoginService('admin', 'admin', page)
+
+        self.assertFalse(service._is_login())
+        page.goto.assert_not_called()
+
+    def test_login_state_cache(self):
+        page = _mock_page()
+        page.context.cookies.return_value = [
+            {'name': 'session', 'value': '1', 'expires': -1}
+        ]
+        service = SGCCLoginService('admin', 'admin', page)
+
+        with patch.object(SGCCLoginService, '_verify_account_session', return_value=True) as mock_verify:
+            self.assertTrue(service._is_login())
+            self.assertTrue(service._is_login())
+            self.assertEqual(mock_verify.call_count, 1)
+
+            service._login_state = (True, time.monotonic() - 3600)
+            self.assertTrue(service._is_login())
+            self.assertEqual(mock_verify.call_count, 2)
@@ -0,0 +1,122 @@
+"""
+Unit test for schema migrations
+"""
+import datetime
+import tempfile
+import threading
+from unittest import TestCase
+
+from sqlalchemy import inspect, Integer, select, text
+
+from sgcc_alert.constants import DatabaseRole, DateGranularity
+from sgcc_alert.databases.migrations import check_schema_version, get_latest_version, migrate
+from sgcc_alert.databases.models import BaseModel, DataGeneration, FactUsage, SchemaVersion
+from sgcc_alert.databases.session import get_engine
+from .database import get_test_db_conf
+
+
+SQL_LEGACY_FACT_USAGE = [
+    '''
+    CREATE TABLE fact_usage (
+        resident_id BIGINT NOT NULL,
+        date DATE NOT NULL,
+        granularity VARCHAR NOT NULL,
+        elec_usage FLOAT,
+        elec_charge FLOAT,
+        created_time INTEGER NOT NULL,
+        updated_time INTEGER NOT NULL,
+        PRIMARY KEY (resident_id, date, granularity)
+    )
+    ''',
+    '''
+    INSERT INTO fact_usage
+    VALUES (1000000000001, '2025-01-01', 'daily', 1.0, 0.5, 0, 0)
+    '''
+]
+
+SQL_LEGACY_DATA_GENERATION = [
+    '''
+    CREATE TABLE data_generation (
+        id INTEGER NOT NULL,
+        generation INTEGER NOT NULL,
+        created_time INTEGER NOT NULL,
+        updated_time INTEGER NOT NULL,
+        PRIMARY KEY (id)
+    )
+    ''',
+    '''
+    INSERT INTO data_generation
+    VALUES (1, 3, 0, 0)
+    '''
+]
+
+
+class MigrationTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._engine = get_engine(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(self._engine)
+        self._engine.dispose()
+        self._tmp_dir.cleanup()
+
+    def _get_versions(self) -> list:
+        with self._engine.connect() as conn:
+            return list(conn.execute(select(SchemaVersion.version).order_by(SchemaVersion.version)).scalars())
+
+    def test_migrate(self):
+        self.assertFalse(check_schema_version(self._engine))
+
+        self.assertEqual(migrate(self._engine), get_latest_version())
+        self.assertEqual(migrate(self._engine), get_latest_version())
+        self.assertEqual(self._get_versions(), list(range(1, get_latest_version() + 1)))
+        self.assertTrue(check_schema_version(self._engine))
+
+    def test_migrate_legacy_schema(self):
+        # tables created before migration is introduced store granularity and date as text
+        with self._engine.begin() as conn:
+            for statement in SQL_LEGACY_FACT_USAGE:
+                conn.execute(text(statement))
+
+        migrate(self._engine)
+        columns = {
+            column['name']: column for column in inspect(self._engine).get_columns(FactUsage.__tablename__)
+        }
+        self.assertIsInstance(columns['granularity']['type'], Integer)
+        with self._engine.connect() as conn:
+            rows = conn.execute(select(FactUsage.date, FactUsage.granularity, FactUsage.elec_usage)).all()
+        self.assertEqual(rows, [(datetime.date(2025, 1, 1), DateGranularity.DAILY.value, 1.0)])
+
+    def test_migrate_concurrently(self):
+        versions = []
+        errors = []
+
+        def _migrate() -> None:
+            try:
+                versions.append(migrate(self._engine))
+            except Exception as e:  # NOQA
+                errors.append(e)
+
+        threads = [threading.Thread(target=_migrate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(versions, [get_latest_version()] * 4)
+        self.assertEqual(self._get_versions(), list(range(1, get_latest_version() + 1)))
+
+    def test_migrate_legacy_data_generation(self):
+        # data generation created before database token is introduced
+        with self._engine.begin() as conn:
+            for statement in SQL_LEGACY_DATA_GENERATION:
+                conn.execute(text(statement))
+
+        migrate(self._engine)
+        with self._engine.connect() as conn:
+            generation, token = conn.execute(select(DataGeneration.generation, DataGeneration.token)).one()
+        self.assertEqual(generation, 3)
+        self.assertEqual(len(token), 32)
@@ -63,3 +63,17 @@ class NotchServiceTestCase(TestCase):
         )
         actual_x, _ = service.locate_notch()
         self.assertIn(actual_x, range(199 - MARGIN_ERR, 199 + MARGIN_ERR + 1))
+
+    def test_rank_notch_candidates_with_notes(self):
+        service = NotchService(
+            CAPTCHA_NOTES_BG_DATA_URL,
+            CAPTCHA_NOTES_SLIDE_DATA_URL
+        )
+        candidates = service.rank_notch_candidates()
+        self.assertGreater(len(candidates), 1)
+        self.assertIn(candidates[0]['x'], range(199 - MARGIN_ERR, 199 + MARGIN_ERR + 1))
+
+        scores = [candidate['score'] for candidate in candidates]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        x_ordinates = [candidate['x'] for candidate in candidates]
+        self.assertEqual(len(x_ordinates), len(set(x_ordinates)))
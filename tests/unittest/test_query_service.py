@@ -0,0 +1,242 @@
+"""
+Unit test for QueryService
+"""
+import datetime
+import tempfile
+from typing import Callable, Dict, List, Tuple
+from unittest import skipUnless, TestCase
+
+from sqlalchemy import event
+
+from sgcc_alert.constants import (
+    DatabaseRole,
+    DateGranularity,
+    FACT_USAGE_GRANULARITIES,
+    ROLLUP_USAGE_SOURCE_GRANULARITIES
+)
+from sgcc_alert.core.services.query_service import QueryService
+from sgcc_alert.core.utils.common import get_period_start
+from sgcc_alert.core.utils.load import load_usages
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import BaseModel
+from sgcc_alert.databases.session import SESSION
+from .database import get_test_db_conf, is_sqlite
+
+
+RESIDENT_ID = 1000000000001
+
+
+@skipUnless(is_sqlite(get_test_db_conf('')), 'SQLite only')
+class QueryPlanTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.READER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def _explain(self, query_func: Callable) -> List[str]:
+        """
+        capture the statement executed by query function,
+        return the details of its query plan
+        """
+        statements: List[Tuple[str, tuple]] = []
+
+        def _capture(_conn, _cursor, statement, parameters, _context, _executemany):
+            statements.append((statement, parameters))
+
+        engine = SESSION.bind
+        event.listen(engine, 'before_cursor_execute', _capture)
+        try:
+            query_func()
+        finally:
+            event.remove(engine, 'before_cursor_execute', _capture)
+        self.assertEqual(len(statements), 1)
+
+        statement, parameters = statements[0]
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        return [row[-1] for row in rows]
+
+    def _assert_indexed_without_sort(self, plan: List[str], index_name: str) -> None:
+        self.assertTrue(any(index_name in detail for detail in plan), plan)
+        self.assertFalse(any('TEMP B-TREE' in detail for detail in plan), plan)
+
+    def test_query_residents_plan(self):
+        plan = self._explain(lambda: QueryService.query_residents('resident_address', 'desc', 0, 10))
+        self._assert_indexed_without_sort(plan, 'ix_dim_resident_resident_address')
+
+    def test_query_resident_balances_plan(self):
+        for order in ('asc', 'desc'):
+            plan = self._explain(lambda: QueryService.query_resident_balances(
+                RESIDENT_ID,
+                datetime.date(2025, 1, 1),
+                datetime.date(2025, 1, 31),
+                'date',
+                order,
+                10,
+                10
+            ))
+            self._assert_indexed_without_sort(plan, 'fact_balance USING PRIMARY KEY (resident_id=? AND granularity=?')
+
+    def test_query_resident_balances_after_plan(self):
+        for order in ('asc', 'desc'):
+            plan = self._explain(lambda: QueryService.query_resident_balances(
+                RESIDENT_ID,
+                order=order,
+                limit=10,
+                after=[datetime.date(2025, 1, 1)]
+            ))
+            self._assert_indexed_without_sort(
+                plan,
+                'fact_balance USING PRIMARY KEY (resident_id=? AND granularity=? AND date'
+            )
+
+    def test_query_latest_balance_plan(self):
+        plan = self._explain(lambda: QueryService.query_latest_balance(RESIDENT_ID))
+        self._assert_indexed_without_sort(plan, 'fact_balance USING PRIMARY KEY (resident_id=? AND granularity=?')
+
+    def test_query_resident_usages_plan(self):
+        for granularity, index_name in [
+            *[(item, 'fact_usage USING PRIMARY KEY') for item in FACT_USAGE_GRANULARITIES],
+            *[(item, 'agg_usage USING PRIMARY KEY') for item in ROLLUP_USAGE_SOURCE_GRANULARITIES]
+        ]:
+            plan = self._explain(lambda: QueryService.query_resident_usages(
+                RESIDENT_ID,
+                granularity.value,
+                datetime.date(2024, 1, 1),
+                None,
+                'date',
+                'desc',
+                None,
+                12
+            ))
+            self._assert_indexed_without_sort(plan, f'{index_name} (resident_id=? AND granularity=?')
+
+    def test_query_residents_series_plan(self):
+        resident_ids = [RESIDENT_ID, RESIDENT_ID + 1]
+        plan = self._explain(lambda: QueryService.query_residents_balances(
+            resident_ids,
+            datetime.date(2025, 1, 1),
+            datetime.date(2025, 1, 31)
+        ))
+        self._assert_indexed_without_sort(plan, 'fact_balance USING PRIMARY KEY (resident_id=? AND granularity=?')
+        for granularity, index_name in [
+            (DateGranularity.DAILY, 'fact_usage USING PRIMARY KEY'),
+            (DateGranularity.WEEKLY, 'agg_usage USING PRIMARY KEY')
+        ]:
+            plan = self._explain(lambda: QueryService.query_residents_usages(
+                resident_ids,
+                granularity.value,
+                datetime.date(2024, 1, 1)
+            ))
+            self._assert_indexed_without_sort(plan, f'{index_name} (resident_id=? AND granularity=?')
+
+    def test_query_residents_usage_statistics_plan(self):
+        plan = self._explain(lambda: QueryService.query_residents_usage_statistics(
+            [RESIDENT_ID, RESIDENT_ID + 1],
+            DateGranularity.MONTHLY.value,
+            start_date=datetime.date(2024, 1, 1)
+        ))
+        index_name = 'fact_usage USING PRIMARY KEY (resident_id=? AND granularity=? AND date>?)'
+        self.assertTrue(any(index_name in detail for detail in plan), plan)
+
+
+class UsageStatisticsTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        configure_session(DatabaseRole.WRITER, get_test_db_conf(self._tmp_dir.name))
+        migrate()
+        self._usages = [
+            {
+                'resident_id': RESIDENT_ID,
+                'date': datetime.date(2023, 11, 20) + datetime.timedelta(days=idx),
+                'granularity': DateGranularity.DAILY.value,
+                'elec_usage': float(idx % 10),
+                'elec_charge': None
+            }
+            for idx in range(800)
+        ]
+        load_usages(self._usages)
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def test_periods(self):
+        for granularity in DateGranularity:
+            periods: Dict[datetime.date, List[float]] = {}
+            for usage in self._usages:
+                periods.setdefault(get_period_start(usage['date'], granularity), []).append(usage['elec_usage'])
+
+            result = QueryService.query_residents_usage_statistics([RESIDENT_ID], granularity.value)
+            self.assertEqual(
+                [(item['date'], item['sum'], item['min'], item['max'], item['count']) for item in result[RESIDENT_ID]],
+                [
+                    (date, sum(values), min(values), max(values), len(values))
+                    for date, values in sorted(periods.items())
+                ],
+                granularity
+            )
+            sums = [sum(values) for _, values in sorted(periods.items())]
+            self.assertEqual(
+                [item['delta'] for item in result[RESIDENT_ID]],
+                [None, *[current - previous for previous, current in zip(sums, sums[1:])]],
+                granularity
+            )
+
+    def test_range_and_delta(self):
+        result = QueryService.query_residents_usage_statistics(
+            [RESIDENT_ID, RESIDENT_ID + 1],
+            DateGranularity.MONTHLY.value,
+            ['sum', 'delta'],
+            start_date=datetime.date(2024, 2, 15),
+            end_date=datetime.date(2024, 3, 2)
+        )
+        sums = {
+            month: sum(
+                usage['elec_usage'] for usage in self._usages
+                if (usage['date'].year, usage['date'].month) == (2024, month)
+            )
+            for month in (1, 2, 3)
+        }
+        # range is extended to whole months, and delta of February is to January
+        self.assertEqual(result, {
+            RESIDENT_ID: [
+                {'date': datetime.date(2024, 2, 1), 'sum': sums[2], 'delta': sums[2] - sums[1]},
+                {'date': datetime.date(2024, 3, 1), 'sum': sums[3], 'delta': sums[3] - sums[2]}
+            ],
+            RESIDENT_ID + 1: []
+        })
+        result = QueryService.query_residents_usage_statistics([RESIDENT_ID], 'monthly', ['count'], 'elec_charge')
+        self.assertTrue(all(item == {'date': item['date'], 'count': 0} for item in result[RESIDENT_ID]))
+
+    def test_delta_of_missing_period(self):
+        dates = [
+            datetime.date(2024, 1, 1),
+            datetime.date(2024, 1, 2),
+            datetime.date(2024, 3, 1),
+            datetime.date(2024, 3, 11)
+        ]
+        load_usages([
+            {**self._usages[0], 'resident_id': RESIDENT_ID + 1, 'date': date, 'elec_usage': float(idx + 1)}
+            for idx, date in enumerate(dates)
+        ])
+
+        # delta is null once the previous period has no usage, rather than taken against an earlier one
+        expected_deltas = {
+            DateGranularity.DAILY: [None, 1.0, None, None],
+            DateGranularity.WEEKLY: [None, None, None],
+            DateGranularity.MONTHLY: [None, None],
+            DateGranularity.QUARTERLY: [None]
+        }
+        for granularity, deltas in expected_deltas.items():
+            result = QueryService.query_residents_usage_statistics([RESIDENT_ID + 1], granularity.value, ['delta'])
+            self.assertEqual([item['delta'] for item in result[RESIDENT_ID + 1]], deltas, granularity)
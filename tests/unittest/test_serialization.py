@@ -0,0 +1,65 @@
+"""
+Unit test for JSON provider
+"""
+import datetime
+import decimal
+from unittest import TestCase
+
+from sgcc_alert.benchmarks.encode import encode, get_app
+from sgcc_alert.serialization import OrjsonProvider
+
+
+BODY = {
+    'data': [
+        {
+            'date': datetime.date(2024, 1, 1),
+            'elec_usage': 12.34,
+            'elec_charge': None,
+            'address': '北京市朝阳区 \x7f 😀',
+            'note': '1e-05 "0.00001" \\ /'
+        },
+        {
+            'date': datetime.date(2024, 1, 2),
+            'elec_usage': 1e-05,
+            'elec_charge': -2.5e-07,
+            'balance': 1.5e+16,
+            'est_remain_days': 2 ** 70
+        }
+    ],
+    'resident_ids': {1000000000010: 'b', 1000000000002: 'a'},
+    'updated_time': datetime.datetime(2024, 1, 2, 3, 4, 5, 6),
+    'total': decimal.Decimal('1.25'),
+    'pagination': {'offset': 0, 'limit': 2, 'next_offset': None}
+}
+
+
+class OrjsonProviderTestCase(TestCase):
+
+    def setUp(self):
+        self._default_app = get_app('default')
+        self._orjson_app = get_app('orjson')
+
+    def _assert_identical(self, body, **kwargs):
+        with self._default_app.app_context():
+            expected = self._default_app.json.dumps(body, **kwargs)
+        with self._orjson_app.app_context():
+            self.assertEqual(self._orjson_app.json.dumps(body, **kwargs), expected)
+
+    def test_dumps(self):
+        self.assertIsInstance(self._orjson_app.json, OrjsonProvider)
+        for kwargs in ({'indent': 2}, {'separators': (',', ':')}, {}, {'indent': 2, 'ensure_ascii': False}):
+            with self.subTest(**kwargs):
+                self._assert_identical(BODY, **kwargs)
+                # orjson path without fallback for integers beyond 64-bit or non-string keys
+                self._assert_identical(BODY['data'][0], **kwargs)
+
+    def test_dumps_response(self):
+        with self._orjson_app.app_context():
+            content = encode(self._orjson_app, {'date': datetime.date(2024, 1, 1), 'elec_usage': 1e-05})
+
+        self.assertEqual(content, '{\n  "date": "2024-01-01",\n  "elec_usage": 1e-05\n}\n')
+
+    def test_loads(self):
+        with self._orjson_app.app_context():
+            self.assertEqual(self._orjson_app.json.loads('{"a": [1, 1.5, null]}'), {'a': [1, 1.5, None]})
+            self.assertEqual(self._orjson_app.json.loads('[NaN, 1180591620717411303424]')[1], 2 ** 70)
@@ -0,0 +1,146 @@
+"""
+Unit test for database engine and session
+"""
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import tempfile
+import threading
+import time
+from unittest import skipUnless, TestCase
+
+from sqlalchemy import insert, text
+
+from sgcc_alert.constants import DatabaseRole, DateGranularity
+from sgcc_alert.core.utils.load import load_residents, load_usages
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import BaseModel, FactUsage
+from sgcc_alert.databases.session import get_engine, get_session_scope, SESSION
+from .application import get_test_client
+from .database import get_test_db_conf, is_sqlite
+from .test_load import DAILY_USAGES, RESIDENTS
+
+
+LOAD_ROW_COUNT = 100000
+# reader shouldn't wait for writer, unit is second
+READER_LATENCY_LIMIT = 0.5
+SQL_COUNT_USAGES = 'SELECT count(*) FROM fact_usage WHERE resident_id = 1'
+URL_RESIDENT_USAGES = '/api/v1.0/residents/1000000000001/usages'
+CONCURRENT_REQUEST_COUNT = 32
+CONCURRENT_THREAD_COUNT = 8
+
+
+def _build_usages(resident_id: int, count: int) -> list:
+    start_date = datetime.date(2000, 1, 1)
+    return [
+        {
+            'resident_id': resident_id,
+            'date': start_date + datetime.timedelta(days=idx),
+            'granularity': DateGranularity.DAILY.value,
+            'elec_usage': 1.0,
+            'elec_charge': 0.5,
+            'created_time': 0,
+            'updated_time': 0
+        }
+        for idx in range(count)
+    ]
+
+
+class EngineTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        # small page cache makes the SQLite writer spill pages before commit,
+        # which locks readers out in rollback journal mode
+        self._db_conf = get_test_db_conf(self._tmp_dir.name, {'CACHE_SIZE': -2000})
+        self._writer_engine = get_engine(DatabaseRole.WRITER, self._db_conf)
+        self._reader_engine = get_engine(DatabaseRole.READER, self._db_conf)
+        BaseModel.metadata.create_all(self._writer_engine)
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(self._writer_engine)
+        self._writer_engine.dispose()
+        self._reader_engine.dispose()
+        self._tmp_dir.cleanup()
+
+    @skipUnless(is_sqlite(get_test_db_conf('')), 'SQLite only')
+    def test_pragmas(self):
+        with self._reader_engine.connect() as conn:
+            self.assertEqual(conn.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+            self.assertEqual(conn.execute(text('PRAGMA synchronous')).scalar(), 1)
+            self.assertEqual(conn.execute(text('PRAGMA busy_timeout')).scalar(), 5000)
+
+    def test_reader_latency_during_load(self):
+        with self._writer_engine.begin() as conn:
+            conn.execute(insert(FactUsage), _build_usages(1, 30))
+
+        loaded = threading.Event()
+        finished = threading.Event()
+
+        def _load() -> None:
+            try:
+                with self._writer_engine.begin() as conn:
+                    conn.execute(insert(FactUsage), _build_usages(2, LOAD_ROW_COUNT))
+                    loaded.set()
+                    # keep the transaction open while reader is querying
+                    time.sleep(0.5)
+            finally:
+                loaded.set()
+                finished.set()
+
+        writer = threading.Thread(target=_load)
+        writer.start()
+
+        latencies = []
+        with self._reader_engine.connect() as conn:
+            while not finished.is_set():
+                start = time.perf_counter()
+                count = conn.execute(text(SQL_COUNT_USAGES)).scalar()
+                conn.rollback()
+                latencies.append(time.perf_counter() - start)
+                self.assertEqual(count, 30)
+        writer.join()
+
+        self.assertTrue(loaded.is_set())
+        self.assertGreater(len(latencies), 1)
+        self.assertLess(max(latencies), READER_LATENCY_LIMIT)
+
+
+class SessionScopeTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._db_conf = get_test_db_conf(self._tmp_dir.name)
+        configure_session(DatabaseRole.WRITER, self._db_conf)
+        migrate()
+        load_residents(RESIDENTS)
+        load_usages(DAILY_USAGES)
+        # serve requests as web workers do
+        configure_session(DatabaseRole.READER, self._db_conf)
+        self._client = get_test_client()
+
+    def tearDown(self):
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def test_session_scope(self):
+        app = self._client.application
+        with app.app_context():
+            scope = get_session_scope()
+            self.assertEqual(get_session_scope(), scope)
+            with app.app_context():
+                self.assertNotEqual(get_session_scope(), scope)
+        self.assertEqual(get_session_scope(), threading.get_ident())
+
+    def test_concurrent_requests(self):
+        def _request(_idx: int) -> int:
+            return self._client.get(URL_RESIDENT_USAGES, query_string={'granularity': 'daily'}).status_code
+
+        with ThreadPoolExecutor(max_workers=CONCURRENT_THREAD_COUNT) as executor:
+            status_codes = list(executor.map(_request, range(CONCURRENT_REQUEST_COUNT)))
+
+        self.assertEqual(status_codes, [200] * CONCURRENT_REQUEST_COUNT)
+        # sessions of requests are removed on teardown, with connections returned to pool
+        self.assertTrue(set(SESSION.registry.registry).issubset({threading.get_ident()}))
+        self.assertEqual(SESSION.bind.pool.checkedout(), 0)
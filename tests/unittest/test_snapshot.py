@@ -0,0 +1,68 @@
+"""
+Unit test for read snapshot of SQLite database
+"""
+import os
+import tempfile
+from unittest import skipUnless, TestCase
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from sgcc_alert.constants import DatabaseRole
+from sgcc_alert.core.utils.load import load_residents
+from sgcc_alert.databases import configure_session
+from sgcc_alert.databases.migrations import migrate
+from sgcc_alert.databases.models import BaseModel
+from sgcc_alert.databases.session import get_engine, SESSION
+from sgcc_alert.databases.snapshot import publish_snapshot
+from .database import get_test_db_conf, is_sqlite
+from .test_load import RESIDENTS
+
+
+SQL_COUNT_RESIDENTS = 'SELECT count(*) FROM dim_resident'
+
+
+@skipUnless(is_sqlite(get_test_db_conf('')), 'SQLite only')
+class SnapshotTestCase(TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._db_conf = {
+            **get_test_db_conf(self._tmp_dir.name),
+            'SNAPSHOT_NAME': os.path.join(self._tmp_dir.name, 'sgcc.snapshot.sqlite')
+        }
+        configure_session(DatabaseRole.WRITER, self._db_conf)
+        migrate()
+        self._reader_engine = get_engine(DatabaseRole.READER, self._db_conf)
+
+    def tearDown(self):
+        self._reader_engine.dispose()
+        BaseModel.metadata.drop_all(SESSION.bind)
+        configure_session(DatabaseRole.READER)
+        self._tmp_dir.cleanup()
+
+    def _count_residents(self) -> int:
+        with self._reader_engine.connect() as conn:
+            return conn.execute(text(SQL_COUNT_RESIDENTS)).scalar()
+
+    def test_publish_snapshot(self):
+        load_residents(RESIDENTS[:1])
+        snapshot_path = publish_snapshot(self._db_conf)
+        self.assertEqual(snapshot_path, self._db_conf['SNAPSHOT_NAME'])
+        self.assertFalse(os.path.exists(f'{snapshot_path}.tmp'))
+        self.assertEqual(self._count_residents(), 1)
+
+        # readers stay on published snapshot until a newer one replaces it
+        load_residents(RESIDENTS[1:])
+        self.assertEqual(self._count_residents(), 1)
+        publish_snapshot(self._db_conf)
+        self.assertEqual(self._count_residents(), 2)
+
+    def test_snapshot_read_only(self):
+        publish_snapshot(self._db_conf)
+        with self._reader_engine.connect() as conn:
+            with self.assertRaises(OperationalError):
+                conn.execute(text('DELETE FROM dim_resident'))
+
+    def test_snapshot_disabled(self):
+        self.assertIsNone(publish_snapshot({**self._db_conf, 'SNAPSHOT_NAME': ''}))
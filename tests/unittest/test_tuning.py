@@ -0,0 +1,70 @@
+"""
+Unit test for captcha notch parameters tuning
+"""
+import json
+import os
+import sys
+import tempfile
+from unittest import mock, TestCase
+
+from sgcc_alert.conf import settings
+from sgcc_alert.core.services.notch_service import DEFAULT_NOTCH_PARAMS, load_notch_params
+from sgcc_alert.tuning import build_candidate_params, dump_params, load_corpus, tune
+
+
+CORPUS_DIR = 'tests/mock_data'
+
+
+class TuningTestCase(TestCase):
+
+    def test_build_candidate_params(self):
+        search_space = {
+            'canny_lower_threshold': [50, 100],
+            'canny_upper_threshold': [100, 150]
+        }
+        candidates = build_candidate_params(search_space)
+        self.assertEqual(len(candidates), 3)
+        for candidate in candidates:
+            self.assertLess(candidate['canny_lower_threshold'], candidate['canny_upper_threshold'])
+            self.assertEqual(candidate['kernel_size'], DEFAULT_NOTCH_PARAMS['kernel_size'])
+
+        candidates = build_candidate_params(search_space, trials=2, seed=0)
+        self.assertEqual(len(candidates), 2)
+
+    def test_tune_and_load_params(self):
+        corpus = load_corpus(CORPUS_DIR)
+        self.assertEqual(len(corpus), 3)
+
+        candidates = build_candidate_params({
+            'binary_thresh': [45.0, 250.0]
+        })
+        results = tune(corpus, candidates, workers=2)
+        best = results[0]
+        self.assertEqual(best['hit_rate'], 1.0)
+        self.assertEqual(best['params']['binary_thresh'], 45.0)
+        self.assertLess(results[-1]['hit_rate'], 1.0)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'captcha_notch_params.json')
+            dump_params(best, path)
+            self.assertEqual(load_notch_params(path), best['params'])
+
+    def test_load_params_from_another_directory(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # settings module in its own directory, while working directory is elsewhere
+            settings_dir = os.path.join(tmp_dir, 'conf')
+            os.mkdir(settings_dir)
+            open(os.path.join(settings_dir, 'tuned_settings.py'), 'w').close()
+            with open(os.path.join(settings_dir, 'captcha_notch_params.json'), 'w') as f:
+                json.dump({'kernel_size': 7}, f)
+
+            cwd = os.getcwd()
+            os.chdir(tmp_dir)
+            try:
+                with mock.patch.object(sys, 'path', [settings_dir, *sys.path]), \
+                        mock.patch.dict(sys.modules), \
+                        mock.patch.object(settings, 'settings_module', 'tuned_settings'), \
+                        mock.patch.object(settings, 'CAPTCHA_NOTCH_PARAMS_PATH', 'captcha_notch_params.json'):
+                    self.assertEqual(load_notch_params()['kernel_size'], 7)
+            finally:
+                os.chdir(cwd)